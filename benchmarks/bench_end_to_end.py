@@ -0,0 +1,276 @@
+"""Benchmark DBdex end to end on a synthetic SQLite database, with a scripted model instead of an LLM.
+
+Times each phase separately (schema reflection, system prompt building, query execution, serializing tool
+responses, formatting results as Markdown and CSV, and whole agent turns) and measures peak memory. Results can
+be saved as JSON and compared with an earlier run, e.g. to check a change for regressions:
+
+Usage:
+    python benchmarks/bench_end_to_end.py --output before.json
+    python benchmarks/bench_end_to_end.py --compare before.json [--tables 50 --columns 20 --rows 100000]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from pydantic_ai import RunContext
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.test import TestModel
+from pydantic_ai.usage import Usage
+from rich.console import Console
+
+from dbdex.agent import get_agent_runner, get_system_prompt
+from dbdex.database import Database, QueryResult
+from dbdex.deps import AgentDeps, CLIAgentDeps
+from dbdex.tools import DBQueryResponse, execute_sql
+
+# Bump when the format of the results file changes
+RESULTS_VERSION = 1
+COLUMN_TYPES = ["INTEGER", "REAL", "TEXT", "TEXT", "DATE"]
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+@dataclass
+class SyntheticSchema:
+    """Size of the synthetic database."""
+
+    tables: int
+    columns: int
+    rows: int
+    # Probability of each table having a foreign key to each earlier table
+    fk_density: float
+    seed: int = 0
+
+
+def create_database(path: Path, schema: SyntheticSchema) -> dict[str, list[str]]:
+    """Create a SQLite database of tables `t0`, `t1`, ... with `id` primary keys, indexed foreign keys to earlier
+    tables (`<table>_id`) and data columns `c0`, `c1`, ... of various types.
+
+    Returns:
+        Table name -> names of the tables it has foreign keys to
+    """
+    rng = random.Random(schema.seed)
+    foreign_keys: dict[str, list[str]] = {}
+    with sqlite3.connect(path) as conn:
+        for table_index in range(schema.tables):
+            table = f"t{table_index}"
+            references = [f"t{i}" for i in range(table_index) if rng.random() < schema.fk_density]
+            foreign_keys[table] = references
+            columns = ["id INTEGER PRIMARY KEY"]
+            columns += [f"{reference}_id INTEGER REFERENCES {reference} (id)" for reference in references]
+            columns += [f"c{i} {COLUMN_TYPES[i % len(COLUMN_TYPES)]}" for i in range(schema.columns)]
+            conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+            for reference in references:
+                conn.execute(f"CREATE INDEX ix_{table}_{reference}_id ON {table} ({reference}_id)")
+
+            def make_row(row_id: int, reference_count: int = len(references)) -> list[Any]:
+                row: list[Any] = [row_id]
+                row += [rng.randint(1, schema.rows) for _ in range(reference_count)]
+                for i in range(schema.columns):
+                    column_type = COLUMN_TYPES[i % len(COLUMN_TYPES)]
+                    if column_type == "INTEGER":
+                        row.append(rng.randint(0, 1000))
+                    elif column_type == "REAL":
+                        row.append(rng.random() * 1000)
+                    elif column_type == "DATE":
+                        row.append(f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+                    else:
+                        row.append(" ".join(rng.choices(WORDS, k=3)))
+                return row
+
+            placeholders = ", ".join("?" * (1 + len(references) + schema.columns))
+            conn.executemany(
+                f"INSERT INTO {table} VALUES ({placeholders})", (make_row(i) for i in range(1, schema.rows + 1))
+            )
+    return foreign_keys
+
+
+def make_queries(foreign_keys: dict[str, list[str]], count: int) -> list[str]:
+    """Queries like the ones an LLM writes: joins on foreign keys with filters, and aggregations."""
+    queries = []
+    tables = list(foreign_keys)
+    for i in range(count):
+        table = tables[i % len(tables)]
+        references = foreign_keys[table]
+        if references and i % 2 == 0:
+            reference = references[i % len(references)]
+            queries.append(
+                f"SELECT a.id, a.c0, a.c2, b.c2 AS {reference}_c2 FROM {table} a "
+                f"JOIN {reference} b ON a.{reference}_id = b.id WHERE a.c0 < 500 ORDER BY a.id LIMIT 500"
+            )
+        else:
+            queries.append(f"SELECT c4 AS day, COUNT(*) AS n, AVG(c0) AS avg_c0 FROM {table} GROUP BY c4 ORDER BY c4")
+    return queries
+
+
+def scripted_model(queries: list[str]) -> FunctionModel:
+    """Model which answers the i-th question by executing the i-th query and describing its result."""
+
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        last_part = messages[-1].parts[-1]
+        if isinstance(last_part, ToolReturnPart):
+            content = last_part.content
+            row_count = len(content.rows or []) if isinstance(content, DBQueryResponse) else 0
+            return ModelResponse(parts=[TextPart(f"The query returned {row_count} rows.")])
+        question_number = sum(1 for message in messages if isinstance(message, ModelResponse)) // 2
+        return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": queries[question_number % len(queries)]})])
+
+    return FunctionModel(respond)
+
+
+def time_phase(repeat: int, func: Callable[[], Any]) -> dict[str, float]:
+    durations = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(durations), "min_s": min(durations)}
+
+
+def run_workload(db_uri: str, queries: list[str], repeat: int) -> dict[str, dict[str, float]]:
+    """Time each phase of answering questions, `repeat` times."""
+    phases: dict[str, dict[str, float]] = {}
+
+    def reflect() -> None:
+        Database(db_uri).get_tables()
+
+    phases["reflection"] = time_phase(repeat, reflect)
+    database = Database(db_uri)
+    database.get_tables()
+    phases["system_prompt"] = time_phase(repeat, lambda: get_system_prompt(database))
+
+    def execute() -> list[QueryResult]:
+        return [database.execute_sql(query) for query in queries]
+
+    phases["execute_sql"] = time_phase(repeat, execute)
+    results = execute()
+
+    context = RunContext(
+        deps=AgentDeps(database=database, max_return_values=200), model=TestModel(), usage=Usage(), prompt=""
+    )
+    responses = [asyncio.run(execute_sql(context, query)) for query in queries]
+    phases["tool_response_json"] = time_phase(repeat, lambda: [response.model_dump_json() for response in responses])
+    phases["to_markdown"] = time_phase(repeat, lambda: [result.to_markdown() for result in results])
+    phases["to_csv"] = time_phase(repeat, lambda: [result.to_csv() for result in results])
+
+    deps = CLIAgentDeps(database=database, console=Console(quiet=True), max_return_values=200)
+    runner = get_agent_runner(scripted_model(queries), deps)
+
+    async def answer_questions() -> None:
+        runner.clear_message_history()
+        for i in range(len(queries)):
+            await runner.run(f"Question {i}")
+
+    phases["agent_turns"] = time_phase(repeat, lambda: asyncio.run(answer_questions()))
+    database.engine.dispose()
+    return phases
+
+
+def measure_peak_memory(db_uri: str, queries: list[str]) -> float:
+    """Peak memory (in MB) allocated while running the workload once."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_workload(db_uri, queries, repeat=1)
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def git_commit() -> str | None:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def print_results(results: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    schema = results["schema"]
+    print(
+        f"{schema['tables']} tables x {schema['columns']} columns x {schema['rows']:,} rows, "
+        f"foreign key density {schema['fk_density']}, {results['questions']} questions (commit {results['commit']})"
+    )
+    header = f"{'phase':<20}{'median ms':>12}{'min ms':>12}"
+    if baseline is not None:
+        header += f"{'baseline ms':>14}{'change':>10}"
+    print(header)
+    for phase, timing in results["phases"].items():
+        line = f"{phase:<20}{timing['median_s'] * 1000:>12.2f}{timing['min_s'] * 1000:>12.2f}"
+        if baseline is not None and phase in baseline["phases"]:
+            baseline_median = baseline["phases"][phase]["median_s"]
+            change = (timing["median_s"] - baseline_median) / baseline_median * 100 if baseline_median else 0.0
+            line += f"{baseline_median * 1000:>14.2f}{change:>+9.1f}%"
+        print(line)
+    memory_line = f"{'peak_memory_mb':<20}{results['peak_memory_mb']:>12.2f}"
+    if baseline is not None:
+        memory_line += f"{'':>12}{baseline['peak_memory_mb']:>14.2f}"
+    print(memory_line)
+    if baseline is not None and baseline["schema"] != schema:
+        print("Warning: the baseline was run with a different database size")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=20, help="Number of tables")
+    parser.add_argument("--columns", type=int, default=10, help="Number of data columns of each table")
+    parser.add_argument("--rows", type=int, default=10_000, help="Number of rows of each table")
+    parser.add_argument(
+        "--fk-density", type=float, default=0.2, help="Probability of each table referencing each earlier table"
+    )
+    parser.add_argument("--questions", type=int, default=20, help="Number of questions (queries) per repetition")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times each phase is timed")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random data")
+    parser.add_argument("--output", type=Path, help="File to save the results to as JSON")
+    parser.add_argument("--compare", type=Path, help="Results file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    schema = SyntheticSchema(args.tables, args.columns, args.rows, args.fk_density, args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "bench.sqlite3"
+        foreign_keys = create_database(db_path, schema)
+        queries = make_queries(foreign_keys, args.questions)
+        db_uri = f"sqlite:///{db_path}"
+        phases = run_workload(db_uri, queries, args.repeat)
+        peak_memory = measure_peak_memory(db_uri, queries)
+
+    results = {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "schema": asdict(schema),
+        "questions": args.questions,
+        "repeat": args.repeat,
+        "phases": phases,
+        "peak_memory_mb": peak_memory,
+    }
+    baseline = json.loads(args.compare.read_text()) if args.compare is not None else None
+    print_results(results, baseline)
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Compare the memory usage and speed of storing query results as a list of rows or column by column.
+
+Usage: python benchmarks/bench_result_layout.py [--rows 1000000]
+"""
+
+import argparse
+import gc
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from dbdex.database import Database
+
+QUERY = "SELECT id, amount, quantity, status, country FROM orders"
+
+
+def create_database(path: Path, row_count: int) -> None:
+    statuses = ["pending", "paid", "shipped", "delivered", "cancelled"]
+    countries = ["US", "GB", "DE", "FR", "JP", "BR", "IN", "CA"]
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE orders (id INTEGER PRIMARY KEY, amount REAL, quantity INTEGER, status TEXT, country TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO orders VALUES (?, ?, ?, ?, ?)",
+            (
+                (i, i * 0.37 % 1000, i % 17, statuses[i % len(statuses)], countries[i * 7 % len(countries)])
+                for i in range(row_count)
+            ),
+        )
+
+
+def benchmark(db_uri: str, columnar: bool) -> dict[str, float]:
+    database = Database(db_uri, columnar_results=columnar)
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = database.execute_sql(QUERY)
+    execute_time = time.perf_counter() - start_time
+    gc.collect()
+    memory, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    for _ in result.iter_rows():
+        pass
+    iterate_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    result.to_csv()
+    csv_time = time.perf_counter() - start_time
+    return {
+        "memory_mb": memory / 1024 / 1024,
+        "peak_memory_mb": peak_memory / 1024 / 1024,
+        "execute_s": execute_time,
+        "iterate_s": iterate_time,
+        "to_csv_s": csv_time,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of rows in the query result")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "bench.sqlite3"
+        create_database(db_path, args.rows)
+        results = {
+            "rows": benchmark(f"sqlite:///{db_path}", columnar=False),
+            "columnar": benchmark(f"sqlite:///{db_path}", columnar=True),
+        }
+
+    metrics = list(results["rows"])
+    print(f"{args.rows:,} rows x 5 columns")
+    print(f"{'layout':<10}" + "".join(f"{metric:>16}" for metric in metrics))
+    for layout, values in results.items():
+        print(f"{layout:<10}" + "".join(f"{values[metric]:>16.2f}" for metric in metrics))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import asyncio
 
 import logfire
 
+from dbdex.cache import default_cache_dir
 from dbdex.cli.args import get_cli_args
 from dbdex.cli.run import run
 
@@ -17,6 +18,38 @@ asyncio.run(
         model_name=args.model,
         api_key=args.api_key,
         max_return_values=args.max_return_values,
+        response_token_budget=args.response_token_budget or None,
         stream=args.stream,
+        page_size=args.page_size,
+        stream_results=args.stream_results,
+        fetch_size=args.fetch_size,
+        spill_threshold=int(args.spill_threshold_mb * 1024 * 1024) or None,
+        columnar_results=args.columnar_results,
+        cache_size=int(args.cache_size_mb * 1024 * 1024) or None,
+        cache_ttl=args.cache_ttl,
+        db_workers=args.db_workers,
+        schema_cache_dir=None if args.no_schema_cache else args.schema_cache_dir,
+        schema_search=args.schema_search,
+        schema_format=args.schema_format,
+        query_timeout=args.query_timeout or None,
+        max_rows=args.max_rows or None,
+        validate_queries=not args.no_sql_validation,
+        max_query_cost=args.max_query_cost or None,
+        pushdown_limit=args.pushdown_limit,
+        row_count_mode=args.row_count,
+        result_summary=args.result_summary,
+        history_keep_turns=args.history_keep_turns or None,
+        history_max_tokens=args.history_max_tokens or None,
+        warm_up=not args.no_warm_up,
+        question_cache_dir=None if args.no_question_cache else default_cache_dir(),
+        batch_input=args.batch,
+        batch_output=args.batch_output,
+        concurrency=args.concurrency,
+        serve_address=(args.host, args.port) if args.serve else None,
+        session_idle_timeout=args.session_idle_timeout,
+        max_sessions=args.max_sessions,
+        record_path=args.record,
+        replay_path=args.replay,
+        replay_report_path=args.replay_report,
     )
 )
@@ -1,63 +1,144 @@
-from dataclasses import dataclass
-from typing import AsyncIterator, Generic, TypeVar
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Generic, Iterator, TypeVar
 
+import logfire
 from pydantic_ai import Agent
-from pydantic_ai.messages import ModelMessage
+from pydantic_ai.messages import ModelMessage, ToolCallPart
 from pydantic_ai.models import Model
 from pydantic_ai.result import RunResult
+from pydantic_ai.usage import Usage
 
-from dbdex.database import Database
+from dbdex.database import Database, SchemaFormat
 from dbdex.deps import AgentDeps
-from dbdex.tools import execute_sql, show_result_table
+from dbdex.history import CompactionPolicy, TurnUsage, compact_history, estimate_message_tokens
+from dbdex.stats import TimedModel, TurnStats, collect_turn_stats, peak_rss_mb
+from dbdex.tools import describe_tables, execute_sql, search_schema, show_result_table
+
+if TYPE_CHECKING:
+    from dbdex.recording import CassetteRecorder
 
 DepsT = TypeVar("DepsT", bound=AgentDeps)
 
 
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
 @dataclass
 class AgentRunner(Generic[DepsT]):
     """
     Class which wraps an Agent to facilitate agent execution by:
-    - Maintaining and managing message history
+    - Maintaining and managing message history (compacting it between turns if a compaction policy is set)
     - Providing dependenices
+    - Recording token usage and timings of each turn (and the turns themselves, if a recorder is set)
     """
 
     agent: Agent[DepsT, str]
     deps: DepsT
     message_history: list[ModelMessage] | None = None
+    compaction: CompactionPolicy | None = None
+    turn_usage: list[TurnUsage] = field(default_factory=list)
+    # Where the time of each turn went (see `dbdex.stats`)
+    turn_stats: list[TurnStats] = field(default_factory=list)
+    # Messages of the most recent turn (the user's query and everything after it)
+    last_turn: list[ModelMessage] = field(default_factory=list)
+    # Records each turn to a cassette, to replay the session offline (see `dbdex.recording`)
+    recorder: "CassetteRecorder | None" = None
+    # ID of the conversation, which changes when the message history is cleared
+    session_id: str = field(default_factory=new_session_id)
 
     def clear_message_history(self) -> None:
         """Clear the message history."""
         self.message_history = None
+        self.session_id = new_session_id()
 
     def run_sync(self, query: str) -> RunResult[str]:
         """Run a query and automatically provide dependencies and message history."""
-        response = self.agent.run_sync(query, deps=self.deps, message_history=self.message_history)
-        self.message_history = response.all_messages()
+        start = time.perf_counter()
+        with self._turn() as stats:
+            response = self.agent.run_sync(query, deps=self.deps, message_history=self.message_history)
+            self._end_turn(response.all_messages(), response.usage(), time.perf_counter() - start, stats)
         return response
 
     async def run(self, query: str) -> RunResult[str]:
         """Run a query and automatically provide dependencies and message history."""
-        response = await self.agent.run(query, deps=self.deps, message_history=self.message_history)
-        self.message_history = response.all_messages()
+        start = time.perf_counter()
+        with self._turn() as stats:
+            response = await self.agent.run(query, deps=self.deps, message_history=self.message_history)
+            self._end_turn(response.all_messages(), response.usage(), time.perf_counter() - start, stats)
         return response
 
     async def run_stream(self, query: str) -> AsyncIterator[str]:
         """Run a query and automatically provide dependencies and message history."""
-        async with self.agent.run_stream(query, deps=self.deps, message_history=self.message_history) as result:
-            async for message in result.stream_text():
-                yield message
-
-            self.message_history = result.all_messages()
-
-
-def get_agent_runner(model: Model, deps: DepsT) -> AgentRunner[DepsT]:
+        start = time.perf_counter()
+        with self._turn() as stats:
+            async with self.agent.run_stream(query, deps=self.deps, message_history=self.message_history) as result:
+                async for message in result.stream_text():
+                    yield message
+
+                self._end_turn(result.all_messages(), result.usage(), time.perf_counter() - start, stats)
+
+    @contextmanager
+    def _turn(self) -> Iterator[TurnStats]:
+        """Collect the stats of a turn, which are also emitted as the attributes of a logfire span of the turn."""
+        stats = TurnStats(turn=len(self.turn_stats) + 1)
+        with logfire.span("Agent turn {turn}", turn=stats.turn) as span, collect_turn_stats(stats):
+            yield stats
+            span.set_attributes({name: value for name, value in stats.metrics().items() if value is not None})
+
+    def _end_turn(self, messages: list[ModelMessage], usage: Usage, seconds: float, stats: TurnStats) -> None:
+        """Store the message history (compacted if a compaction policy is set) and record the turn's token usage
+        and stats (and the turn itself if a recorder is set)."""
+        self.last_turn = messages[len(self.message_history or []) :]
+        history_tokens = estimate_message_tokens(messages)
+        if self.compaction is not None:
+            messages = compact_history(messages, self.compaction)
+        self.message_history = messages
+        self.turn_usage.append(
+            TurnUsage(
+                turn=len(self.turn_usage) + 1,
+                requests=usage.requests,
+                request_tokens=usage.request_tokens,
+                response_tokens=usage.response_tokens,
+                history_tokens=history_tokens,
+                compacted_history_tokens=estimate_message_tokens(messages),
+                seconds=seconds,
+            )
+        )
+        stats.usage = self.turn_usage[-1]
+        stats.tool_calls = sum(isinstance(part, ToolCallPart) for message in self.last_turn for part in message.parts)
+        stats.peak_rss_mb = peak_rss_mb()
+        self.turn_stats.append(stats)
+        if self.recorder is not None:
+            self.recorder.record_turn(self.session_id, self.last_turn, self.turn_usage[-1])
+
+
+def get_agent_runner(
+    model: Model, deps: DepsT, schema_search: bool = False, compaction: CompactionPolicy | None = None
+) -> AgentRunner[DepsT]:
+    """Create an agent runner.
+
+    Args:
+        model: LLM model to use
+        deps: Agent dependencies
+        schema_search: Whether to only include table names in the system prompt, and provide tools for the
+            model to search and describe the schema (instead of including the entire schema in the prompt)
+        compaction: Policy for compacting the message history between turns, or None to keep the entire history
+    """
+    tools: list[Any] = [execute_sql, show_result_table]
+    if schema_search:
+        tools += [search_schema, describe_tables]
     agent = Agent(
-        model=model,
+        # Wrapped to measure the time spent waiting for the model in each turn
+        model=TimedModel(model),
         deps_type=type(deps),
-        system_prompt=get_system_prompt(deps.database),
-        tools=[execute_sql, show_result_table],
+        system_prompt=get_system_prompt(deps.database, schema_search=schema_search, schema_format=deps.schema_format),
+        tools=tools,
     )
-    return AgentRunner(agent, deps=deps)
+    return AgentRunner(agent, deps=deps, compaction=compaction)
 
 
 PROMPT_TEMPLATE = """
@@ -75,10 +156,13 @@ You are a helpful assistant and database and SQL expert that can answer question
  unless explicitly asked to do otherwise.
 * You are only allowed to perform SELECT style queries (no INSERT, UPDATE, DELETE, etc).
 * Try to avoid database queries where possible if the data is already available from a previous query.
+* If you need the results of several independent queries, call the *execute_sql* tool for all of them at once
+ so they run in parallel.
 * Use Markdown formatting to make the output more readable when appropriate.
 * When displaying results from a query, if it is a large amount of data, then use the *show_result_table* tool 
 instead of formatting it as a table in your response.
 * If *show_result_table* tool is called, DO NOT also format the data as a table in your response.
+ Pass it the *query_id* of the query whose result should be displayed.
 
 # EXAMPLES
 
@@ -112,5 +196,24 @@ Assistant: Here are the results: <includes result data formatted as table in res
 """
 
 
-def get_system_prompt(database: Database) -> str:
-    return PROMPT_TEMPLATE.format(database_provider=database.provider, database_schema=database.describe_schema())
+SCHEMA_SEARCH_TEMPLATE = """The full schema is not included here. {table_list}
+
+Use the *search_schema* tool to find the tables and columns relevant to the user's question,
+and the *describe_tables* tool to get the full schema of tables before querying them.
+"""
+
+# Maximum number of table names to list in the system prompt when schema search is enabled
+MAX_PROMPT_TABLE_NAMES = 200
+
+
+def get_system_prompt(database: Database, schema_search: bool = False, schema_format: SchemaFormat = "full") -> str:
+    if schema_search:
+        table_names = database.table_names
+        if len(table_names) <= MAX_PROMPT_TABLE_NAMES:
+            table_list = "The database contains the following tables: " + ", ".join(table_names)
+        else:
+            table_list = f"The database contains {len(table_names)} tables."
+        database_schema = SCHEMA_SEARCH_TEMPLATE.format(table_list=table_list)
+    else:
+        database_schema = database.describe_schema(schema_format=schema_format)
+    return PROMPT_TEMPLATE.format(database_provider=database.provider, database_schema=database_schema)
@@ -0,0 +1,120 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Generic, Hashable, TypeVar
+
+ValueT = TypeVar("ValueT")
+
+# Matches quoted string literals and identifiers, which must not be modified when normalizing SQL
+QUOTED_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def default_cache_dir() -> Path:
+    """Directory for persistent DBdex caches (`$XDG_CACHE_HOME/dbdex` or `~/.cache/dbdex`)."""
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "dbdex"
+
+
+def normalize_sql(sql: str) -> str:
+    """Normalize a SQL query for use as a cache key by collapsing whitespace (outside of quoted strings)
+    and removing any trailing semicolon."""
+    parts = QUOTED_PATTERN.split(sql.strip().rstrip(";").strip())
+    # Quoted parts are at odd indices
+    return "".join(part if i % 2 else WHITESPACE_PATTERN.sub(" ", part) for i, part in enumerate(parts))
+
+
+@dataclass
+class CacheEntry(Generic[ValueT]):
+    value: ValueT
+    size: int
+    expires_at: float | None
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    max_size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache(Generic[ValueT]):
+    """Thread-safe LRU cache with a total size budget and a per-entry time-to-live."""
+
+    def __init__(self, max_size: int, ttl: float | None = None):
+        """
+        Args:
+            max_size: Maximum total size of cached entries (in bytes)
+            ttl: Time (in seconds) after which entries expire. If None, entries only expire when evicted.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, CacheEntry[ValueT]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> ValueT | None:
+        """Get the cached value for a key, or None if it is not cached (or has expired)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: ValueT, size: int) -> None:
+        """Add a value to the cache, evicting the least recently used entries to stay within the size budget.
+        Values larger than the entire budget are not cached."""
+        if size > self.max_size:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self.size + size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._entries[key] = CacheEntry(value, size, expires_at)
+            self.size += size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                entries=len(self._entries),
+                size=self.size,
+                max_size=self.max_size,
+            )
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
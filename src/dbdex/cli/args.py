@@ -1,9 +1,12 @@
 import argparse
 from collections import defaultdict
+from pathlib import Path
 from typing import get_args
 
 from pydantic_ai.models import KnownModelName
 
+from dbdex.cache import default_cache_dir
+
 
 def format_model_options() -> str:
     # Group models by provider
@@ -29,8 +32,7 @@ def get_cli_args() -> argparse.Namespace:
     parser.add_argument(
         "--model",
         type=str,
-        required=True,
-        help="Name of the LLM model to use, in format provider:model (e.g. openai:gpt-4). "
+        help="Name of the LLM model to use, in format provider:model (e.g. openai:gpt-4), required unless replaying. "
         "Choices (not exhaustive, more may be supported):\n" + format_model_options(),
         metavar="PROVIDER:MODEL",
         # Don't strictly enforce choices since new models may be added
@@ -53,12 +55,235 @@ def get_cli_args() -> argparse.Namespace:
         default=200,
         help="Maximum number of values (cells) to return to the LLM from a DB query",
     )
+    parser.add_argument(
+        "--response-token-budget",
+        type=int,
+        default=0,
+        help="Approximate number of tokens of query result data to return to the LLM per query. Results are "
+        "encoded as tab-separated values, truncating long values and dropping rows or columns to fit (0 to disable)",
+    )
     parser.add_argument(
         "--stream",
         action="store_true",
         help="Enable streaming responses",
     )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=50,
+        help="Number of result rows to display per page",
+    )
+    parser.add_argument(
+        "--stream-results",
+        action="store_true",
+        help="Stream query results using server-side cursors instead of loading entire results into memory",
+    )
+    parser.add_argument(
+        "--fetch-size",
+        type=int,
+        default=1000,
+        help="Number of rows to fetch per batch when streaming query results",
+    )
+    parser.add_argument(
+        "--spill-threshold-mb",
+        type=float,
+        default=100,
+        help="Size (in MB) of a query result after which it is stored in a temporary file "
+        "instead of in memory (0 to disable)",
+    )
+    parser.add_argument(
+        "--columnar-results",
+        action="store_true",
+        help="Store query results in memory column by column (typed arrays and dictionary encoded strings), "
+        "which uses much less memory for large results",
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        type=float,
+        default=0,
+        help="Memory budget (in MB) for caching query results, so repeated queries are not re-executed (0 to disable)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=300,
+        help="Time (in seconds) for which cached query results are valid",
+    )
+    parser.add_argument(
+        "--db-workers",
+        type=int,
+        default=4,
+        help="Maximum number of database queries to run concurrently in background threads (also sets the size "
+        "of the database connection pool)",
+    )
+    parser.add_argument(
+        "--schema-cache-dir",
+        type=Path,
+        default=default_cache_dir(),
+        help="Directory to cache the reflected database schema in, to speed up startup",
+    )
+    parser.add_argument(
+        "--schema-search",
+        action="store_true",
+        help="Only include table names in the system prompt and let the LLM search the schema using tools "
+        "(recommended for large databases)",
+    )
+    parser.add_argument(
+        "--schema-format",
+        choices=["full", "compact"],
+        default="full",
+        help="Format of the database schema provided to the LLM. 'compact' uses one line per table to reduce "
+        "prompt size (use /schema-tokens to compare)",
+    )
+    parser.add_argument(
+        "--query-timeout",
+        type=float,
+        default=60,
+        help="Time (in seconds) after which a running database query is cancelled (0 to disable)",
+    )
+    parser.add_argument(
+        "--max-rows",
+        type=int,
+        default=1_000_000,
+        help="Maximum number of rows to fetch for a database query, further rows are discarded (0 to disable)",
+    )
+    parser.add_argument(
+        "--pushdown-limit",
+        action="store_true",
+        help="Add a LIMIT to queries run by the LLM, so only the rows returned to it are fetched from the database",
+    )
+    parser.add_argument(
+        "--row-count",
+        choices=["exact", "estimate", "none"],
+        default="exact",
+        help="How to count the rows of results truncated by --pushdown-limit: 'exact' runs a COUNT(*) query, "
+        "'estimate' uses the query planner's estimate (PostgreSQL only), 'none' skips counting",
+    )
+    parser.add_argument(
+        "--result-summary",
+        choices=["off", "with-rows", "instead-of-rows"],
+        default="off",
+        help="Return statistics of each column (count, nulls, min/max/mean, distinct values, top values and a "
+        "histogram) to the LLM for results with more rows than are returned, alongside or instead of the sample rows",
+    )
+    parser.add_argument(
+        "--history-keep-turns",
+        type=int,
+        default=0,
+        help="Compact the conversation history sent to the LLM, keeping only this many most recent turns in full. "
+        "Tool outputs of older turns are replaced by short stubs (0 to keep the entire history)",
+    )
+    parser.add_argument(
+        "--history-max-tokens",
+        type=int,
+        default=0,
+        help="Approximate maximum number of tokens in the conversation history sent to the LLM. The oldest turns "
+        "are summarized, then dropped, to fit (0 for no limit)",
+    )
+    parser.add_argument(
+        "--no-warm-up",
+        action="store_true",
+        help="Don't load the model while the database schema is reflected, or prime its prompt cache with the "
+        "system prompt while the first question is typed",
+    )
+    parser.add_argument(
+        "--no-sql-validation",
+        action="store_true",
+        help="Don't check that the tables and columns referenced by queries exist before executing them "
+        "(queries are still checked to be read-only)",
+    )
+    parser.add_argument(
+        "--max-query-cost",
+        type=float,
+        default=0,
+        help="Refuse to run queries whose cost estimated by EXPLAIN exceeds this (planner cost units on "
+        "PostgreSQL, estimated rows read on MySQL and SQLite), 0 to disable",
+    )
+    parser.add_argument(
+        "--no-question-cache",
+        action="store_true",
+        help="Always ask the LLM, instead of answering repeated questions by running the query which answered "
+        "them before",
+    )
+    parser.add_argument(
+        "--batch",
+        type=str,
+        metavar="FILE",
+        help="Answer the questions in a JSONL file ('-' for stdin) non-interactively, one per line as "
+        'a string or an object like {"id": 1, "question": "..."}. Each question is answered in a fresh conversation',
+    )
+    parser.add_argument(
+        "--batch-output",
+        type=str,
+        default="-",
+        metavar="FILE",
+        help="JSONL file to write the answers of --batch to, with the SQL executed, row counts and timings "
+        "('-' for stdout)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of --batch questions answered concurrently",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Serve an HTTP/JSON API for concurrent sessions instead of running the interactive prompt "
+        "(requires the server extra)",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Host to bind the --serve server to",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="Port of the --serve server",
+    )
+    parser.add_argument(
+        "--session-idle-timeout",
+        type=float,
+        default=1800,
+        help="Time (in seconds) after which an unused --serve session is evicted",
+    )
+    parser.add_argument(
+        "--max-sessions",
+        type=int,
+        default=100,
+        help="Maximum number of --serve sessions (the least recently used idle session is evicted beyond this)",
+    )
+    parser.add_argument(
+        "--record",
+        type=Path,
+        metavar="CASSETTE",
+        help="Record each turn (the model's responses, tool calls and query results) to a cassette file, "
+        "which can be replayed with --replay",
+    )
+    parser.add_argument(
+        "--replay",
+        type=Path,
+        metavar="CASSETTE",
+        help="Replay the sessions of a cassette recorded with --record, with the recorded model responses instead "
+        "of a model (tools and queries run for real), and report timings and differences in query results",
+    )
+    parser.add_argument(
+        "--replay-report",
+        type=Path,
+        metavar="FILE",
+        help="JSONL file to write the outcome of each replayed turn to",
+    )
+    parser.add_argument(
+        "--no-schema-cache",
+        action="store_true",
+        help="Disable caching of the reflected database schema",
+    )
 
     args = parser.parse_args()
+    if args.model is None and args.replay is None:
+        parser.error("the following arguments are required: --model")
 
     return args
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Iterable, Sequence, TextIO
+
+import logfire
+from pydantic_ai.messages import ModelMessage, RetryPromptPart, ToolCallPart, ToolReturnPart
+from rich.console import Console
+
+from dbdex.agent import AgentRunner
+from dbdex.database import Database
+from dbdex.deps import CLIAgentDeps
+
+DEFAULT_CONCURRENCY = 4
+# Query results kept in the result history for each concurrently answered question, so the results of a
+# question's queries are still there when the question has been answered
+STORED_RESULTS_PER_QUESTION = 20
+
+
+@dataclass
+class BatchQuestion:
+    """A question of a batch, with an ID to match it to its answer in the output."""
+
+    id: Any
+    question: str
+
+
+def read_questions(lines: Iterable[str]) -> list[BatchQuestion]:
+    """Parse questions from JSONL lines, each either an object with a "question" (and optionally an "id") or a
+    string. Questions without an ID get their line number. Blank lines are skipped.
+
+    Raises:
+        ValueError: If a line is not a valid question
+    """
+    questions = []
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number} is not valid JSON: {e}") from e
+        if isinstance(data, str):
+            data = {"question": data}
+        if not isinstance(data, dict) or not isinstance(data.get("question"), str):
+            raise ValueError(f'Line {line_number} is not a question string or an object with a "question" string')
+        questions.append(BatchQuestion(id=data.get("id", line_number), question=data["question"]))
+    return questions
+
+
+def executed_queries(messages: Sequence[ModelMessage], database: Database) -> list[dict[str, Any]]:
+    """Describe the queries executed by the agent in a run: their SQL, and the row count and duration of
+    successful queries or the error of failed ones."""
+    # execute_sql calls which have not been matched to their return yet, as (tool call ID, SQL)
+    calls: list[tuple[str | None, str]] = []
+    queries = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, ToolCallPart) and part.tool_name == "execute_sql":
+                calls.append((part.tool_call_id, str(part.args_as_dict().get("sql", ""))))
+            elif isinstance(part, (ToolReturnPart, RetryPromptPart)) and part.tool_name == "execute_sql":
+                # Returns are in the order of the calls, so the first call with the same ID is the matching one
+                index = next((i for i, (call_id, _) in enumerate(calls) if call_id == part.tool_call_id), None)
+                sql = calls.pop(index)[1] if index is not None else None
+                if isinstance(part, RetryPromptPart):
+                    error = part.content if isinstance(part.content, str) else json.dumps(part.content, default=str)
+                    queries.append({"sql": sql, "error": error})
+                    continue
+                query_id = getattr(part.content, "query_id", None)
+                result = database.get_result(query_id) if query_id is not None else None
+                queries.append(
+                    {
+                        "sql": result.sql if result is not None else sql,
+                        "row_count": result.row_count if result is not None else None,
+                        "truncated": result.truncated if result is not None else None,
+                        "seconds": result.duration.total_seconds() if result and result.duration else None,
+                        "cached": result.cached if result is not None else None,
+                    }
+                )
+    return queries
+
+
+async def answer_question(agent_runner: AgentRunner[Any], question: BatchQuestion) -> dict[str, Any]:
+    """Answer a question with a fresh conversation, and describe the answer as a JSON-serializable dict."""
+    agent_runner.clear_message_history()
+    record: dict[str, Any] = {"id": question.id, "question": question.question}
+    start = time.perf_counter()
+    try:
+        with logfire.span("Batch question {id}", id=question.id):
+            response = await agent_runner.run(question.question)
+        record["answer"] = response.data
+        record["error"] = None
+    except Exception as e:
+        record["answer"] = None
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    if record["error"] is None:
+        usage = agent_runner.turn_usage[-1]
+        record["queries"] = executed_queries(agent_runner.last_turn, agent_runner.deps.database)
+        record["requests"] = usage.requests
+        record["request_tokens"] = usage.request_tokens
+        record["response_tokens"] = usage.response_tokens
+    return record
+
+
+async def run_batch(
+    agent_runner: AgentRunner[CLIAgentDeps],
+    questions: Sequence[BatchQuestion],
+    output: TextIO,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> int:
+    """Answer a batch of independent questions concurrently, writing a JSON line for each answer to `output` as
+    soon as it is answered (so in the order they finish, not the order of `questions`).
+
+    Each of the `concurrency` workers has its own agent runner, sharing the agent (and so the system prompt
+    built from the reflected schema) and the database (and so its connection pool) of `agent_runner`.
+
+    Returns:
+        The number of questions which failed
+    """
+    database = agent_runner.deps.database
+    database.max_stored_results = max(database.max_stored_results, concurrency * STORED_RESULTS_PER_QUESTION)
+    queue: asyncio.Queue[BatchQuestion] = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+    failed = 0
+
+    async def worker() -> None:
+        nonlocal failed
+        # Results displayed with show_result_table are not part of the output
+        runner = replace(
+            agent_runner,
+            deps=replace(agent_runner.deps, console=Console(quiet=True)),
+            message_history=None,
+            turn_usage=[],
+            turn_stats=[],
+            last_turn=[],
+        )
+        while not queue.empty():
+            record = await answer_question(runner, queue.get_nowait())
+            if record["error"] is not None:
+                failed += 1
+            output.write(json.dumps(record, default=str) + "\n")
+            output.flush()
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await asyncio.gather(*workers)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        for task in workers:
+            task.cancel()
+        database.cancel_queries()
+        raise
+    return failed
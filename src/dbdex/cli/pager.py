@@ -0,0 +1,90 @@
+import math
+from typing import Any, Sequence
+
+from rich.console import Console, Group, RenderableType
+from rich.prompt import Prompt
+from rich.table import Table
+from rich.text import Text
+
+from dbdex.database import QueryResult
+
+PAGER_PROMPT = "[n]ext, [p]revious, page number or [q]uit"
+
+
+def format_value(value: Any) -> str:
+    return str(value) if value is not None else ""
+
+
+class ResultPager:
+    """Displays the rows of a query result one page at a time.
+
+    Only the rows of the visible page are formatted. Pages are read from the stored result (the spill file
+    for large results) or fetched from the server-side cursor of a streamed result when they are viewed, in which
+    case only the visible page is kept in memory.
+    """
+
+    def __init__(self, result: QueryResult, console: Console, page_size: int = 50):
+        self.result = result
+        self.console = console
+        self.page_size = page_size
+        self.page = 0
+
+    @property
+    def page_count(self) -> int | None:
+        """Total number of pages, or None if unknown (for streamed results which have not been fully fetched)."""
+        if not self.result.complete:
+            return None
+        return max(1, math.ceil(self.result.row_count / self.page_size))
+
+    def render_page(self, page: int) -> RenderableType | None:
+        """Render a page of rows as a table, or return None if the page is past the end of the result."""
+        start = page * self.page_size
+        rows = self.result.get_rows(start, start + self.page_size)
+        if not rows and page > 0:
+            return None
+        table = build_table(self.result.columns or [], rows)
+        return Group(table, Text(self._caption(page, start, len(rows)), style="dim"))
+
+    def show(self, page: int = 0) -> bool:
+        """Show the given page (if it exists). Returns whether it was shown."""
+        rendered_page = self.render_page(page)
+        if rendered_page is None:
+            return False
+        self.page = page
+        self.console.print(rendered_page)
+        return True
+
+    def run(self) -> None:
+        """Show the first page, then interactively page through the result until the user quits."""
+        self.show(0)
+        while self.page_count != 1:
+            command = Prompt.ask(PAGER_PROMPT, console=self.console, default="q").strip().lower()
+            if command in ("n", "next"):
+                if not self.show(self.page + 1):
+                    self.console.print("Already at the last page.")
+            elif command in ("p", "prev", "previous"):
+                if self.page > 0:
+                    self.show(self.page - 1)
+                else:
+                    self.console.print("Already at the first page.")
+            elif command.isdigit() and int(command) > 0:
+                if not self.show(int(command) - 1):
+                    self.console.print(f"Page {command} does not exist.")
+            else:
+                break
+
+    def _caption(self, page: int, start: int, row_count: int) -> str:
+        page_count = self.page_count
+        total_rows = str(self.result.row_count) if self.result.complete else "more"
+        return (
+            f"Rows {start + 1}-{start + row_count} of {total_rows} "
+            f"(page {page + 1} of {page_count if page_count is not None else '?'})"
+        )
+
+
+def build_table(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> Table:
+    """Build a table for displaying rows of a query result."""
+    table = Table(*columns)
+    for row in rows:
+        table.add_row(*(format_value(value) for value in row))
+    return table
@@ -4,7 +4,15 @@ except ImportError:
     import pyreadline3 as readline
 
 
-from typing import Callable, Sequence
+import asyncio
+import json
+import signal
+import sys
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Coroutine, Sequence
 
 from pydantic_ai.models import KnownModelName
 from rich.console import Console
@@ -12,11 +20,18 @@ from rich.live import Live
 from rich.markdown import Markdown
 from rich.prompt import Prompt
 
-from dbdex.agent import get_agent_runner
-from dbdex.cli.special_commands import COMMAND_HANDLERS, handle_special_command
-from dbdex.database import Database
+from dbdex.agent import AgentRunner, get_agent_runner
+from dbdex.cli.batch import DEFAULT_CONCURRENCY, BatchQuestion, read_questions, run_batch
+from dbdex.cli.special_commands import COMMAND_HANDLERS, handle_result, handle_special_command
+from dbdex.database import Database, RowCountMode, SchemaFormat
 from dbdex.deps import CLIAgentDeps
+from dbdex.history import CompactionPolicy
 from dbdex.llm import build_model_from_name_and_api_key
+from dbdex.question_cache import QuestionCache, answering_query
+from dbdex.recording import CassetteRecorder, RecordedTurn, load_cassette, replay_cassette, replay_model
+from dbdex.server import DEFAULT_MAX_SESSIONS, DEFAULT_SESSION_IDLE_TIMEOUT, serve
+from dbdex.summary import SummaryMode
+from dbdex.warmup import StartupTimings, load_model, prime_prompt_cache
 
 EXIT_COMMANDS = ["/quit", "/exit", "/q"]
 
@@ -30,12 +45,136 @@ def get_completer(autocompletes: Sequence[str]) -> Callable[[str, int], str | No
     return completer
 
 
+async def ask(prompt: str) -> str:
+    """Prompt for input without blocking the event loop, so background tasks (like the model warm-up) keep running
+    while the user types. The prompt runs in a daemon thread so a pending prompt doesn't keep the process alive."""
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future[str] = loop.create_future()
+
+    def set_result(result: str | None, error: BaseException | None) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result or "")
+
+    def read_input() -> None:
+        try:
+            result = Prompt.ask(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(set_result, None, e)
+        else:
+            loop.call_soon_threadsafe(set_result, result, None)
+
+    threading.Thread(target=read_input, daemon=True).start()
+    return await future
+
+
+async def run_interruptible(turn: Coroutine[Any, Any, None], database: Database) -> int | None:
+    """Run a turn so Ctrl-C cancels it (and the queries it is running in the database) instead of exiting the CLI.
+
+    The SIGINT handler installed by `asyncio.run` exits on the second Ctrl-C of the process, so a handler which
+    only cancels the turn is installed while it runs (where the event loop supports signal handlers).
+
+    Returns:
+        The number of running queries cancelled if the turn was interrupted, otherwise None
+    """
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(turn)
+    cancelled_queries: int | None = None
+
+    def interrupt() -> None:
+        nonlocal cancelled_queries
+        task.cancel()
+        # Cancelling the task doesn't stop queries running in the database threads, they are cancelled on the server
+        cancelled_queries = (cancelled_queries or 0) + database.cancel_queries()
+
+    previous_handler = signal.getsignal(signal.SIGINT)
+    try:
+        loop.add_signal_handler(signal.SIGINT, interrupt)
+        handler_installed = True
+    except (NotImplementedError, RuntimeError, ValueError):
+        # Not supported on Windows, or outside the main thread: Ctrl-C cancels the whole task instead
+        handler_installed = False
+    try:
+        await task
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        if cancelled_queries is None and handler_installed:
+            raise
+        if cancelled_queries is None:
+            cancelled_queries = database.cancel_queries()
+            current_task = asyncio.current_task()
+            if current_task is not None and hasattr(current_task, "uncancel"):
+                current_task.uncancel()
+    finally:
+        if handler_installed:
+            loop.remove_signal_handler(signal.SIGINT)
+            signal.signal(signal.SIGINT, previous_handler)
+    return cancelled_queries
+
+
+async def answer_from_question_cache(
+    question: str, question_cache: QuestionCache, agent_runner: AgentRunner[CLIAgentDeps]
+) -> bool:
+    """Answer a question by running the query which answered it before (if cached), without asking the LLM.
+
+    Returns whether the question was answered. If the cached query fails, it is removed from the cache.
+    """
+    cached = question_cache.lookup(question)
+    if cached is None:
+        return False
+    try:
+        result = await agent_runner.deps.database.execute_sql_async(cached.sql)
+    except Exception:
+        question_cache.remove(question)
+        return False
+    agent_runner.deps.console.print(
+        f'[dim]Answered from the question cache ("{cached.question}"), '
+        "start your question with ! to ask the LLM instead[/dim]"
+    )
+    handle_result(str(result.query_id), agent_runner)
+    return True
+
+
 async def run(
     db_uri: str,
     model_name: KnownModelName,
     api_key: str | None = None,
     max_return_values: int = 200,
+    response_token_budget: int | None = None,
     stream: bool = False,
+    page_size: int = 50,
+    stream_results: bool = False,
+    fetch_size: int = 1000,
+    spill_threshold: int | None = None,
+    columnar_results: bool = False,
+    cache_size: int | None = None,
+    cache_ttl: float | None = None,
+    db_workers: int = 4,
+    schema_cache_dir: Path | None = None,
+    schema_search: bool = False,
+    schema_format: SchemaFormat = "full",
+    query_timeout: float | None = None,
+    max_rows: int | None = None,
+    validate_queries: bool = True,
+    max_query_cost: float | None = None,
+    pushdown_limit: bool = False,
+    row_count_mode: RowCountMode = "exact",
+    result_summary: SummaryMode = "off",
+    history_keep_turns: int | None = None,
+    history_max_tokens: int | None = None,
+    warm_up: bool = True,
+    question_cache_dir: Path | None = None,
+    batch_input: str | None = None,
+    batch_output: str = "-",
+    concurrency: int = DEFAULT_CONCURRENCY,
+    serve_address: tuple[str, int] | None = None,
+    session_idle_timeout: float = DEFAULT_SESSION_IDLE_TIMEOUT,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+    record_path: Path | None = None,
+    replay_path: Path | None = None,
+    replay_report_path: Path | None = None,
 ) -> None:
     """Run the DBdex CLI.
 
@@ -44,13 +183,125 @@ async def run(
         api_key: API key for the model service
         db_uri: Database connection URI. Defaults to sqlite:///db.sqlite3
         max_return_values: Maximum number of values to return to the LLM from a DB query
+        response_token_budget: Approximate number of tokens of result data to return to the LLM from a DB query,
+            or None to return results as JSON lists limited only by `max_return_values`
         stream: Whether to stream responses from the LLM
+        page_size: Number of result rows to display per page
+        stream_results: Whether to stream query results from the database using server-side cursors
+        fetch_size: Number of rows to fetch per batch when streaming query results
+        spill_threshold: Size (in bytes) of a query result after which it is spilled to a temporary file
+        columnar_results: Whether to store query results in memory column by column instead of as a list of rows
+        cache_size: Memory budget (in bytes) for caching query results, or None to disable caching
+        cache_ttl: Time (in seconds) for which cached query results are valid
+        db_workers: Maximum number of database queries to run concurrently in background threads
+        schema_cache_dir: Directory to cache the reflected database schema in, or None to disable caching
+        schema_search: Whether to let the LLM search the schema using tools instead of including it in the prompt
+        schema_format: Format of the database schema provided to the LLM
+        query_timeout: Time (in seconds) after which a running database query is cancelled, or None for no timeout
+        max_rows: Maximum number of rows to fetch for a database query, or None for no limit
+        validate_queries: Whether to check that the tables and columns referenced by a query exist before executing it
+        max_query_cost: Maximum cost of a query estimated by EXPLAIN (in the database's cost unit) for it to be
+            executed, or None to execute queries regardless of their cost
+        pushdown_limit: Whether to add a LIMIT to queries run by the LLM, so only the rows returned to it are fetched
+        row_count_mode: How to count the rows of results truncated by the pushed down LIMIT
+        result_summary: Whether to return column statistics to the LLM for results with more rows than are returned
+        history_keep_turns: Number of most recent turns kept in full in the conversation history (older turns have
+            their tool outputs stubbed), or None to keep the entire history
+        history_max_tokens: Approximate maximum number of tokens in the conversation history, or None for no limit
+        warm_up: Whether to load the model while the database schema is reflected, and prime the model's prompt
+            cache with the system prompt while the user types the first question
+        question_cache_dir: Directory to cache the SQL queries which answered questions in, so repeated questions
+            are answered without the LLM, or None to disable the question cache
+        batch_input: JSONL file of questions to answer non-interactively ("-" for stdin), or None to run
+            the interactive prompt
+        batch_output: JSONL file to write the answers of the batch to ("-" for stdout)
+        concurrency: Number of questions of the batch answered concurrently
+        serve_address: Host and port to serve the HTTP/JSON API for concurrent sessions on, or None to run
+            the interactive prompt
+        session_idle_timeout: Time (in seconds) after which a session of the server that is not used is evicted
+        max_sessions: Maximum number of sessions of the server
+        record_path: Cassette file to record each turn to, so sessions can be replayed without the model
+        replay_path: Cassette file whose sessions to replay (with the recorded model responses instead of the
+            model, `concurrency` sessions at a time), or None to run the interactive prompt
+        replay_report_path: JSONL file to write the outcome of each replayed turn to
     """
-    console = Console()
-    database = Database(db_uri)
-    deps = CLIAgentDeps(database=database, console=console, max_return_values=max_return_values)
-    model = build_model_from_name_and_api_key(model_name, api_key)
-    agent_runner = get_agent_runner(model, deps)
+    # In batch mode stdout may be the output, so messages go to stderr
+    console = Console(stderr=batch_input is not None)
+    replay_turns = load_cassette(replay_path)[1] if replay_path is not None else None
+    # Invalid batch input fails before connecting to the database and loading the model
+    batch = None
+    if batch_input is not None:
+        if batch_input == "-":
+            batch = read_questions(sys.stdin)
+        else:
+            with open(batch_input) as f:
+                batch = read_questions(f)
+    timings = StartupTimings()
+    model = replay_model() if replay_turns is not None else build_model_from_name_and_api_key(model_name, api_key)
+    # Loading the model overlaps with connecting to the database and reflecting the schema for the system prompt
+    model_load = asyncio.create_task(_timed(timings, "model load", load_model(model))) if warm_up else None
+
+    with timings.phase("database"):
+        database = await asyncio.to_thread(
+            Database,
+            db_uri,
+            stream_results=stream_results,
+            fetch_size=fetch_size,
+            spill_threshold=spill_threshold,
+            columnar_results=columnar_results,
+            cache_size=cache_size,
+            cache_ttl=cache_ttl,
+            max_workers=db_workers,
+            schema_cache_dir=schema_cache_dir,
+            query_timeout=query_timeout,
+            max_rows=max_rows,
+            validate_queries=validate_queries,
+            max_query_cost=max_query_cost,
+        )
+    deps = CLIAgentDeps(
+        database=database,
+        console=console,
+        max_return_values=max_return_values,
+        response_token_budget=response_token_budget,
+        schema_format=schema_format,
+        page_size=page_size,
+        pushdown_limit=pushdown_limit,
+        row_count_mode=row_count_mode,
+        result_summary=result_summary,
+    )
+    compaction = None
+    if history_keep_turns is not None or history_max_tokens is not None:
+        compaction = CompactionPolicy(max_history_tokens=history_max_tokens)
+        if history_keep_turns is not None:
+            compaction.keep_recent_turns = history_keep_turns
+    with timings.phase("schema"):
+        agent_runner = await asyncio.to_thread(
+            get_agent_runner, model, deps, schema_search=schema_search, compaction=compaction
+        )
+    if model_load is not None:
+        await model_load
+    if record_path is not None:
+        agent_runner.recorder = CassetteRecorder(record_path, database, model_name)
+    question_cache = QuestionCache(question_cache_dir, database) if question_cache_dir is not None else None
+    timings.finish()
+    if replay_turns is not None:
+        console.print(timings.format())
+        await _replay(agent_runner, replay_turns, concurrency, replay_report_path, console)
+        return
+    if batch is not None:
+        console.print(timings.format())
+        await _run_batch(agent_runner, batch, batch_output, concurrency, console)
+        return
+    if serve_address is not None:
+        host, port = serve_address
+        console.print(timings.format())
+        console.print(f"Serving DBdex on http://{host}:{port}")
+        await serve(agent_runner, host, port, idle_timeout=session_idle_timeout, max_sessions=max_sessions)
+        return
+    # The model processes the system prompt in the background while the user types their first question
+    prompt_warm_up = (
+        asyncio.create_task(_timed(timings, "prompt warm-up", prime_prompt_cache(agent_runner))) if warm_up else None
+    )
 
     autocompletes = list(COMMAND_HANDLERS) + EXIT_COMMANDS + database.table_names
 
@@ -58,11 +309,12 @@ async def run(
     readline.parse_and_bind("tab: complete")  # Use Tab for auto-completion
     readline.set_completer_delims(" \t\n;")
 
+    console.print(timings.format())
     console.print(
         "Welcome to DBdex CLI! Type '/exit' or '/q' to exit. What would you like to know about your database? "
     )
     while True:
-        query = Prompt.ask("You").strip()
+        query = (await ask("You")).strip()
         if not query:
             continue
 
@@ -73,12 +325,114 @@ async def run(
             handle_special_command(query, agent_runner)
             continue
 
-        with Live(console=console, vertical_overflow="visible") as live_console:
-            live_console.update("DBdex:  ...")
+        # Questions starting with "!" bypass the question cache
+        bypass_cache = query.startswith("!")
+        query = query.removeprefix("!").strip()
+        if (
+            question_cache is not None
+            and not bypass_cache
+            and await answer_from_question_cache(query, question_cache, agent_runner)
+        ):
+            continue
+
+        if prompt_warm_up is not None and prompt_warm_up.done():
+            prompt_warm_up = None
+        cancelled_count = await run_interruptible(
+            answer(query, agent_runner, stream, question_cache, prompt_warm_up), database
+        )
+        if cancelled_count is not None:
+            console.print(f"[yellow]Cancelled[/yellow] ({cancelled_count} running queries cancelled)")
+
+
+async def answer(
+    query: str,
+    agent_runner: AgentRunner[CLIAgentDeps],
+    stream: bool,
+    question_cache: QuestionCache | None,
+    prompt_warm_up: asyncio.Task[None] | None,
+) -> None:
+    """Answer a question with the agent, rendering the answer as Markdown as it arrives.
+
+    The query which answered the question is stored in the question cache, unless the question followed earlier
+    turns (the query may depend on them, e.g. "and how many of them are active?").
+    """
+    follow_up = bool(agent_runner.message_history)
+    with Live(console=agent_runner.deps.console, vertical_overflow="visible") as live_console:
+        live_console.update("DBdex:  ...")
+        if prompt_warm_up is not None:
+            # Requests to the model would queue behind the warm-up request anyway. Shielded so interrupting
+            # the turn doesn't cancel the warm-up.
+            await asyncio.shield(prompt_warm_up)
+
+        render_seconds = 0.0
+        if stream:
+            async for streamed_message in agent_runner.run_stream(query):
+                render_start = time.perf_counter()
+                live_console.update(Markdown("DBdex: " + streamed_message))
+                render_seconds += time.perf_counter() - render_start
+        else:
+            response = await agent_runner.run(query)
+            render_start = time.perf_counter()
+            live_console.update(Markdown("DBdex: " + response.data), refresh=True)
+            render_seconds += time.perf_counter() - render_start
+        agent_runner.turn_stats[-1].render_seconds = render_seconds
+    if (
+        question_cache is not None
+        and not follow_up
+        and (sql := answering_query(agent_runner.last_turn, agent_runner.deps.database))
+    ):
+        question_cache.store(query, sql)
+
+
+async def _run_batch(
+    agent_runner: AgentRunner[CLIAgentDeps],
+    questions: list[BatchQuestion],
+    output_path: str,
+    concurrency: int,
+    console: Console,
+) -> None:
+    start = time.perf_counter()
+    if output_path == "-":
+        failed = await run_batch(agent_runner, questions, sys.stdout, concurrency)
+    else:
+        with open(output_path, "w") as output:
+            failed = await run_batch(agent_runner, questions, output, concurrency)
+    console.print(
+        f"Answered {len(questions) - failed} of {len(questions)} questions "
+        f"in {time.perf_counter() - start:.2f}s ({failed} failed)"
+    )
+
+
+async def _replay(
+    agent_runner: AgentRunner[CLIAgentDeps],
+    turns: list[RecordedTurn],
+    concurrency: int,
+    report_path: Path | None,
+    console: Console,
+) -> None:
+    # Results displayed with show_result_table are not part of the replay
+    agent_runner.deps.console = Console(quiet=True)
+    replayed = await replay_cassette(agent_runner, turns, concurrency=concurrency)
+    if report_path is not None:
+        with report_path.open("w") as f:
+            for turn in replayed:
+                f.write(json.dumps(asdict(turn), default=str) + "\n")
+
+    for turn in replayed:
+        if turn.error or turn.differences:
+            console.print(f"[yellow]{turn.question}[/yellow]")
+            for difference in [turn.error] if turn.error else turn.differences:
+                console.print(f"  {difference}")
+    recorded_seconds = sum(turn.recorded_seconds or 0 for turn in replayed)
+    replayed_seconds = sum(turn.seconds for turn in replayed)
+    changed = sum(bool(turn.error or turn.differences) for turn in replayed)
+    console.print(
+        f"Replayed {len(replayed)} turns of {len({turn.session for turn in replayed})} sessions in "
+        f"{replayed_seconds:.2f}s without the model ({recorded_seconds:.2f}s when recorded with the model), "
+        f"{changed} turns with different query results"
+    )
+
 
-            if stream:
-                async for streamed_message in agent_runner.run_stream(query):
-                    live_console.update(Markdown("DBdex: " + streamed_message))
-            else:
-                response = await agent_runner.run(query)
-                live_console.update(Markdown("DBdex: " + response.data))
+async def _timed(timings: StartupTimings, phase: str, coroutine: Awaitable[None]) -> None:
+    with timings.phase(phase):
+        await coroutine
@@ -1,11 +1,16 @@
 from pathlib import Path
-from typing import Dict, Protocol
+from typing import Dict, Protocol, get_args
 
 from rich.markdown import Markdown
+from rich.table import Table
 
 from dbdex.agent import AgentRunner
-from dbdex.database import TableNotFoundError
+from dbdex.cli.pager import ResultPager
+from dbdex.database import SchemaFormat, TableNotFoundError
 from dbdex.deps import CLIAgentDeps
+from dbdex.export import detect_format, export_rows
+from dbdex.stats import PERCENTILES, STATS_WINDOW, export_stats, summarize_stats
+from dbdex.tokens import estimate_tokens
 
 
 class CommandHandler(Protocol):
@@ -16,10 +21,35 @@ def handle_result(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
     database = agent_runner.deps.database
     console = agent_runner.deps.console
 
-    if database.last_query:
-        console.print(Markdown(database.last_query.to_markdown()))
+    if arg:
+        query_id = arg.lstrip("#")
+        if not query_id.isdigit():
+            console.print("[red]Usage: /result [query_id][/red]")
+            return
+        result = database.get_result(int(query_id))
+        if not result:
+            console.print(f"No result found for query #{query_id}.")
+            return
     else:
-        console.print("No previous query results.")
+        result = database.last_query
+        if not result:
+            console.print("No previous query results.")
+            return
+
+    console.print(Markdown(result.details_markdown()))
+    if result.error:
+        return
+    if not result.rows:
+        console.print("No results")
+        return
+    if result.limited:
+        console.print("[dim]The result was limited to the rows returned to the LLM, executing the query again[/dim]")
+        try:
+            result = database.full_result(result)
+        except Exception as e:
+            console.print(f"[red]Error: {e}[/red]")
+            return
+    ResultPager(result, console, page_size=agent_runner.deps.page_size).run()
 
 
 def handle_clear(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
@@ -28,8 +58,8 @@ def handle_clear(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
 
 
 def handle_sql(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
-    result = agent_runner.deps.database.execute_sql(arg)
-    agent_runner.deps.console.print(Markdown(result.to_markdown()))
+    agent_runner.deps.database.execute_sql(arg)
+    handle_result("", agent_runner)
 
 
 def handle_schema(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
@@ -44,27 +74,165 @@ def handle_schema(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
     console.print(Markdown(f"```\n{schema}\n```"))
 
 
+def handle_schema_tokens(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
+    """Compare the size of the database schema (optionally for specific tables) in each schema format."""
+    database = agent_runner.deps.database
+    console = agent_runner.deps.console
+    table_names = [name.strip() for name in arg.split(",")] if arg else None
+
+    table = Table("Format", "Characters", "Estimated tokens", "Relative size")
+    full_tokens = None
+    try:
+        for schema_format in get_args(SchemaFormat):
+            schema = database.describe_schema(table_names=table_names, schema_format=schema_format)
+            tokens = estimate_tokens(schema)
+            full_tokens = full_tokens or tokens
+            table.add_row(schema_format, str(len(schema)), str(tokens), f"{tokens / max(full_tokens, 1):.0%}")
+    except TableNotFoundError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        return
+    console.print(table)
+
+
 def handle_export(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
-    """Export the most recent query results to a CSV file."""
+    """Export the most recent query results to a file (`/export [filename] [--full]`).
+
+    The format (CSV, JSONL or Parquet) and compression (.gz or .zst) are determined by the file extension.
+    With `--full` the query is re-executed on the database to export its entire result (up to `--max-rows`),
+    as are results which were limited to the rows returned to the LLM.
+    """
     console = agent_runner.deps.console
+    database = agent_runner.deps.database
 
-    last_query = agent_runner.deps.database.last_query
-    if not last_query or not last_query.rows:
+    last_query = database.last_query
+    if not last_query or not last_query.rows or not last_query.columns:
         console.print("[red]No query results to export[/red]")
         return
 
+    args = arg.split()
+    full = "--full" in args or last_query.limited
+    filenames = [a for a in args if a != "--full"]
+
     # Use provided filename or generate one
-    filename = arg if arg else "query_results.csv"
-    if not filename.endswith(".csv"):
-        filename += ".csv"
+    path = Path(filenames[0] if filenames else "query_results.csv")
+    detected_format = detect_format(path)
+    if detected_format is None:
+        path = path.with_name(path.name + ".csv")
+        detected_format = ("csv", None)
+    export_format, compression = detected_format
 
-    path = Path(filename)
+    # Rows are streamed to the file rather than formatted in memory
+    rows = database.stream_sql(last_query.sql) if full else last_query.iter_rows()
     try:
-        with path.open("wt", newline="") as f:
-            f.write(last_query.to_csv())
-        console.print(f"[green]Results exported to {path.absolute()}[/green]")
+        row_count = export_rows(last_query.columns, rows, path, export_format, compression)
+        console.print(f"[green]{row_count} rows exported to {path.absolute()}[/green]")
     except Exception as e:
         console.print(f"[red]Error exporting results: {str(e)}[/red]")
+        return
+
+    if full and database.max_rows is not None and row_count >= database.max_rows:
+        console.print(
+            f"[yellow]The export stopped at the maximum of {database.max_rows} rows (--max-rows), "
+            "the result may have more rows[/yellow]"
+        )
+    elif not full and last_query.truncated:
+        console.print(
+            "[yellow]The result was truncated, so only its fetched rows were exported. "
+            "Use --full to re-execute the query and export its entire result[/yellow]"
+        )
+
+
+def handle_cache(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
+    """Show query result cache statistics, or clear the cache with `/cache clear`."""
+    database = agent_runner.deps.database
+    console = agent_runner.deps.console
+
+    if database.result_cache is None:
+        console.print("Query result cache is disabled (enable with --cache-size-mb)")
+        return
+
+    if arg.strip() == "clear":
+        database.result_cache.clear()
+        console.print("Query result cache cleared.")
+        return
+
+    stats = database.result_cache.stats()
+    console.print(
+        f"Query result cache: {stats.hits} hits, {stats.misses} misses ({stats.hit_rate:.0%} hit rate), "
+        f"{stats.evictions} evictions, {stats.entries} entries using "
+        f"{stats.size / 1024 / 1024:.1f}/{stats.max_size / 1024 / 1024:.1f} MB"
+    )
+
+
+def handle_tokens(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
+    """Show the token usage of each turn, and the size of the conversation history before and after compaction."""
+    console = agent_runner.deps.console
+    if not agent_runner.turn_usage:
+        console.print("No turns yet.")
+        return
+
+    table = Table("Turn", "Requests", "Request tokens", "Response tokens", "History tokens", "After compaction")
+    for usage in agent_runner.turn_usage:
+        table.add_row(
+            str(usage.turn),
+            str(usage.requests),
+            _format_optional(usage.request_tokens),
+            _format_optional(usage.response_tokens),
+            str(usage.history_tokens),
+            str(usage.compacted_history_tokens),
+        )
+    console.print(table)
+    if agent_runner.compaction is None:
+        console.print("History compaction is disabled (enable with --history-keep-turns or --history-max-tokens)")
+
+
+def handle_stats(arg: str, agent_runner: AgentRunner[CLIAgentDeps]) -> None:
+    """Show percentiles of where the time of recent turns went, or export the stats of every turn as JSON with
+    `/stats export [filename]`."""
+    console = agent_runner.deps.console
+    turns = agent_runner.turn_stats
+    if not turns:
+        console.print("No turns yet.")
+        return
+
+    args = arg.split()
+    if args and args[0] == "export":
+        path = Path(args[1] if len(args) > 1 else "stats.json")
+        try:
+            export_stats(turns, path)
+        except OSError as e:
+            console.print(f"[red]Error exporting stats: {e}[/red]")
+            return
+        console.print(f"[green]Stats of {len(turns)} turns exported to {path.absolute()}[/green]")
+        return
+
+    summary = summarize_stats(turns)
+    last_turn = turns[-1].metrics()
+    table = Table("Metric", "Last turn", *(f"p{p}" for p in PERCENTILES))
+    for metric, percentiles in summary.items():
+        table.add_row(
+            metric,
+            _format_metric(metric, last_turn.get(metric)),
+            *(_format_metric(metric, percentiles[f"p{p}"]) for p in PERCENTILES),
+        )
+    console.print(table)
+    console.print(f"Percentiles over the last {min(len(turns), STATS_WINDOW)} turns")
+
+
+def _format_metric(metric: str, value: float | None) -> str:
+    if value is None:
+        return "-"
+    if metric.endswith("_seconds") or metric == "seconds":
+        return f"{value:.3f}s"
+    if metric == "result_bytes":
+        return f"{value / 1024:,.1f} KB"
+    if metric.endswith("_mb"):
+        return f"{value:,.1f} MB"
+    return f"{value:,.0f}" if value == int(value) else f"{value:,.1f}"
+
+
+def _format_optional(value: int | None) -> str:
+    return "-" if value is None else str(value)
 
 
 COMMAND_HANDLERS: Dict[str, CommandHandler] = {
@@ -72,7 +240,11 @@ COMMAND_HANDLERS: Dict[str, CommandHandler] = {
     "/clear": handle_clear,
     "/sql": handle_sql,
     "/schema": handle_schema,
+    "/schema-tokens": handle_schema_tokens,
     "/export": handle_export,
+    "/cache": handle_cache,
+    "/tokens": handle_tokens,
+    "/stats": handle_stats,
 }
 
 
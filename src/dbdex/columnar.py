@@ -0,0 +1,232 @@
+import keyword
+import sys
+from array import array
+from datetime import date
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, Sequence, cast, overload
+
+from sqlalchemy import Row
+
+# Number of rows converted to columns at a time
+COLUMNAR_CHUNK_SIZE = 10_000
+# String columns with more distinct values than this fraction of their rows are stored as plain lists,
+# since dictionary encoding would not save any memory
+MAX_DICTIONARY_RATIO = 0.5
+
+NONE_TYPE = type(None)
+
+
+def make_row_type(columns: Sequence[str], name: str) -> type[tuple[Any, ...]]:
+    """Create a tuple type for rows with the given columns, with `_fields` and attribute access by column name
+    (for column names which are valid identifiers) so that rows can be used like SQLAlchemy rows."""
+    namespace: dict[str, Any] = {"__slots__": (), "_fields": tuple(columns)}
+    for i, column in enumerate(columns):
+        if column.isidentifier() and not keyword.iskeyword(column) and not hasattr(tuple, column):
+            namespace.setdefault(column, property(itemgetter(i)))
+    return type(name, (tuple,), namespace)
+
+
+class ObjectColumn:
+    """Column of arbitrary Python values, used when no compact representation applies."""
+
+    __slots__ = ("values", "null_only")
+
+    def __init__(self, values: list[Any] | None = None):
+        self.values = values or []
+        self.null_only = all(value is None for value in self.values)
+
+    def extend(self, values: Sequence[Any]) -> None:
+        self.values.extend(values)
+        self.null_only = self.null_only and all(value is None for value in values)
+
+    def slice(self, start: int, stop: int) -> list[Any]:
+        return self.values[start:stop]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        sample = self.values[:: max(1, len(self.values) // 100)]
+        value_size = sum(sys.getsizeof(value) for value in sample) // len(sample) if sample else 0
+        return sys.getsizeof(self.values) + value_size * len(self.values)
+
+
+class ArrayColumn:
+    """Column of integers, floats or dates stored in a typed array, with a mask of NULL values."""
+
+    __slots__ = ("typecode", "value_type", "values", "nulls")
+
+    # Value type -> array typecode (dates are stored as ordinals)
+    TYPECODES = {int: "q", float: "d", date: "i"}
+
+    def __init__(self, value_type: type):
+        self.value_type = value_type
+        self.typecode = self.TYPECODES[value_type]
+        self.values = array(self.typecode)
+        # Only allocated once the column contains a NULL
+        self.nulls: bytearray | None = None
+
+    def extend(self, values: Sequence[Any]) -> None:
+        """Append values, raising TypeError or OverflowError (without modifying the column) if they don't fit."""
+        if not set(map(type, values)) <= {self.value_type, NONE_TYPE}:
+            raise TypeError(f"Column values are not all of type {self.value_type.__name__}")
+        has_nulls = None in values
+        encoded: Iterable[Any] = values
+        if self.value_type is date:
+            encoded = (0 if value is None else value.toordinal() for value in values)
+        elif has_nulls:
+            encoded = (0 if value is None else value for value in values)
+        # Converted to a separate array first, so a value which overflows does not leave the column partially extended
+        self.values.extend(array(self.typecode, encoded))
+        if has_nulls and self.nulls is None:
+            self.nulls = bytearray(len(self.values) - len(values))
+        if self.nulls is not None:
+            self.nulls.extend(value is None for value in values)
+
+    def slice(self, start: int, stop: int) -> list[Any]:
+        values: list[Any] = self.values[start:stop].tolist()
+        if self.value_type is date:
+            values = [date.fromordinal(value) if value else None for value in values]
+        if self.nulls is not None:
+            values = [None if is_null else value for value, is_null in zip(values, self.nulls[start:stop], strict=True)]
+        return values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.values) + (sys.getsizeof(self.nulls) if self.nulls is not None else 0)
+
+
+class DictionaryColumn:
+    """Column of strings stored as indices into a dictionary of distinct values (index 0 is NULL)."""
+
+    __slots__ = ("codes", "dictionary", "index")
+
+    def __init__(self) -> None:
+        self.codes = array("i")
+        self.dictionary: list[str | None] = [None]
+        self.index: dict[str | None, int] = {None: 0}
+
+    def extend(self, values: Sequence[Any]) -> None:
+        if not set(map(type, values)) <= {str, NONE_TYPE}:
+            raise TypeError("Column values are not all strings")
+        for value in set(values) - self.index.keys():
+            self.index[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        self.codes.extend(map(self.index.__getitem__, values))
+
+    def slice(self, start: int, stop: int) -> list[Any]:
+        return list(map(self.dictionary.__getitem__, self.codes[start:stop]))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            sys.getsizeof(self.codes)
+            + sys.getsizeof(self.dictionary)
+            + sys.getsizeof(self.index)
+            + sum(sys.getsizeof(value) for value in self.dictionary)
+        )
+
+
+Column = ObjectColumn | ArrayColumn | DictionaryColumn
+
+
+def new_column(values: Sequence[Any]) -> Column:
+    """Create an empty column with the most compact representation for the given values."""
+    value_types = set(map(type, values)) - {NONE_TYPE}
+    if len(value_types) == 1:
+        (value_type,) = value_types
+        if value_type in ArrayColumn.TYPECODES:
+            return ArrayColumn(value_type)
+        if value_type is str and len(set(values)) <= MAX_DICTIONARY_RATIO * len(values):
+            return DictionaryColumn()
+    return ObjectColumn()
+
+
+def append_values(column: Column | None, values: Sequence[Any]) -> Column:
+    """Append values to a column, converting it to a less compact representation if the values don't fit."""
+    if column is None or (isinstance(column, ObjectColumn) and column.null_only):
+        # The type of the column is determined by its first non-NULL values
+        leading_nulls = len(column) if column is not None else 0
+        column = new_column(values)
+        if leading_nulls:
+            column.extend([None] * leading_nulls)
+    try:
+        column.extend(values)
+    except (TypeError, OverflowError):
+        column = ObjectColumn(column.slice(0, len(column)))
+        column.extend(values)
+    if isinstance(column, DictionaryColumn) and len(column.dictionary) > MAX_DICTIONARY_RATIO * len(column) + 1:
+        column = ObjectColumn(column.slice(0, len(column)))
+    return column
+
+
+class ColumnarRows(Sequence[Row[Any]]):
+    """Rows of a query result stored column by column, with far less overhead per value than a list of rows.
+
+    Integer, float and date columns are stored in typed arrays and low-cardinality string columns are
+    dictionary encoded. Rows are created on access, as tuples with `_fields` and attribute access by
+    column name so that they can be used like SQLAlchemy rows.
+    """
+
+    __slots__ = ("columns", "_data", "_length", "_row_type")
+
+    def __init__(self, columns: Sequence[str], rows: Iterable[Sequence[Any]] = ()):
+        self.columns = list(columns)
+        self._data: list[Column | None] = [None] * len(self.columns)
+        self._length = 0
+        self._row_type = make_row_type(self.columns, "ColumnarRow")
+        self.extend(rows)
+
+    def extend(self, rows: Iterable[Sequence[Any]]) -> None:
+        row_iter = iter(rows)
+        while chunk := list(islice(row_iter, COLUMNAR_CHUNK_SIZE)):
+            for i, values in enumerate(zip(*chunk, strict=True)):
+                self._data[i] = append_values(self._data[i], values)
+            self._length += len(chunk)
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated memory used by the rows (in bytes)."""
+        return sum(column.nbytes for column in self._data if column is not None)
+
+    def column_values(self, start: int, stop: int) -> list[list[Any]]:
+        """Get the values of each column for the rows in range [start, stop)."""
+        return [column.slice(start, stop) if column is not None else [] for column in self._data]
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> Row[Any]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Row[Any]]: ...
+
+    def __getitem__(self, index: int | slice) -> Row[Any] | list[Row[Any]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if stop <= start:
+                return []
+            return [
+                cast(Row[Any], self._row_type(values)) for values in zip(*self.column_values(start, stop), strict=True)
+            ]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Row index out of range")
+        return self[index : index + 1][0]
+
+    def __iter__(self) -> Iterator[Row[Any]]:
+        for start in range(0, self._length, COLUMNAR_CHUNK_SIZE):
+            yield from self[start : start + COLUMNAR_CHUNK_SIZE]
@@ -1,30 +1,88 @@
+import asyncio
 import csv
+import hashlib
 import io
-from dataclasses import dataclass
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timedelta
-from typing import Any
+from functools import cached_property, partial
+from itertools import count, islice
+from pathlib import Path
+from typing import Any, Callable, Iterator, Literal, ParamSpec, TypeVar
 
 import logfire
 from sqlalchemy import (
+    Connection,
+    Index,
     MetaData,
+    QueuePool,
     Row,
     Table,
     UniqueConstraint,
     create_engine,
+    inspect,
     text,
 )
+from sqlalchemy.engine import make_url
 from sqlalchemy.sql.schema import ForeignKeyConstraint
 
+from dbdex.cache import CacheStats, LRUCache, normalize_sql
+from dbdex.columnar import ColumnarRows
+from dbdex.query_plan import QueryPlan, explain_query
+from dbdex.schema_cache import CachedSchema, SchemaCache, get_catalog_fingerprint
+from dbdex.schema_index import SchemaIndex
+from dbdex.sql_rewrite import add_limit, count_query, strip_sql
+from dbdex.sql_validation import table_aliases, validate_sql
+from dbdex.storage import SpilledRows, collect_rows, estimate_batch_size
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+SchemaFormat = Literal["full", "compact"]
+# How to count the rows of a query result which was not fully fetched (see `Database.count_rows()`)
+RowCountMode = Literal["exact", "estimate", "none"]
+
 
 @dataclass
 class QueryResult:
     """Container for SQL query and its results."""
 
     sql: str
-    rows: list[Row[Any]]
+    # Rows are stored in a temporary file instead of in memory for large results (see `Database.spill_threshold`),
+    # and column by column instead of as a list of rows if `Database.columnar_results` is enabled
+    rows: list[Row[Any]] | ColumnarRows | SpilledRows
     executed_at: datetime
     duration: timedelta | None = None
     error: Exception | None = None
+    # Whether the entire result has been fetched (False for streamed results which have not been fully fetched).
+    # `rows` only contains the entire result if `offset` is 0.
+    complete: bool = True
+    # Index in the result of the first row in `rows`, for streamed results whose earlier rows have been discarded
+    # while paging through them (see `get_rows()`)
+    offset: int = 0
+    # Server-side cursor over the rows of a streamed result which have not been fetched into `rows` yet
+    row_stream: Iterator[Row[Any]] | None = field(default=None, repr=False)
+    # Re-executes the query to stream the entire result again once `row_stream` has been consumed
+    restream: Callable[[], Iterator[Row[Any]]] | None = field(default=None, repr=False)
+    # Whether the result was served from the query result cache instead of the database
+    cached: bool = False
+    # Whether the query exceeded `Database.query_timeout` and was cancelled
+    timed_out: bool = False
+    # Whether the query was cancelled by the user (see `Database.cancel_queries()`)
+    cancelled: bool = False
+    # Whether fetching stopped at `Database.max_rows` (or the `limit` of `Database.execute_sql()`) before the end of
+    # the result
+    truncated: bool = False
+    # Whether fetching stopped at the `limit` of `Database.execute_sql()` (e.g. the LIMIT pushed down for the LLM),
+    # so the entire result can only be fetched by executing the query again (see `Database.full_result()`)
+    limited: bool = False
+    # ID of the query in the result history of the database (see `Database.get_result()`)
+    query_id: int | None = None
 
     @property
     def success(self) -> bool:
@@ -32,7 +90,8 @@ class QueryResult:
 
     @property
     def row_count(self) -> int:
-        return len(self.rows)
+        """Number of rows fetched (may be less than the full result if not `complete`)."""
+        return self.offset + len(self.rows)
 
     @property
     def columns(self) -> list[str] | None:
@@ -41,38 +100,125 @@ class QueryResult:
             return list(self.rows[0]._fields)
         return None
 
+    def head(self, n: int) -> list[Row[Any]]:
+        """Get the first `n` rows, fetching more from the row stream if required."""
+        return self.get_rows(0, n)
+
+    def iter_rows(self) -> Iterator[Row[Any]]:
+        """Iterate over all rows of the result.
+
+        For streamed results the remaining rows are consumed from the cursor without being kept in memory,
+        and the query is re-executed if the cursor has already been consumed.
+        """
+        if self.complete and self.offset == 0:
+            yield from self.rows
+        elif self.row_stream is not None and self.offset == 0:
+            row_stream, self.row_stream = self.row_stream, None
+            yield from self.rows
+            yield from row_stream
+        elif self.restream is not None:
+            yield from self.restream()
+        else:
+            yield from self.rows
+
+    def close(self) -> None:
+        """Release the server-side cursor (and its connection) held by a streamed result, and delete any spill file."""
+        self.close_stream()
+        if isinstance(self.rows, SpilledRows):
+            self.rows.close()
+
+    def close_stream(self) -> None:
+        """Release the server-side cursor (and its connection) held by a streamed result. The rows which have not
+        been fetched yet are fetched by executing the query again when they are needed."""
+        if self.row_stream is not None:
+            close = getattr(self.row_stream, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except ValueError:
+                    # The stream is being read in another thread, its connection is released once it is consumed
+                    return
+            self.row_stream = None
+
+    def get_rows(self, start: int, stop: int) -> list[Row[Any]]:
+        """Get the rows in range [start, stop), fetching more from the row stream if required.
+
+        Only the requested rows of streamed results are kept once more rows are fetched, so paging through a large
+        streamed result doesn't hold it all in memory. Going back to discarded rows re-executes the query.
+        """
+        if start < self.offset or (stop > self.row_count and not self.complete):
+            self._fetch_rows(start, stop)
+        return list(self.rows[max(start - self.offset, 0) : max(stop - self.offset, 0)])
+
+    def _fetch_rows(self, start: int, stop: int) -> None:
+        """Fetch the rows of a streamed result up to `stop` into `rows`, discarding the rows before `start`."""
+        if start < self.offset or self.row_stream is None:
+            if self.restream is None:
+                return
+            # Start again from the first row
+            self.close()
+            self.row_stream = self.restream()
+            self.rows = []
+            self.offset = 0
+            self.complete = False
+        assert isinstance(self.rows, list)
+        # Keeps the rows in range [start, stop), or the last rows of the result if it ends before `start`
+        window = deque(self.rows[max(start - self.offset, 0) :], maxlen=max(stop - start, 1))
+        position = self.row_count
+        for row in islice(self.row_stream, stop - position):
+            window.append(row)
+            position += 1
+        if position < stop:
+            self.row_stream = None
+            self.complete = True
+        self.rows = list(window)
+        self.offset = position - len(window)
+
+    def details_markdown(self) -> str:
+        """Format the SQL query and execution time (or error) as markdown."""
+        md = f"Query #{self.query_id}\n\n" if self.query_id is not None else ""
+        md += f"```sql\n{self.sql}\n```\n\n"
+        if self.duration is not None:
+            duration_str = f"{self.duration.total_seconds():.3f}s"
+            if self.cached:
+                duration_str += " (cached)"
+            md += f"✓ Executed in {duration_str}\n\n"
+        if self.truncated:
+            md += f"⚠ Result truncated to the first {self.row_count} rows\n\n"
+        if self.error:
+            md += f"❌ Error: {str(self.error)}\n"
+        return md
+
     def to_markdown(self, include_details: bool = True) -> str:
         """Format query results as a markdown table.
 
         Args:
             include_details: Whether to include the SQL query and execution time in the output
         """
-        md = ""
+        parts = []
 
         if include_details:
-            md += f"```sql\n{self.sql}\n```\n\n"
-            if self.duration:
-                duration_str = f"{self.duration.total_seconds():.3f}s"
-                md += f"✓ Executed in {duration_str}\n\n"
+            parts.append(self.details_markdown())
 
         if self.error:
-            md += f"❌ Error: {str(self.error)}\n"
-            return md
+            if not include_details:
+                parts.append(f"❌ Error: {str(self.error)}\n")
+            return "".join(parts)
 
         if not self.rows or not self.columns:
-            md += "No results"
-            return md
+            parts.append("No results")
+            return "".join(parts)
 
         # Build results table
-        md += "| " + " | ".join(self.columns) + " |\n"
-        md += "|" + "|".join(["---"] * len(self.columns)) + "|\n"
+        parts.append("| " + " | ".join(self.columns) + " |\n")
+        parts.append("|" + "|".join(["---"] * len(self.columns)) + "|\n")
 
         # Add data rows
-        for row in self.rows:
+        for row in self.iter_rows():
             values = [str(val) if val is not None else "" for val in row]
-            md += "| " + " | ".join(values) + " |\n"
+            parts.append("| " + " | ".join(values) + " |\n")
 
-        return md
+        return "".join(parts)
 
     def to_csv(self) -> str:
         """Format query results as a CSV string."""
@@ -81,7 +227,7 @@ class QueryResult:
         buffer = io.StringIO(newline="")
         writer = csv.writer(buffer, lineterminator="\n")
         writer.writerow(self.columns)
-        writer.writerows(self.rows)
+        writer.writerows(self.iter_rows())
         return buffer.getvalue()
 
 
@@ -89,91 +235,548 @@ class InvalidQueryError(Exception):
     """Exception raised for invalid SQL queries."""
 
 
+class QueryTooExpensiveError(InvalidQueryError):
+    """Exception raised for queries whose estimated cost exceeds the maximum query cost."""
+
+
 class TableNotFoundError(Exception):
     """Exception raised for invalid table names."""
 
 
+class QueryTimeoutError(Exception):
+    """Exception raised when a query exceeds the query timeout and is cancelled."""
+
+
+class QueryCancelledError(Exception):
+    """Exception raised when a running query is cancelled by the user."""
+
+
+class QueryGuard:
+    """Tracks a query while it is running on a connection, so it can be cancelled on the database server
+    by another thread (when the user cancels it, or by a watchdog timer when it exceeds the timeout)."""
+
+    def __init__(self, dbapi_connection: Any, cancel: Callable[[Any], None]):
+        self.dbapi_connection = dbapi_connection
+        self._cancel = cancel
+        self.timed_out = False
+        self.cancelled = False
+
+    def timeout(self) -> None:
+        self.timed_out = True
+        self._cancel_on_server()
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        self._cancel_on_server()
+
+    def _cancel_on_server(self) -> None:
+        try:
+            self._cancel(self.dbapi_connection)
+        except Exception as e:
+            logfire.warn("Failed to cancel query: {error}", error=str(e))
+
+
 class Database:
     """A class to interact with a SQL database using SQLAlchemy."""
 
-    def __init__(self, db_uri: str):
-        """Initialize database connection and reflect schema.
+    def __init__(
+        self,
+        db_uri: str,
+        stream_results: bool = False,
+        fetch_size: int = 1000,
+        spill_threshold: int | None = None,
+        cache_size: int | None = None,
+        cache_ttl: float | None = None,
+        max_workers: int = 4,
+        schema_cache_dir: Path | None = None,
+        query_timeout: float | None = None,
+        max_rows: int | None = None,
+        max_stored_results: int = 20,
+        columnar_results: bool = False,
+        validate_queries: bool = True,
+        max_query_cost: float | None = None,
+    ):
+        """Initialize database connection and load the schema.
+
+        Tables are reflected lazily when they are first accessed. If `schema_cache_dir` is provided and the
+        database supports catalog fingerprints, reflected tables are persisted so that later runs only need
+        to run a single fingerprint query at startup.
 
         Args:
             db_uri: SQLAlchemy connection string for the database
+            stream_results: Whether to stream query results using server-side cursors by default,
+                instead of fetching all rows into memory
+            fetch_size: Number of rows to fetch per batch from server-side cursors
+            spill_threshold: Estimated size (in bytes) of a query result after which its rows are spilled
+                to a temporary file on disk instead of being kept in memory. If None, results are never spilled.
+            cache_size: Memory budget (in bytes) for caching query results. If None, results are not cached.
+            cache_ttl: Time (in seconds) for which cached query results are valid. If None, they do not expire.
+            max_workers: Maximum number of threads used to run database operations for async callers.
+                Also sets the size of the connection pool, so that many queries can run concurrently.
+            schema_cache_dir: Directory to persist the reflected schema in. If None, the schema is not cached.
+            query_timeout: Time (in seconds) after which a running query is cancelled. Set as a statement
+                timeout on the server for dialects which support it (PostgreSQL and MySQL), and enforced by
+                cancelling the query from a watchdog thread otherwise. If None, queries can run indefinitely.
+            max_rows: Maximum number of rows fetched for a query, any further rows are discarded.
+                If None, all rows are fetched.
+            max_stored_results: Number of recent query results kept in the result history. Each query gets
+                its own result, so concurrent queries don't overwrite each other's results. Only the `max_workers`
+                most recent streamed results keep their server-side cursor (and connection) open, so the results
+                in the history can't exhaust the connection pool.
+            columnar_results: Whether to store query results in memory column by column, using typed arrays
+                and dictionary encoding, which uses much less memory than a list of rows for large results.
+            validate_queries: Whether to check that the tables and columns referenced by a query exist (in the
+                reflected schema) before executing it. Queries are always checked to be read-only.
+            max_query_cost: Maximum estimated cost of a query, checked with EXPLAIN before the query is executed
+                (PostgreSQL, MySQL and SQLite only). The cost is in the planner's cost units on PostgreSQL, and
+                the estimated number of rows read on MySQL and SQLite. If None, the cost is not checked.
         """
-        self.engine = create_engine(db_uri)
-        self.metadata = MetaData()
-        self.metadata.reflect(bind=self.engine)
-        self.last_query: QueryResult | None = None
+        url = make_url(db_uri)
+        pool_options = {}
+        # Only dialects using a QueuePool (not e.g. in-memory SQLite) accept pool size options
+        if issubclass(url.get_dialect().get_pool_class(url), QueuePool):  # type: ignore[attr-defined]
+            # A connection for each worker thread, with overflow for streamed results which hold their connection
+            pool_options = {"pool_size": max_workers, "max_overflow": max_workers}
+        self.engine = create_engine(url, **pool_options)
+        self.stream_results = stream_results
+        self.fetch_size = fetch_size
+        self.spill_threshold = spill_threshold
+        self.columnar_results = columnar_results
+        self.validate_queries = validate_queries
+        self.max_query_cost = max_query_cost
+        self.query_timeout = query_timeout
+        self.max_rows = max_rows
+        self.result_cache: LRUCache[QueryResult] | None = (
+            LRUCache(max_size=cache_size, ttl=cache_ttl) if cache_size is not None else None
+        )
+        self.max_open_streams = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dbdex-db")
+        self._reflect_lock = threading.Lock()
+        self._running_queries: set[QueryGuard] = set()
+        self._running_queries_lock = threading.Lock()
+        self.catalog_fingerprint = get_catalog_fingerprint(self.engine)
+        self._schema_cache: SchemaCache | None = None
+        cached_schema: CachedSchema | None = None
+        if schema_cache_dir is not None and self.catalog_fingerprint is not None:
+            self._schema_cache = SchemaCache(schema_cache_dir, self.engine)
+            cached_schema = self._schema_cache.load(self.catalog_fingerprint)
+        if cached_schema is not None:
+            self.metadata = cached_schema.metadata
+            self._table_names = cached_schema.table_names
+        else:
+            self.metadata = MetaData()
+            self._table_names = inspect(self.engine).get_table_names()
+        self.max_stored_results = max_stored_results
+        self._results: OrderedDict[int, QueryResult] = OrderedDict()
+        self._results_lock = threading.Lock()
+        self._query_ids = count(1)
         logfire.instrument_sqlalchemy(engine=self.engine)
 
     @property
     def provider(self) -> str:
         return self.engine.dialect.name
 
-    def execute_sql(self, sql_query: str) -> QueryResult:
+    @cached_property
+    def schema_fingerprint(self) -> str:
+        """Hash of the schema, used to invalidate cached data when the schema changes.
+
+        Uses the catalog fingerprint if supported, otherwise the schema of all tables (which are reflected).
+        """
+        if self.catalog_fingerprint is not None:
+            return self.catalog_fingerprint
+        return tables_fingerprint(self.get_tables())
+
+    def _cache_key(self, sql_query: str, limit: int | None) -> tuple[str, int | None, str]:
+        """Key of a query in the result cache, including a hash of the schema so that cached results are invalidated
+        when it changes. Uses the catalog fingerprint if supported, otherwise the schema of the tables referenced by
+        the query, so that only those tables are reflected."""
+        if self.catalog_fingerprint is not None:
+            fingerprint = self.catalog_fingerprint
+        else:
+            table_names = sorted(set(table_aliases(sql_query, self).values()))
+            fingerprint = tables_fingerprint([self.get_table(name) for name in table_names])
+        return normalize_sql(sql_query), limit, fingerprint
+
+    @property
+    def cache_stats(self) -> CacheStats | None:
+        """Hit/miss statistics of the query result cache (if enabled)."""
+        return self.result_cache.stats() if self.result_cache is not None else None
+
+    def execute_sql(self, sql_query: str, stream: bool | None = None, limit: int | None = None) -> QueryResult:
         """Execute a SQL query and return results. Only allows SELECT style queries.
 
         Args:
-            query: SQL query string to execute
+            sql_query: SQL query string to execute
+            stream: Whether to stream the results using a server-side cursor (defaults to `stream_results`).
+                Streamed results only fetch the first row up front, use `QueryResult.head()` or
+                `QueryResult.iter_rows()` to fetch the rest.
+            limit: Maximum number of rows to fetch (the result is marked as `truncated` if there are more).
+                Pushed down to the database as a LIMIT clause where the query can be rewritten, so the database
+                does not compute and transfer the entire result. Limited results are never streamed.
 
         Returns:
-            List of dictionaries containing query results
+            QueryResult containing the query results
         """
-        if not sql_query.strip().startswith("SELECT"):
-            raise InvalidQueryError("Only SELECT style queries are allowed")
-
-        rows = []
+        if problems := validate_sql(sql_query, self, check_names=self.validate_queries):
+            raise InvalidQueryError("\n".join(problems))
+
+        if stream is None:
+            stream = self.stream_results
+        row_limit = min((n for n in (limit, self.max_rows) if n is not None), default=None)
+        executed_sql = sql_query
+        if limit is not None:
+            stream = False
+            # Fetch one more row to determine whether the result was truncated
+            executed_sql = add_limit(sql_query, limit + 1, self.provider) or sql_query
+
+        cache_key = self._cache_key(sql_query, limit) if self.result_cache is not None else None
+        if (
+            self.result_cache is not None
+            and cache_key is not None
+            and (cached_result := self.result_cache.get(cache_key))
+        ):
+            result = replace(
+                cached_result,
+                sql=sql_query,
+                executed_at=datetime.now(),
+                duration=timedelta(0),
+                cached=True,
+                query_id=next(self._query_ids),
+            )
+            self._store_result(result)
+            return result
+
+        if self.max_query_cost is not None:
+            self.check_query_cost(executed_sql)
+
+        rows: list[Row[Any]] | ColumnarRows | SpilledRows = []
+        row_stream: Iterator[Row[Any]] | None = None
         error = None
+        truncated = False
+        start_time = datetime.now()
+        try:
+            if stream:
+                row_stream = self.stream_sql(sql_query)
+                # Fetch first row to execute the query and determine the columns
+                rows = list(islice(row_stream, 1))
+                if not rows:
+                    row_stream = None
+            else:
+                with self.engine.connect() as conn, self._guard_query(conn):
+                    self._set_statement_timeout(conn)
+                    if self.spill_threshold is not None:
+                        # Avoid the driver buffering the entire result in memory before it can be spilled
+                        conn = conn.execution_options(stream_results=True, yield_per=self.fetch_size)
+                    sql_result = conn.execute(text(executed_sql))
+                    if sql_result.returns_rows:
+                        rows = collect_rows(
+                            islice(sql_result, row_limit),
+                            list(sql_result.keys()),
+                            self.spill_threshold,
+                            columnar=self.columnar_results,
+                        )
+                        # Fetch one more row to determine whether the result was truncated
+                        truncated = row_limit is not None and sql_result.fetchone() is not None
+        except Exception as e:
+            # When an error occurs, details are stored in the result history, but
+            # exception is re-raised
+            error = e
+            raise
+        finally:
+            duration = datetime.now() - start_time
+            result = QueryResult(
+                sql=sql_query,
+                rows=rows,
+                executed_at=start_time,
+                duration=duration,
+                error=error,
+                complete=row_stream is None,
+                row_stream=row_stream,
+                restream=partial(self.stream_sql, sql_query) if row_stream is not None else None,
+                timed_out=isinstance(error, QueryTimeoutError),
+                cancelled=isinstance(error, QueryCancelledError),
+                truncated=truncated,
+                limited=truncated and limit is not None and (self.max_rows is None or limit < self.max_rows),
+                query_id=next(self._query_ids),
+            )
+            self._store_result(result)
+
+        # Only complete in-memory results are cached, streamed results are incomplete and spilled ones are too large
+        if (
+            self.result_cache is not None
+            and cache_key is not None
+            and result.complete
+            and not isinstance(result.rows, SpilledRows)
+        ):
+            size = result.rows.nbytes if isinstance(result.rows, ColumnarRows) else estimate_batch_size(result.rows)
+            self.result_cache.put(cache_key, result, size=size)
+
+        return result
+
+    def full_result(self, result: QueryResult) -> QueryResult:
+        """Get the entire result of a query whose result was limited (see `QueryResult.limited`), by executing it
+        again without the limit. The rows are streamed, so only those which are displayed or exported are fetched.
+        Other results are returned as they are."""
+        if not result.limited:
+            return result
+        return self.execute_sql(result.sql, stream=True)
+
+    async def execute_sql_async(
+        self, sql_query: str, stream: bool | None = None, limit: int | None = None
+    ) -> QueryResult:
+        """Execute a SQL query without blocking the event loop. See `execute_sql()`."""
+        return await self.run_in_executor(self.execute_sql, sql_query, stream=stream, limit=limit)
+
+    def count_rows(self, sql_query: str, mode: RowCountMode = "exact") -> int | None:
+        """Count the rows in the result of a SELECT query without fetching them.
+
+        Args:
+            sql_query: SQL query whose result to count
+            mode: "exact" to run a COUNT(*) over the query, "estimate" to use the query planner's estimate
+                (only supported for PostgreSQL), or "none" to not count the rows
+
+        Returns:
+            Number of rows, or None if the rows are not counted or no estimate is available
+        """
+        if mode == "none":
+            return None
+        with self.engine.connect() as conn, self._guard_query(conn):
+            self._set_statement_timeout(conn)
+            if mode == "exact":
+                return conn.execute(text(count_query(sql_query))).scalar_one()
+            if self.provider == "postgresql":
+                plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {strip_sql(sql_query)}")).scalar_one()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]["Plan"]["Plan Rows"])
+        return None
+
+    def explain(self, sql_query: str) -> QueryPlan | None:
+        """Get the query planner's estimate of the cost of a query, or None if not supported for the dialect."""
+        aliases = table_aliases(sql_query, self)
+        with self.engine.connect() as conn, self._guard_query(conn):
+            self._set_statement_timeout(conn)
+            return explain_query(conn, sql_query, self.provider, aliases)
+
+    def check_query_cost(self, sql_query: str) -> None:
+        """Raise a `QueryTooExpensiveError` if the estimated cost of a query exceeds `max_query_cost`, describing
+        the most expensive steps of its plan and the indexes of the tables it reads, so it can be rewritten."""
+        if self.max_query_cost is None:
+            return
+        try:
+            plan = self.explain(sql_query)
+        except (QueryTimeoutError, QueryCancelledError):
+            raise
+        except Exception as e:
+            # EXPLAIN fails if the query itself is invalid, in which case the error is raised when it is executed
+            logfire.warn("Failed to explain query: {error}", error=str(e))
+            return
+        if plan is None or plan.cost <= self.max_query_cost:
+            return
+
+        lines = [
+            f"Query not executed because its estimated cost of {plan.cost:,.0f} {plan.unit} exceeds the maximum "
+            f"of {self.max_query_cost:,.0f}. Most expensive steps of the query plan:"
+        ]
+        for node in plan.expensive_nodes():
+            rows = f" (~{node.rows:,.0f} rows)" if node.rows is not None else ""
+            lines.append(f"- {node.description}{rows}")
+        tables = [table for table in plan.tables if table in self._table_names]
+        if tables:
+            lines.append("Indexes of the tables read by the query:")
+            lines += [f"- {table}: {format_table_indexes(self.get_table(table))}" for table in tables]
+        lines.append(
+            "Rewrite the query to read fewer rows, e.g. by filtering or joining on indexed columns, "
+            "or with a more selective filter."
+        )
+        raise QueryTooExpensiveError("\n".join(lines))
+
+    async def run_in_executor(self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """Run a blocking database operation (e.g. fetching rows of a streamed result) in the database
+        thread pool, so it does not block the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    @property
+    def last_query(self) -> QueryResult | None:
+        """Result of the most recently completed query."""
+        with self._results_lock:
+            return next(reversed(self._results.values()), None)
+
+    def get_result(self, query_id: int) -> QueryResult | None:
+        """Get the result of a query by its ID, or None if it is not (or no longer) in the result history."""
+        with self._results_lock:
+            return self._results.get(query_id)
+
+    def _store_result(self, result: QueryResult) -> None:
+        """Add a result to the result history, closing the oldest results once it is full, and the cursors of
+        streamed results beyond the `max_open_streams` most recent ones."""
+        assert result.query_id is not None
+        with self._results_lock:
+            self._results[result.query_id] = result
+            evicted = []
+            while len(self._results) > self.max_stored_results:
+                evicted.append(self._results.popitem(last=False)[1])
+            streamed = [stored for stored in reversed(self._results.values()) if stored.row_stream is not None]
+        for evicted_result in evicted:
+            evicted_result.close()
+        for streamed_result in streamed[self.max_open_streams :]:
+            streamed_result.close_stream()
+
+    def stream_sql(self, sql_query: str) -> Iterator[Row[Any]]:
+        """Execute a SQL query using a server-side cursor and lazily yield the resulting rows (up to `max_rows`).
+
+        The connection is held until the iterator is exhausted or closed. The query timeout applies to
+        executing the query and fetching each batch of rows, not to the time the iterator is held open.
+        """
         with self.engine.connect() as conn:
-            start_time = datetime.now()
-            try:
-                sql_result = conn.execute(text(sql_query))
-                if sql_result.returns_rows:
-                    rows = list(sql_result)
-            except Exception as e:
-                # When an error occurs, details are stored in last_query, but
-                # exception is re-raised
-                error = e
-                raise
-            finally:
-                duration = datetime.now() - start_time
-                result = QueryResult(
-                    sql=sql_query,
-                    rows=rows,
-                    executed_at=start_time,
-                    duration=duration,
-                    error=error,
+            self._set_statement_timeout(conn)
+            with self._guard_query(conn):
+                sql_result = conn.execution_options(stream_results=True, yield_per=self.fetch_size).execute(
+                    text(sql_query)
                 )
-                self.last_query = result
+            if not sql_result.returns_rows:
+                return
+            rows = islice(sql_result, self.max_rows)
+            while True:
+                with self._guard_query(conn):
+                    batch = list(islice(rows, self.fetch_size))
+                yield from batch
+                if len(batch) < self.fetch_size:
+                    break
+
+    def cancel_queries(self) -> int:
+        """Cancel all running queries on the database server. Returns the number of queries cancelled."""
+        with self._running_queries_lock:
+            running_queries = list(self._running_queries)
+        for guard in running_queries:
+            guard.cancel()
+        return len(running_queries)
+
+    @contextmanager
+    def _guard_query(self, conn: Connection) -> Iterator[QueryGuard]:
+        """Track the query run on the connection within the context, so it can be cancelled, and enforce
+        the query timeout. Errors caused by cancelling the query are raised as `QueryTimeoutError` or
+        `QueryCancelledError`."""
+        guard = QueryGuard(conn.connection.dbapi_connection, self._cancel_on_server)
+        watchdog = None
+        if self.query_timeout is not None:
+            watchdog = threading.Timer(self.query_timeout, guard.timeout)
+            watchdog.daemon = True
+            watchdog.start()
+        with self._running_queries_lock:
+            self._running_queries.add(guard)
+        start_time = time.monotonic()
+        try:
+            yield guard
+        except Exception as e:
+            # The server may enforce the statement timeout before the watchdog fires
+            if guard.timed_out or (
+                self.query_timeout is not None and time.monotonic() - start_time >= self.query_timeout
+            ):
+                raise QueryTimeoutError(f"Query exceeded the timeout of {self.query_timeout}s and was cancelled") from e
+            if guard.cancelled:
+                raise QueryCancelledError("Query was cancelled") from e
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            with self._running_queries_lock:
+                self._running_queries.discard(guard)
+
+    def _set_statement_timeout(self, conn: Connection) -> None:
+        """Set the query timeout as a statement timeout on the server, for dialects which support it."""
+        if self.query_timeout is None:
+            return
+        timeout_ms = max(1, int(self.query_timeout * 1000))
+        if self.provider == "postgresql":
+            # Only applies to the current transaction, which ends when the connection is returned to the pool
+            conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+        elif self.provider == "mysql":
+            conn.execute(text(f"SET SESSION max_execution_time = {timeout_ms}"))
+
+    def _cancel_on_server(self, dbapi_connection: Any) -> None:
+        """Cancel the query running on a DBAPI connection, using the mechanism supported by the driver."""
+        if self.provider == "mysql":
+            # MySQL drivers can't cancel a query on the same connection, so kill it from another one
+            with self.engine.connect() as conn:
+                conn.execute(text(f"KILL QUERY {int(dbapi_connection.thread_id())}"))
+        elif hasattr(dbapi_connection, "interrupt"):
+            # sqlite3
+            dbapi_connection.interrupt()
+        elif hasattr(dbapi_connection, "cancel"):
+            # psycopg, psycopg2, oracledb
+            dbapi_connection.cancel()
+        else:
+            raise NotImplementedError(f"Cancelling queries is not supported for {self.provider}")
 
-        return result
+    @cached_property
+    def view_names(self) -> list[str]:
+        """Names of the views in the database (which are not included in `table_names`)."""
+        return inspect(self.engine).get_view_names()
 
     @property
     def table_names(self) -> list[str]:
-        return list(self.metadata.tables.keys())
+        return list(self._table_names)
+
+    def get_table(self, table_name: str) -> Table:
+        """Get a table by name, reflecting it from the database if it has not been reflected yet."""
+        if table_name not in self._table_names:
+            raise TableNotFoundError(f"Invalid table name: '{table_name}'")
+        self._reflect_tables([table_name])
+        return self.metadata.tables[table_name]
 
     def get_tables(self) -> list[Table]:
-        """Get list of all tables in the database.
+        """Get list of all tables in the database, reflecting any which have not been reflected yet.
 
         Returns:
-            List of table names
+            List of tables
         """
-        return list(self.metadata.tables.values())
+        self._reflect_tables(self._table_names)
+        return [self.metadata.tables[table_name] for table_name in self._table_names]
+
+    def _reflect_tables(self, table_names: list[str]) -> None:
+        """Reflect the given tables if they have not been reflected yet, and update the schema cache."""
+        with self._reflect_lock:
+            missing = [table_name for table_name in table_names if table_name not in self.metadata.tables]
+            if not missing:
+                return
+            self.metadata.reflect(bind=self.engine, only=missing)
+            if self._schema_cache is not None and self.catalog_fingerprint is not None:
+                self._schema_cache.save(CachedSchema(self.catalog_fingerprint, self._table_names, self.metadata))
+
+    @cached_property
+    def schema_index(self) -> SchemaIndex:
+        """Lexical search index over all tables of the database (which are reflected when it is first built)."""
+        return SchemaIndex(self.get_tables())
+
+    def describe_schema(self, table_names: list[str] | None = None, schema_format: SchemaFormat = "full") -> str:
+        """Get a sring representation of the structure of tables in the database (all by default)
 
-    def describe_schema(self, table_names: list[str] | None = None) -> str:
-        """Get a sring representation of the structure of tables in the database (all by default)"""
+        Args:
+            table_names: Names of tables to describe (all by default)
+            schema_format: "full" for a readable multi-line description of each table, or "compact" for
+                a token-efficient description with one line per table
+        """
         if table_names:
-            try:
-                tables = [self.metadata.tables[table] for table in table_names]
-            except KeyError as e:
-                raise TableNotFoundError(f"Invalid table name: {e}") from e
+            tables = [self.get_table(table) for table in table_names]
         else:
             tables = self.get_tables()
+        if schema_format == "compact":
+            return "\n".join([COMPACT_SCHEMA_LEGEND] + [format_table_schema_compact(table) for table in tables])
         return "\n\n".join(format_table_schema(table) for table in tables)
 
 
+def tables_fingerprint(tables: list[Table]) -> str:
+    """Hash of the names and column types of tables."""
+    schema_hash = hashlib.sha256()
+    for table in tables:
+        schema_hash.update(table.name.encode())
+        for column in table.columns:
+            schema_hash.update(f"{column.name}:{column.type}".encode())
+    return schema_hash.hexdigest()
+
+
 def format_table_schema(table: Table) -> str:
     """
     Formats a SQLAlchemy Table object into a schema string representation like:
@@ -208,19 +811,7 @@ def format_table_schema(table: Table) -> str:
     # Format indexes
     schema_lines.append("    INDEXES")
     for index in table.indexes:
-        index_columns = []
-        for column in index.columns:
-            if (
-                index.dialect_options.get("postgresql_using", "") == "gin"
-                or index.dialect_options.get("postgresql_using", "") == "gist"
-            ):
-                index_columns.append(f"{column.name}")
-            elif column.name in index.kwargs.get("descending_cols", []):
-                index_columns.append(f"{column.name} DESC")
-            else:
-                index_columns.append(f"{column.name} ASC")
-        index_columns_str = ", ".join(index_columns)
-        schema_lines.append(f"        INDEX {index.name} ({index_columns_str}),")
+        schema_lines.append(f"        {format_index(index)},")
 
     schema_lines.append("    ---")
 
@@ -255,3 +846,90 @@ def format_table_schema(table: Table) -> str:
 
     schema_lines.append(")")
     return "\n".join(schema_lines)
+
+
+def format_index(index: Index) -> str:
+    """Format an index like `INDEX index_name (column_name [ASC|DESC], ...)`."""
+    index_columns = []
+    for column in index.columns:
+        if (
+            index.dialect_options.get("postgresql_using", "") == "gin"
+            or index.dialect_options.get("postgresql_using", "") == "gist"
+        ):
+            index_columns.append(f"{column.name}")
+        elif column.name in index.kwargs.get("descending_cols", []):
+            index_columns.append(f"{column.name} DESC")
+        else:
+            index_columns.append(f"{column.name} ASC")
+    index_columns_str = ", ".join(index_columns)
+    return f"INDEX {index.name} ({index_columns_str})"
+
+
+def format_table_indexes(table: Table) -> str:
+    """Format the primary key and indexes of a table on a single line."""
+    indexes = []
+    if table.primary_key.columns:
+        indexes.append(f"PRIMARY KEY ({', '.join(column.name for column in table.primary_key.columns)})")
+    indexes += [format_index(index) for index in table.indexes]
+    return ", ".join(indexes) or "no indexes"
+
+
+# Abbreviations of common (upper case) type names used by the compact schema format
+COMPACT_TYPE_NAMES = {
+    "INTEGER": "int",
+    "CHARACTER VARYING": "varchar",
+    "TIMESTAMP WITHOUT TIME ZONE": "timestamp",
+    "TIMESTAMP WITH TIME ZONE": "timestamptz",
+    "TIME WITHOUT TIME ZONE": "time",
+    "DOUBLE PRECISION": "double",
+    "BOOLEAN": "bool",
+}
+
+COMPACT_SCHEMA_LEGEND = "-- PK=primary key, NN=not null, UQ=unique, ->=foreign key, IDX=index"
+
+
+def format_compact_type(column_type: Any) -> str:
+    """Format a column type in abbreviated form, e.g. `CHARACTER VARYING(20)` becomes `varchar(20)`."""
+    type_str = str(column_type)
+    base, paren, args = type_str.partition("(")
+    base = COMPACT_TYPE_NAMES.get(base.strip().upper(), base.strip().lower())
+    return base + paren + args.replace(" ", "")
+
+
+def format_table_schema_compact(table: Table) -> str:
+    """
+    Formats a SQLAlchemy Table object into a token-efficient single line schema representation like:
+    orders(id int PK, customer_id int NN ->customers.id, status varchar(20) UQ) IDX(customer_id,status)
+    """
+    foreign_keys: dict[str, str] = {}
+    for fk_constraint in table.constraints:
+        if isinstance(fk_constraint, ForeignKeyConstraint):
+            for fk in fk_constraint.elements:
+                foreign_keys[fk.parent.name] = f"{fk.column.table.name}.{fk.column.name}"
+
+    column_definitions = []
+    for column in table.columns:
+        parts = [column.name, format_compact_type(column.type)]
+        if column.primary_key:
+            parts.append("PK")
+        elif not column.nullable:
+            parts.append("NN")
+        if column.unique:
+            parts.append("UQ")
+        if column.default:
+            parts.append(f"={column.default.arg}")  # type: ignore
+        if column.name in foreign_keys:
+            parts.append(f"->{foreign_keys[column.name]}")
+        column_definitions.append(" ".join(parts))
+
+    schema = f"{table.name}({', '.join(column_definitions)})"
+
+    for index in table.indexes:
+        index_columns = ",".join(column.name for column in index.columns)
+        schema += f" UQ({index_columns})" if index.unique else f" IDX({index_columns})"
+
+    for unique_constraint in table.constraints:
+        if isinstance(unique_constraint, UniqueConstraint):
+            schema += f" UQ({','.join(column.name for column in unique_constraint.columns)})"
+
+    return schema
@@ -2,16 +2,30 @@ from dataclasses import dataclass
 
 from rich.console import Console
 
-from dbdex.database import Database
+from dbdex.database import Database, RowCountMode, SchemaFormat
+from dbdex.summary import SummaryMode
 
 
-@dataclass
+@dataclass(kw_only=True)
 class AgentDeps:
     database: Database
     # Maximum number of DB result values (rows X columns) to return to the LLM
     max_return_values: int
+    # Format of table schemas provided to the LLM
+    schema_format: SchemaFormat = "full"
+    # Whether to push a LIMIT down into queries run by the LLM, so only the rows returned to it are fetched
+    pushdown_limit: bool = False
+    # How to count the rows of results truncated by the pushed down LIMIT (see `Database.count_rows()`)
+    row_count_mode: RowCountMode = "exact"
+    # Whether to return statistics of each column for results with more rows than are returned to the LLM
+    result_summary: SummaryMode = "off"
+    # Approximate number of tokens of result data returned to the LLM per query (encoded as tab-separated values).
+    # If None, results are returned as JSON lists limited only by `max_return_values`.
+    response_token_budget: int | None = None
 
 
-@dataclass
+@dataclass(kw_only=True)
 class CLIAgentDeps(AgentDeps):
     console: Console
+    # Number of result rows to display per page
+    page_size: int = 50
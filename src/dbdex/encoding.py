@@ -0,0 +1,111 @@
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+
+from dbdex.tokens import estimate_tokens
+
+# Values longer than this (in characters) are truncated
+MAX_VALUE_LENGTH = 200
+# Columns are dropped (widest first) until at least this many rows fit in the token budget
+MIN_ENCODED_ROWS = 3
+NULL_VALUE = "NULL"
+# Escape sequences for characters which would break the tabular layout
+ESCAPES = str.maketrans({"\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+@dataclass
+class EncodedRows:
+    """Rows encoded as tab-separated values (with a header line) to fit a token budget."""
+
+    text: str
+    # Number of rows included in `text`
+    row_count: int
+    # Estimated number of tokens in `text`
+    tokens: int
+    # Columns in which values were truncated
+    truncated_columns: list[str] = field(default_factory=list)
+    # Columns which were dropped to fit the token budget
+    omitted_columns: list[str] = field(default_factory=list)
+
+    def describe_omissions(self, total_rows: int, max_value_length: int = MAX_VALUE_LENGTH) -> str | None:
+        """Describe what was left out to fit the token budget, or None if nothing was."""
+        parts = []
+        if self.row_count < total_rows:
+            parts.append(f"only the first {self.row_count} of {total_rows} rows are included")
+        if self.omitted_columns:
+            parts.append(f"columns omitted: {', '.join(self.omitted_columns)}")
+        if self.truncated_columns:
+            parts.append(
+                f"values longer than {max_value_length} characters truncated in columns: "
+                f"{', '.join(self.truncated_columns)}"
+            )
+        if not parts:
+            return None
+        return "To fit the token budget, " + "; ".join(parts)
+
+
+def format_value(value: Any, max_value_length: int = MAX_VALUE_LENGTH) -> tuple[str, bool]:
+    """Format a value for tab-separated output. Returns the formatted value and whether it was truncated."""
+    if value is None:
+        return NULL_VALUE, False
+    text = str(value).translate(ESCAPES)
+    if len(text) > max_value_length:
+        return f"{text[:max_value_length]}…(+{len(text) - max_value_length} chars)", True
+    return text, False
+
+
+def encode_rows(
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    token_budget: int,
+    max_value_length: int = MAX_VALUE_LENGTH,
+) -> EncodedRows:
+    """Encode rows as tab-separated values, including as many rows as fit within the token budget.
+
+    Long values are truncated, and if not even `MIN_ENCODED_ROWS` rows fit, the columns which use the most
+    tokens are dropped until they do (keeping at least one column).
+    """
+    header = [name.translate(ESCAPES) for name in columns]
+    cells = []
+    truncated_column_indexes = set()
+    for row in rows:
+        row_cells = []
+        for i, value in enumerate(row):
+            text, truncated = format_value(value, max_value_length)
+            if truncated:
+                truncated_column_indexes.add(i)
+            row_cells.append(text)
+        cells.append(row_cells)
+
+    # Each cell is followed by a separator (tab or newline)
+    header_costs = [estimate_tokens(name) + 1 for name in header]
+    cell_costs = [[estimate_tokens(text) + 1 for text in row_cells] for row_cells in cells]
+
+    kept = list(range(len(columns)))
+    min_rows = cell_costs[:MIN_ENCODED_ROWS]
+    while len(kept) > 1 and sum(header_costs[i] + sum(row[i] for row in min_rows) for i in kept) > token_budget:
+        widest = max(kept, key=lambda i: header_costs[i] + sum(row[i] for row in min_rows))
+        kept.remove(widest)
+
+    tokens = sum(header_costs[i] for i in kept)
+    lines = ["\t".join(header[i] for i in kept)]
+    for row_cells, row_costs in zip(cells, cell_costs, strict=True):
+        row_tokens = sum(row_costs[i] for i in kept)
+        if tokens + row_tokens > token_budget:
+            break
+        tokens += row_tokens
+        lines.append("\t".join(row_cells[i] for i in kept))
+
+    row_count = len(lines) - 1
+    return EncodedRows(
+        text="\n".join(lines),
+        row_count=row_count,
+        tokens=tokens,
+        # Only report truncation in columns and rows which are included
+        truncated_columns=[
+            columns[i]
+            for i in kept
+            if i in truncated_column_indexes
+            and any(len(row_cells[i]) > max_value_length for row_cells in cells[:row_count])
+        ],
+        omitted_columns=[name for i, name in enumerate(columns) if i not in kept],
+    )
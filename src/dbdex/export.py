@@ -0,0 +1,165 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Literal, Sequence
+
+ExportFormat = Literal["csv", "jsonl", "parquet"]
+Compression = Literal["gzip", "zstd"]
+
+FORMAT_EXTENSIONS: dict[str, ExportFormat] = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+}
+COMPRESSION_EXTENSIONS: dict[str, Compression] = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+}
+
+# Number of rows written to the file at a time
+EXPORT_CHUNK_SIZE = 10_000
+
+
+class ExportError(Exception):
+    """Exception raised when query results cannot be exported."""
+
+
+def detect_format(path: Path) -> tuple[ExportFormat, Compression | None] | None:
+    """Detect the export format and compression from the file extension(s), e.g. `results.csv.gz`.
+
+    Returns None if the file extension is not a supported format.
+    """
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    compression = COMPRESSION_EXTENSIONS.get(suffixes[-1]) if suffixes else None
+    if compression is not None:
+        suffixes = suffixes[:-1]
+    if not suffixes or suffixes[-1] not in FORMAT_EXTENSIONS:
+        return None
+    return FORMAT_EXTENSIONS[suffixes[-1]], compression
+
+
+def export_rows(
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    path: Path,
+    export_format: ExportFormat,
+    compression: Compression | None = None,
+) -> int:
+    """Stream rows to a file in chunks, so the entire result never has to be held in memory.
+
+    Rows are written to a temporary file next to `path`, which replaces `path` only once every row has been
+    written, so a failed export doesn't leave a partial file behind.
+
+    Args:
+        columns: Column names
+        rows: Rows to export (e.g. lazily fetched from a server-side cursor)
+        path: File to write to
+        export_format: Format of the file
+        compression: Compression to apply to the file (for Parquet files, the compression codec used internally)
+
+    Returns:
+        Number of rows exported
+    """
+    fd, partial_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".partial")
+    os.close(fd)
+    partial_path = Path(partial_name)
+    try:
+        if export_format == "parquet":
+            row_count = _export_parquet(columns, rows, partial_path, compression)
+        else:
+            row_count = _export_text(columns, rows, partial_path, export_format, compression)
+        partial_path.replace(path)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+    return row_count
+
+
+def _export_text(
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    path: Path,
+    export_format: ExportFormat,
+    compression: Compression | None,
+) -> int:
+    with _open_text(path, compression) as f:
+        if export_format == "csv":
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(columns)
+            return _write_chunks(rows, writer.writerows)
+
+        def write_json_lines(chunk: list[Sequence[Any]]) -> None:
+            f.writelines(json.dumps(dict(zip(columns, row, strict=True)), default=str) + "\n" for row in chunk)
+
+        return _write_chunks(rows, write_json_lines)
+
+
+def _write_chunks(rows: Iterable[Sequence[Any]], write_chunk: Callable[[list[Sequence[Any]]], Any]) -> int:
+    row_count = 0
+    row_iter = iter(rows)
+    while chunk := list(islice(row_iter, EXPORT_CHUNK_SIZE)):
+        write_chunk(chunk)
+        row_count += len(chunk)
+    return row_count
+
+
+def _open_text(path: Path, compression: Compression | None) -> IO[str]:
+    if compression == "gzip":
+        return gzip.open(path, "wt", newline="")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ExportError("zstd compression requires the zstandard package: pip install dbdex[export]") from e
+        return zstandard.open(path, "wt", newline="")
+    return path.open("wt", newline="")
+
+
+def _export_parquet(
+    columns: Sequence[str], rows: Iterable[Sequence[Any]], path: Path, compression: Compression | None
+) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ExportError("Parquet export requires the pyarrow package: pip install dbdex[export]") from e
+
+    writer: pq.ParquetWriter | None = None
+    schema: pa.Schema | None = None
+
+    def write_chunk(chunk: list[Sequence[Any]]) -> None:
+        nonlocal writer, schema
+        column_values = [list(values) for values in zip(*chunk, strict=True)]
+        if schema is None:
+            # Infer the schema from the first chunk, storing columns which only contain NULLs as strings
+            inferred_types = [pa.array(values).type for values in column_values]
+            schema = pa.schema(
+                [
+                    pa.field(name, pa.string() if pa.types.is_null(value_type) else value_type)
+                    for name, value_type in zip(columns, inferred_types, strict=True)
+                ]
+            )
+            writer = pq.ParquetWriter(path, schema, compression=compression or "snappy")
+        assert schema is not None
+        try:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(column_values, schema, strict=True)]
+            table = pa.Table.from_arrays(arrays, schema=schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ExportError(f"Column values do not match the inferred Parquet schema: {e}") from e
+        assert writer is not None
+        writer.write_table(table)
+
+    try:
+        row_count = _write_chunks(rows, write_chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # No rows, write a file containing just the columns
+        pq.write_table(pa.table({name: pa.array([], type=pa.string()) for name in columns}), path)
+    return row_count
@@ -0,0 +1,167 @@
+from dataclasses import dataclass, replace
+from typing import Sequence
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelRequestPart,
+    ModelResponse,
+    RetryPromptPart,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from dbdex.tokens import estimate_tokens
+
+# Length (in characters) of the final answer kept when a turn is summarized
+SUMMARY_ANSWER_LENGTH = 300
+
+
+@dataclass
+class CompactionPolicy:
+    """How the message history of an agent is compacted between turns, so the size of each request to the model
+    stays roughly constant in long sessions.
+
+    Turns older than the most recent `keep_recent_turns` have their tool outputs replaced by short stubs. If the
+    history still exceeds `max_history_tokens`, the oldest turns are summarized (keeping only the user's question
+    and an excerpt of the final answer), and dropped entirely if that is not enough.
+    """
+
+    # Number of most recent turns which are kept in full
+    keep_recent_turns: int = 2
+    # Whether to replace tool outputs of older turns with stubs
+    stub_tool_returns: bool = True
+    # Maximum estimated number of tokens in the message history, or None for no limit
+    max_history_tokens: int | None = None
+
+
+@dataclass
+class TurnUsage:
+    """Token accounting for a single turn (user query) of an agent session."""
+
+    turn: int
+    # Number of requests made to the model
+    requests: int
+    # Tokens reported by the model (None if the model does not report usage)
+    request_tokens: int | None
+    response_tokens: int | None
+    # Estimated tokens in the message history at the end of the turn, before and after compaction
+    history_tokens: int
+    compacted_history_tokens: int
+    # Time taken to answer the query (None if not measured)
+    seconds: float | None = None
+
+
+def estimate_message_tokens(messages: Sequence[ModelMessage]) -> int:
+    """Estimate the number of tokens the messages use when sent to the model."""
+    tokens = 0
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, (SystemPromptPart, UserPromptPart, TextPart)):
+                tokens += estimate_tokens(part.content)
+            elif isinstance(part, ToolReturnPart):
+                tokens += estimate_tokens(part.model_response_str())
+            elif isinstance(part, ToolCallPart):
+                tokens += estimate_tokens(part.tool_name) + estimate_tokens(part.args_as_json_str())
+            elif isinstance(part, RetryPromptPart):
+                tokens += estimate_tokens(part.model_response())
+    return tokens
+
+
+def split_turns(messages: Sequence[ModelMessage]) -> list[list[ModelMessage]]:
+    """Split the message history into turns, each starting with a request containing a user prompt."""
+    turns: list[list[ModelMessage]] = []
+    for message in messages:
+        starts_turn = isinstance(message, ModelRequest) and any(
+            isinstance(part, UserPromptPart) for part in message.parts
+        )
+        if starts_turn or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def stub_tool_returns(turn: list[ModelMessage]) -> list[ModelMessage]:
+    """Replace the outputs of tools in a turn with short stubs."""
+    compacted: list[ModelMessage] = []
+    for message in turn:
+        if isinstance(message, ModelRequest) and any(isinstance(part, ToolReturnPart) for part in message.parts):
+            message = replace(
+                message,
+                parts=[
+                    replace(part, content=_tool_return_stub(part)) if isinstance(part, ToolReturnPart) else part
+                    for part in message.parts
+                ],
+            )
+        compacted.append(message)
+    return compacted
+
+
+def _tool_return_stub(part: ToolReturnPart) -> str:
+    if isinstance(part.content, str) and part.content.startswith("[Output of"):
+        return part.content
+    stub = f"[Output of {part.tool_name} omitted from the history to save space"
+    query_id = getattr(part.content, "query_id", None)
+    if query_id is not None:
+        stub += f", query_id {query_id}"
+    return stub + "]"
+
+
+def summarize_turn(turn: list[ModelMessage]) -> list[ModelMessage]:
+    """Summarize a turn as the user's question and an excerpt of the final answer (without any tool calls)."""
+    prompts = [part for part in turn[0].parts if isinstance(part, (SystemPromptPart, UserPromptPart))]
+    answer = ""
+    for message in reversed(turn):
+        if isinstance(message, ModelResponse):
+            answer = "".join(part.content for part in message.parts if isinstance(part, TextPart))
+            if answer:
+                break
+    if len(answer) > SUMMARY_ANSWER_LENGTH:
+        answer = answer[:SUMMARY_ANSWER_LENGTH] + "... [answer truncated in the history]"
+    summary: list[ModelMessage] = [ModelRequest(parts=list(prompts))]
+    if answer:
+        summary.append(ModelResponse(parts=[TextPart(answer)]))
+    return summary
+
+
+def compact_history(messages: list[ModelMessage], policy: CompactionPolicy) -> list[ModelMessage]:
+    """Compact the message history according to the policy. System prompts are always kept."""
+    turns = split_turns(messages)
+    old_turn_count = max(0, len(turns) - policy.keep_recent_turns)
+    if policy.stub_tool_returns:
+        turns = [stub_tool_returns(turn) if i < old_turn_count else turn for i, turn in enumerate(turns)]
+
+    if policy.max_history_tokens is not None:
+        turn_tokens = [estimate_message_tokens(turn) for turn in turns]
+        # Summarize, then drop, the oldest turns until the history fits (the most recent turns are always kept)
+        for i in range(old_turn_count):
+            if sum(turn_tokens) <= policy.max_history_tokens:
+                break
+            turns[i] = summarize_turn(turns[i])
+            turn_tokens[i] = estimate_message_tokens(turns[i])
+        for i in range(old_turn_count):
+            if sum(turn_tokens) <= policy.max_history_tokens:
+                break
+            system_prompts: list[ModelRequestPart] = [
+                part for part in turns[i][0].parts if isinstance(part, SystemPromptPart)
+            ]
+            turns[i] = [ModelRequest(parts=system_prompts)] if system_prompts else []
+            turn_tokens[i] = estimate_message_tokens(turns[i])
+
+    compacted = [message for turn in turns for message in turn]
+    return _merge_requests(compacted)
+
+
+def _merge_requests(messages: list[ModelMessage]) -> list[ModelMessage]:
+    """Merge consecutive requests (e.g. a system prompt left from a dropped turn and the next user prompt),
+    since models expect requests and responses to alternate."""
+    merged: list[ModelMessage] = []
+    for message in messages:
+        if merged and isinstance(message, ModelRequest) and isinstance(merged[-1], ModelRequest):
+            merged[-1] = ModelRequest(parts=[*merged[-1].parts, *message.parts])
+        else:
+            merged.append(message)
+    return merged
@@ -0,0 +1,167 @@
+import json
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+from sqlalchemy import Connection, text
+
+from dbdex.sql_rewrite import strip_sql
+
+# Unit of the estimated cost of a query for each dialect: PostgreSQL's planner estimates a cost, while MySQL and
+# SQLite estimate (or for SQLite, are estimated from table sizes) the number of rows read
+COST_UNITS = {"postgresql": "planner cost units", "mysql": "rows examined", "sqlite": "rows scanned"}
+# Number of most expensive plan nodes described
+MAX_EXPENSIVE_NODES = 5
+
+
+@dataclass
+class PlanNode:
+    """Step of a query plan."""
+
+    # e.g. "Seq Scan on orders" or "SCAN orders"
+    description: str
+    # Name of the table the step reads from (if any)
+    table: str | None
+    # Estimated number of rows the step produces (PostgreSQL) or reads (MySQL and SQLite)
+    rows: float | None
+    # Estimated cost of the step itself (excluding its inputs), in the dialect's cost unit
+    cost: float
+
+
+@dataclass
+class QueryPlan:
+    """Estimated cost of a query from the database's query planner."""
+
+    nodes: list[PlanNode]
+    # Estimated cost of the entire query, in `unit`
+    cost: float
+    unit: str
+
+    def expensive_nodes(self, n: int = MAX_EXPENSIVE_NODES) -> list[PlanNode]:
+        return sorted((node for node in self.nodes if node.cost > 0), key=lambda node: -node.cost)[:n]
+
+    @property
+    def tables(self) -> list[str]:
+        """Names of the tables the query reads from."""
+        return list(dict.fromkeys(node.table for node in self.nodes if node.table is not None))
+
+
+def explain_query(conn: Connection, sql: str, dialect: str, aliases: Mapping[str, str]) -> QueryPlan | None:
+    """Get the query planner's estimate of the cost of a query using EXPLAIN, without executing it.
+
+    Args:
+        conn: Connection to run EXPLAIN on
+        sql: Query to explain
+        dialect: Database dialect (PostgreSQL, MySQL and SQLite are supported)
+        aliases: Lower-cased table names and aliases used in the query -> table names, to find the tables
+            of plans which refer to tables by their alias
+
+    Returns:
+        The plan, or None if the dialect is not supported
+    """
+    sql = strip_sql(sql)
+    if dialect == "postgresql":
+        return _postgresql_plan(conn, sql)
+    if dialect in ("mysql", "mariadb"):
+        return _mysql_plan(conn, sql, aliases)
+    if dialect == "sqlite":
+        return _sqlite_plan(conn, sql, aliases)
+    return None
+
+
+def _postgresql_plan(conn: Connection, sql: str) -> QueryPlan:
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    nodes = []
+
+    def visit(node: dict[str, Any]) -> None:
+        children = node.get("Plans", [])
+        description = node["Node Type"]
+        if "Relation Name" in node:
+            description += f" on {node['Relation Name']}"
+        if "Index Name" in node:
+            description += f" using {node['Index Name']}"
+        nodes.append(
+            PlanNode(
+                description=description,
+                table=node.get("Relation Name"),
+                rows=node.get("Plan Rows"),
+                cost=max(0.0, node["Total Cost"] - sum(child["Total Cost"] for child in children)),
+            )
+        )
+        for child in children:
+            visit(child)
+
+    visit(root)
+    return QueryPlan(nodes, cost=root["Total Cost"], unit=COST_UNITS["postgresql"])
+
+
+def _mysql_plan(conn: Connection, sql: str, aliases: Mapping[str, str]) -> QueryPlan:
+    nodes = []
+    # Tables of each SELECT are joined with nested loops, so the rows examined for each are multiplied
+    rows_by_select: defaultdict[Any, list[float]] = defaultdict(list)
+    for row in conn.execute(text(f"EXPLAIN {sql}")).mappings():
+        rows = float(row["rows"] or 0)
+        table = row["table"]
+        access = "full table scan" if row["type"] == "ALL" else f"{row['type']} access"
+        if row["key"]:
+            access += f" using index {row['key']}"
+        nodes.append(
+            PlanNode(
+                description=f"{access} on {table}",
+                table=aliases.get(str(table).lower()) if table else None,
+                rows=rows,
+                cost=rows,
+            )
+        )
+        if rows:
+            rows_by_select[row["id"]].append(rows)
+    cost = sum(math.prod(rows) for rows in rows_by_select.values())
+    return QueryPlan(nodes, cost=cost, unit=COST_UNITS["mysql"])
+
+
+def _sqlite_plan(conn: Connection, sql: str, aliases: Mapping[str, str]) -> QueryPlan:
+    # SQLite's plan has no row estimates, so full scans are estimated by the size of the scanned tables
+    children: defaultdict[int, list[tuple[int, str]]] = defaultdict(list)
+    for node_id, parent, _, detail in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+        children[parent].append((node_id, detail))
+
+    nodes = []
+    table_rows: dict[str, int | None] = {}
+
+    def scanned_rows(table: str) -> int | None:
+        if table not in table_rows:
+            try:
+                # The largest rowid is a cheap upper bound of the row count (of tables with rowids)
+                table_rows[table] = conn.execute(text(f'SELECT MAX(_rowid_) FROM "{table}"')).scalar() or 0
+            except Exception:
+                table_rows[table] = None
+        return table_rows[table]
+
+    def cost(parent: int) -> float:
+        # Tables scanned under the same parent are joined with nested loops, and correlated subqueries
+        # are executed for each row of the loops
+        loops = 1.0
+        scans = False
+        correlated_cost = 0.0
+        other_cost = 0.0
+        for node_id, detail in children[parent]:
+            # e.g. "SCAN o", "SEARCH u USING INTEGER PRIMARY KEY (rowid=?)" or "SCAN TABLE orders AS o" (before 3.36)
+            words = [word for word in detail.split() if word != "TABLE"]
+            table = aliases.get(words[1].lower()) if len(words) > 1 else None
+            rows = scanned_rows(table) if words[0] == "SCAN" and table is not None else None
+            nodes.append(PlanNode(description=detail, table=table, rows=rows, cost=rows or 0))
+            if rows is not None:
+                loops *= max(rows, 1)
+                scans = True
+            if detail.startswith("CORRELATED"):
+                correlated_cost += cost(node_id)
+            else:
+                other_cost += cost(node_id)
+        return (loops if scans else 0) + loops * correlated_cost + other_cost
+
+    total = cost(0)
+    return QueryPlan(nodes, cost=total, unit=COST_UNITS["sqlite"])
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Sequence
+
+import logfire
+from pydantic_ai.messages import ModelMessage, ToolReturnPart
+
+from dbdex.database import Database
+
+# Bump when the format of the cache file changes
+QUESTION_CACHE_VERSION = 1
+# Least recently used questions are evicted beyond this many
+MAX_CACHED_QUESTIONS = 1000
+
+WORD_PATTERN = re.compile(r"[a-z0-9_]+")
+# Words which are ignored when matching similar questions. Only words which don't change the meaning of a
+# question are included, so e.g. "how many orders were there yesterday?" matches "how many orders yesterday"
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "there", "please", "me", "us", "i", "we",
+    "can", "could", "you", "tell", "give", "do", "does", "did", "of", "in", "on", "at", "for", "to",
+}  # fmt: skip
+
+
+def question_key(question: str) -> str:
+    """Normalize a question for matching: the lower case words of the question (without punctuation)
+    excluding stop words, in their original order."""
+    return " ".join(word for word in WORD_PATTERN.findall(question.lower()) if word not in STOP_WORDS)
+
+
+@dataclass
+class CachedQuestion:
+    """A question and the SQL query which answered it."""
+
+    question: str
+    sql: str
+    # Schema fingerprint of the database when the question was answered
+    fingerprint: str
+    last_used: float
+    hits: int = 0
+
+
+class QuestionCache:
+    """Persistent cache of questions (in natural language) and the SQL queries which answered them, so repeated
+    questions can be answered by running the query directly instead of asking the LLM.
+
+    Questions match if they are equal after normalizing case, punctuation and whitespace and removing stop
+    words (see `question_key`), which only takes a dictionary lookup. Entries are scoped by the schema
+    fingerprint, so they are not used once the schema changes.
+    """
+
+    def __init__(self, cache_dir: Path, database: Database, max_entries: int = MAX_CACHED_QUESTIONS):
+        """
+        Args:
+            cache_dir: Directory to store the cache file in
+            database: Database whose URI (without password) is used as the cache key
+            max_entries: Maximum number of questions kept, least recently used questions are evicted
+        """
+        db_key = hashlib.sha256(database.engine.url.render_as_string(hide_password=True).encode()).hexdigest()
+        self.path = cache_dir / f"questions-{db_key[:32]}.json"
+        self.database = database
+        self.max_entries = max_entries
+        # Question key -> entry
+        self._entries: dict[str, CachedQuestion] = {question_key(entry.question): entry for entry in self._load()}
+
+    def lookup(self, question: str) -> CachedQuestion | None:
+        """Find the cached query for a question (or a near match of it), or None if there is none."""
+        entry = self._entries.get(question_key(question))
+        if entry is None or entry.fingerprint != self.database.schema_fingerprint:
+            return None
+        entry.hits += 1
+        entry.last_used = time.time()
+        self._save()
+        return entry
+
+    def store(self, question: str, sql: str) -> None:
+        """Cache the query which answered a question, replacing any query cached for it."""
+        self._entries[question_key(question)] = CachedQuestion(
+            question, sql, self.database.schema_fingerprint, last_used=time.time()
+        )
+        if len(self._entries) > self.max_entries:
+            oldest = min(self._entries, key=lambda key: self._entries[key].last_used)
+            del self._entries[oldest]
+        self._save()
+
+    def remove(self, question: str) -> None:
+        """Remove a question (and any near match of it) from the cache."""
+        if self._entries.pop(question_key(question), None) is not None:
+            self._save()
+
+    def _load(self) -> list[CachedQuestion]:
+        try:
+            with self.path.open() as f:
+                data = json.load(f)
+            if data.get("version") != QUESTION_CACHE_VERSION:
+                return []
+            return [CachedQuestion(**entry) for entry in data["entries"]]
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logfire.warn("Failed to load question cache {path}: {error}", path=str(self.path), error=str(e))
+            return []
+
+    def _save(self) -> None:
+        data = {"version": QUESTION_CACHE_VERSION, "entries": [asdict(entry) for entry in self._entries.values()]}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so a concurrent reader never sees a partially written file
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with tmp_path.open("w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logfire.warn("Failed to save question cache {path}: {error}", path=str(self.path), error=str(e))
+
+
+def answering_query(messages: Sequence[ModelMessage], database: Database) -> str | None:
+    """Get the SQL of the query which answered a question, from the messages of the agent run which answered it.
+
+    Returns None unless exactly one distinct query was executed successfully, since answers combining several
+    queries (or none) can't be reproduced by running a single query.
+    """
+    queries = set()
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, ToolReturnPart) and part.tool_name == "execute_sql":
+                query_id = getattr(part.content, "query_id", None)
+                result = database.get_result(query_id) if query_id is not None else None
+                if result is None or result.error:
+                    return None
+                queries.add(result.sql)
+    return queries.pop() if len(queries) == 1 else None
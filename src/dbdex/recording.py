@@ -0,0 +1,208 @@
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+import logfire
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelResponse, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from dbdex.agent import AgentRunner
+from dbdex.cli.batch import executed_queries
+from dbdex.database import Database
+from dbdex.history import TurnUsage
+
+# Bump when the format of cassette files changes
+CASSETTE_VERSION = 1
+
+
+class ReplayError(Exception):
+    """Exception raised when a cassette can't be replayed."""
+
+
+@dataclass
+class RecordedTurn:
+    """A question of a recorded session, with the model's responses to it and what they resulted in."""
+
+    # ID of the conversation the turn is part of (turns of a session are replayed in order, with its history)
+    session: str
+    question: str
+    # Every message of the turn, from the question to the answer
+    messages: list[ModelMessage]
+    usage: dict[str, Any]
+    # Queries executed (see `dbdex.cli.batch.executed_queries`)
+    queries: list[dict[str, Any]]
+
+    @property
+    def responses(self) -> list[ModelResponse]:
+        return [message for message in self.messages if isinstance(message, ModelResponse)]
+
+
+class CassetteRecorder:
+    """Records the turns of agent sessions to a cassette file, which can be replayed offline without the model
+    (see `replay_cassette`).
+
+    The cassette is a JSONL file: a header line with the model and database, followed by a line for each turn,
+    appended as soon as the turn ends. Recording continues an existing cassette.
+    """
+
+    def __init__(self, path: Path, database: Database, model_name: str):
+        self.path = path
+        self.database = database
+        if not path.exists() or path.stat().st_size == 0:
+            header = {
+                "version": CASSETTE_VERSION,
+                "model": model_name,
+                "database": database.engine.url.render_as_string(hide_password=True),
+                "provider": database.provider,
+            }
+            self._append(header)
+
+    def record_turn(self, session: str, messages: Sequence[ModelMessage], usage: TurnUsage) -> None:
+        question = next(
+            (str(part.content) for message in messages for part in message.parts if isinstance(part, UserPromptPart)),
+            "",
+        )
+        self._append(
+            {
+                "session": session,
+                "question": question,
+                "messages": ModelMessagesTypeAdapter.dump_python(list(messages), mode="json"),
+                "usage": asdict(usage),
+                "queries": executed_queries(messages, self.database),
+            }
+        )
+
+    def _append(self, data: dict[str, Any]) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a") as f:
+                f.write(json.dumps(data, default=str) + "\n")
+        except Exception as e:
+            # Recording is best effort, it must not fail the session
+            logfire.warn("Failed to record to cassette {path}: {error}", path=str(self.path), error=str(e))
+
+
+def load_cassette(path: Path) -> tuple[dict[str, Any], list[RecordedTurn]]:
+    """Load a cassette file.
+
+    Returns:
+        The header of the cassette, and its recorded turns
+
+    Raises:
+        ReplayError: If the file is not a cassette of a supported version
+    """
+    with path.open() as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("version") != CASSETTE_VERSION:
+        raise ReplayError(f"{path} is not a cassette of version {CASSETTE_VERSION}")
+    turns = [
+        RecordedTurn(
+            session=line["session"],
+            question=line["question"],
+            messages=ModelMessagesTypeAdapter.validate_python(line["messages"]),
+            usage=line["usage"],
+            queries=line["queries"],
+        )
+        for line in lines[1:]
+    ]
+    return lines[0], turns
+
+
+# Responses the replay model returns for the session being replayed in the current task
+_replay_responses: ContextVar[Iterator[ModelResponse]] = ContextVar("replay_responses")
+
+
+def replay_model() -> FunctionModel:
+    """Model which returns the recorded responses of the session being replayed (by `replay_cassette`) in order,
+    regardless of the messages sent to it."""
+
+    # Async so it runs in the task of the session (sync functions run in a thread)
+    async def replay(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        try:
+            response = next(_replay_responses.get())
+        except (LookupError, StopIteration):
+            raise ReplayError("No recorded model response left to replay") from None
+        # The response is a new message of this run
+        return ModelResponse(parts=response.parts, model_name=response.model_name)
+
+    return FunctionModel(replay)
+
+
+@dataclass
+class ReplayedTurn:
+    """Outcome of replaying a recorded turn."""
+
+    session: str
+    question: str
+    # Time taken to answer the question when recorded (including the model) and when replayed (without it)
+    recorded_seconds: float | None
+    seconds: float
+    queries: list[dict[str, Any]]
+    error: str | None = None
+    # Differences between the recorded and the replayed queries, e.g. a query which now fails or returns
+    # a different number of rows
+    differences: list[str] = field(default_factory=list)
+
+
+def compare_queries(recorded: Sequence[dict[str, Any]], replayed: Sequence[dict[str, Any]]) -> list[str]:
+    differences = []
+    if len(recorded) != len(replayed):
+        differences.append(f"{len(replayed)} queries executed instead of {len(recorded)}")
+    for recorded_query, query in zip(recorded, replayed, strict=False):
+        if bool(recorded_query.get("error")) != bool(query.get("error")):
+            outcome = f"fails ({query['error']})" if query.get("error") else "succeeds"
+            differences.append(f"Query now {outcome}: {query['sql']}")
+        elif recorded_query.get("row_count") != query.get("row_count"):
+            differences.append(
+                f"Query returned {query.get('row_count')} rows instead of {recorded_query.get('row_count')}: "
+                f"{query['sql']}"
+            )
+    return differences
+
+
+async def replay_cassette(
+    agent_runner: AgentRunner[Any], turns: Sequence[RecordedTurn], concurrency: int = 1
+) -> list[ReplayedTurn]:
+    """Replay recorded sessions: each recorded question is asked again, with the model replaced by the recorded
+    responses, so tools and the database run for real (with the current code and settings) without the model.
+
+    Sessions are replayed concurrently (up to `concurrency` at a time), and the turns of each session in order.
+    `agent_runner` must use the model from `replay_model()`.
+    """
+    sessions: dict[str, list[RecordedTurn]] = {}
+    for turn in turns:
+        sessions.setdefault(turn.session, []).append(turn)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    replayed: list[ReplayedTurn] = []
+
+    async def replay_session(session_turns: list[RecordedTurn]) -> None:
+        async with semaphore:
+            runner = AgentRunner(agent_runner.agent, deps=agent_runner.deps, compaction=agent_runner.compaction)
+            for turn in session_turns:
+                _replay_responses.set(iter(turn.responses))
+                start = time.perf_counter()
+                error = None
+                try:
+                    await runner.run(turn.question)
+                    queries = executed_queries(runner.last_turn, runner.deps.database)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    queries = []
+                replayed_turn = ReplayedTurn(
+                    session=turn.session,
+                    question=turn.question,
+                    recorded_seconds=turn.usage.get("seconds"),
+                    seconds=time.perf_counter() - start,
+                    queries=queries,
+                    error=error,
+                )
+                if error is None:
+                    replayed_turn.differences = compare_queries(turn.queries, queries)
+                replayed.append(replayed_turn)
+
+    await asyncio.gather(*(replay_session(session_turns) for session_turns in sessions.values()))
+    return replayed
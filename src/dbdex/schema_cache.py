@@ -0,0 +1,130 @@
+import hashlib
+import os
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+
+import logfire
+import sqlalchemy
+from sqlalchemy import Engine, MetaData, text
+
+# Bump when the format of cached schema files changes
+SCHEMA_CACHE_VERSION = 1
+
+# Cheap catalog queries whose result changes whenever tables, columns, indexes or constraints change.
+# Dialects without a query here always reflect the schema from the database.
+CATALOG_FINGERPRINT_QUERIES: dict[str, str] = {
+    "sqlite": "PRAGMA schema_version",
+    "postgresql": """
+        SELECT md5(
+            coalesce((
+                SELECT string_agg(
+                    c.relname || ':' || a.attname || ':' || a.atttypid::text || ':' || a.attnotnull::text,
+                    ',' ORDER BY c.oid, a.attnum
+                )
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                JOIN pg_attribute a ON a.attrelid = c.oid
+                WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+                    AND a.attnum > 0 AND NOT a.attisdropped
+            ), '')
+            || coalesce((
+                SELECT string_agg(con.conname || ':' || con.conrelid::text, ',' ORDER BY con.oid)
+                FROM pg_constraint con
+                JOIN pg_namespace n ON n.oid = con.connamespace
+                WHERE n.nspname = current_schema()
+            ), '')
+            || coalesce((
+                SELECT string_agg(i.relname, ',' ORDER BY i.oid)
+                FROM pg_class i
+                JOIN pg_namespace n ON n.oid = i.relnamespace
+                WHERE n.nspname = current_schema() AND i.relkind = 'i'
+            ), '')
+        )
+    """,
+    "mysql": """
+        SELECT
+            (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(CONCAT_WS(':',
+                TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, COLUMN_DEFAULT
+            ))), 0))
+            FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()),
+            (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(CONCAT_WS(':',
+                TABLE_NAME, INDEX_NAME, COLUMN_NAME, SEQ_IN_INDEX
+            ))), 0))
+            FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE()),
+            (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(CONCAT_WS(':',
+                TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+            ))), 0))
+            FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA = DATABASE())
+    """,
+}
+
+
+def get_catalog_fingerprint(engine: Engine) -> str | None:
+    """Get a fingerprint of the database schema using a single cheap catalog query.
+
+    Returns None if not supported for the database dialect.
+    """
+    query = CATALOG_FINGERPRINT_QUERIES.get(engine.dialect.name)
+    if query is None:
+        return None
+    with engine.connect() as conn:
+        row = conn.execute(text(query)).one()
+    return hashlib.sha256(repr(tuple(row)).encode()).hexdigest()
+
+
+@dataclass
+class CachedSchema:
+    """Schema of a database, including the tables which have been reflected so far."""
+
+    # Catalog fingerprint of the database when the schema was cached
+    fingerprint: str
+    # Names of all tables in the database
+    table_names: list[str]
+    # Tables which have been reflected so far
+    metadata: MetaData
+
+
+class SchemaCache:
+    """Persists the reflected schema of a database to a local file."""
+
+    def __init__(self, cache_dir: Path, engine: Engine):
+        """
+        Args:
+            cache_dir: Directory to store cached schemas in
+            engine: Engine for the database, whose URI (without password) is used as the cache key
+        """
+        db_key = hashlib.sha256(engine.url.render_as_string(hide_password=True).encode()).hexdigest()
+        self.path = cache_dir / f"schema-{db_key[:32]}.pickle"
+
+    def load(self, fingerprint: str) -> CachedSchema | None:
+        """Load the cached schema, or None if it is missing or out of date."""
+        try:
+            with self.path.open("rb") as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logfire.warn("Failed to load schema cache {path}: {error}", path=str(self.path), error=str(e))
+            return None
+
+        if (
+            data.get("version") != SCHEMA_CACHE_VERSION
+            or data.get("sqlalchemy_version") != sqlalchemy.__version__
+            or data["schema"].fingerprint != fingerprint
+        ):
+            return None
+        return data["schema"]
+
+    def save(self, schema: CachedSchema) -> None:
+        """Save the schema to the cache file."""
+        data = {"version": SCHEMA_CACHE_VERSION, "sqlalchemy_version": sqlalchemy.__version__, "schema": schema}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so a concurrent reader never sees a partially written file
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with tmp_path.open("wb") as f:
+                pickle.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logfire.warn("Failed to save schema cache {path}: {error}", path=str(self.path), error=str(e))
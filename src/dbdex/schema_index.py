@@ -0,0 +1,92 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable
+
+from sqlalchemy import ForeignKeyConstraint, Table
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+# Table name terms are repeated so matches on the table name rank above matches on column names
+TABLE_NAME_WEIGHT = 3
+
+CAMEL_CASE_PATTERN = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+NON_ALPHANUMERIC_PATTERN = re.compile(r"[^a-zA-Z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text (e.g. an identifier such as `OrderDetails` or `customer_id`) into normalized search terms."""
+    terms = []
+    for word in NON_ALPHANUMERIC_PATTERN.split(CAMEL_CASE_PATTERN.sub(" ", text)):
+        if not word:
+            continue
+        term = word.lower()
+        # Simple plural stemming so that e.g. "customers" matches "customer"
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+@dataclass
+class SchemaSearchResult:
+    table: Table
+    score: float
+    # Columns of the table whose names match the search query
+    matched_columns: list[str]
+
+
+class SchemaIndex:
+    """BM25 lexical index over the tables of a database schema.
+
+    Each table is indexed by its name, its column names and the names of the tables it references
+    with foreign keys.
+    """
+
+    def __init__(self, tables: Iterable[Table]):
+        self.tables = list(tables)
+        self._term_counts: list[Counter[str]] = []
+        self._column_terms: list[dict[str, set[str]]] = []
+        for table in self.tables:
+            terms = tokenize(table.name) * TABLE_NAME_WEIGHT
+            column_terms = {}
+            for column in table.columns:
+                column_terms[column.name] = set(tokenize(column.name))
+                terms.extend(column_terms[column.name])
+            for constraint in table.constraints:
+                if isinstance(constraint, ForeignKeyConstraint):
+                    terms.extend(tokenize(constraint.referred_table.name))
+            self._term_counts.append(Counter(terms))
+            self._column_terms.append(column_terms)
+
+        self._avg_length = (
+            sum(counts.total() for counts in self._term_counts) / len(self._term_counts) if self._term_counts else 0
+        )
+        document_frequencies: Counter[str] = Counter()
+        for counts in self._term_counts:
+            document_frequencies.update(counts.keys())
+        table_count = len(self.tables)
+        self._idf = {
+            term: math.log(1 + (table_count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+
+    def search(self, query: str, limit: int = 10) -> list[SchemaSearchResult]:
+        """Find the tables which best match the search query, ordered by relevance."""
+        query_terms = set(tokenize(query))
+        results = []
+        for table, counts, column_terms in zip(self.tables, self._term_counts, self._column_terms, strict=True):
+            length_norm = 1 - B + B * counts.total() / self._avg_length
+            score = 0.0
+            for term in query_terms:
+                frequency = counts.get(term, 0)
+                if frequency:
+                    score += self._idf[term] * frequency * (K1 + 1) / (frequency + K1 * length_norm)
+            if score > 0:
+                matched_columns = [name for name, terms in column_terms.items() if terms & query_terms]
+                results.append(SchemaSearchResult(table, score, matched_columns))
+
+        results.sort(key=lambda result: result.score, reverse=True)
+        return results[:limit]
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import secrets
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, AsyncIterator
+
+import logfire
+from pydantic import BaseModel, ValidationError
+from rich.console import Console
+
+from dbdex.agent import AgentRunner
+from dbdex.cli.batch import STORED_RESULTS_PER_QUESTION, executed_queries
+from dbdex.deps import CLIAgentDeps
+
+if TYPE_CHECKING:
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+# Sessions not used for this long (in seconds) are evicted
+DEFAULT_SESSION_IDLE_TIMEOUT = 30 * 60
+DEFAULT_MAX_SESSIONS = 100
+
+
+class ServerError(Exception):
+    """Exception raised when the server dependencies are not installed, or a session can't be created."""
+
+
+@dataclass
+class Session:
+    """A conversation with its own message history."""
+
+    id: str
+    runner: AgentRunner[CLIAgentDeps]
+    last_used: float = field(default_factory=time.monotonic)
+    # Questions of a session are answered one at a time, since each continues the conversation
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class SessionManager:
+    """Sessions of the server, which all share the agent (and so the system prompt built from the reflected
+    schema) and the database (and so its connection pool and caches) of a template agent runner."""
+
+    def __init__(
+        self,
+        agent_runner: AgentRunner[CLIAgentDeps],
+        idle_timeout: float = DEFAULT_SESSION_IDLE_TIMEOUT,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+    ):
+        """
+        Args:
+            agent_runner: Agent runner whose agent, dependencies and compaction policy are used by all sessions
+            idle_timeout: Time (in seconds) after which a session that is not used is evicted
+            max_sessions: Maximum number of sessions, beyond which the least recently used idle session is evicted
+        """
+        self.agent_runner = agent_runner
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions: dict[str, Session] = {}
+        # Results displayed with show_result_table are not sent to clients
+        self._deps = replace(agent_runner.deps, console=Console(quiet=True))
+
+    def create(self) -> Session:
+        """Create a session, evicting the least recently used idle session if there are too many."""
+        if len(self.sessions) >= self.max_sessions:
+            idle = [session for session in self.sessions.values() if not session.lock.locked()]
+            if not idle:
+                raise ServerError(f"All {self.max_sessions} sessions are busy")
+            self.delete(min(idle, key=lambda session: session.last_used).id)
+        runner = AgentRunner(
+            self.agent_runner.agent,
+            deps=self._deps,
+            compaction=self.agent_runner.compaction,
+            recorder=self.agent_runner.recorder,
+        )
+        session = Session(id=secrets.token_urlsafe(16), runner=runner)
+        self.sessions[session.id] = session
+        return session
+
+    @asynccontextmanager
+    async def answering(self, session: Session) -> AsyncIterator[None]:
+        """Context in which a question of a session is answered (and its response built). Questions of a session
+        are answered one at a time, and the result history of the shared database is enlarged while a question
+        is answered, so the results of its queries are still there when its response is built (see
+        `dbdex.cli.batch.executed_queries`), however many questions other sessions are answering."""
+        async with session.lock:
+            database = self._deps.database
+            database.max_stored_results += STORED_RESULTS_PER_QUESTION
+            try:
+                yield
+            finally:
+                database.max_stored_results -= STORED_RESULTS_PER_QUESTION
+                session.last_used = time.monotonic()
+
+    def get(self, session_id: str) -> Session | None:
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session, returning whether it existed."""
+        return self.sessions.pop(session_id, None) is not None
+
+    def evict_idle(self) -> int:
+        """Delete sessions which have not been used for `idle_timeout` (and are not answering a question).
+
+        Returns:
+            The number of sessions evicted
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = [
+            session.id for session in self.sessions.values() if session.last_used < cutoff and not session.lock.locked()
+        ]
+        for session_id in expired:
+            self.delete(session_id)
+        return len(expired)
+
+    async def evict_idle_periodically(self) -> None:
+        """Evict idle sessions until cancelled."""
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 10))
+            if evicted := self.evict_idle():
+                logfire.info("Evicted {count} idle sessions", count=evicted)
+
+
+class QuestionRequest(BaseModel):
+    question: str
+    # Whether to stream the answer as JSON lines of text as it is generated
+    stream: bool = False
+
+
+def create_app(sessions: SessionManager) -> "Starlette":
+    """Create the HTTP/JSON API of the server:
+
+    - `POST /sessions` creates a session, returning its `session_id`
+    - `POST /sessions/{session_id}/questions` with `{"question": "...", "stream": false}` answers a question
+      in the session, returning the `answer` and the `queries` executed (with their SQL, row counts and
+      durations). With `"stream": true`, the answer is streamed as JSON lines of `{"text": "..."}` chunks,
+      followed by a line with the `queries`
+    - `DELETE /sessions/{session_id}` deletes a session
+    - `GET /health` returns the number of sessions
+    """
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    async def create_session(request: "Request") -> "Response":
+        try:
+            session = sessions.create()
+        except ServerError as e:
+            return JSONResponse({"error": str(e)}, status_code=503)
+        return JSONResponse({"session_id": session.id}, status_code=201)
+
+    async def delete_session(request: "Request") -> "Response":
+        if not sessions.delete(request.path_params["session_id"]):
+            return JSONResponse({"error": "Session not found"}, status_code=404)
+        return JSONResponse({}, status_code=200)
+
+    async def ask_question(request: "Request") -> "Response":
+        session = sessions.get(request.path_params["session_id"])
+        if session is None:
+            return JSONResponse({"error": "Session not found"}, status_code=404)
+        try:
+            body = QuestionRequest.model_validate_json(await request.body())
+        except ValidationError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        if body.stream:
+            return StreamingResponse(
+                _stream_answer(sessions, session, body.question), media_type="application/x-ndjson"
+            )
+        async with sessions.answering(session):
+            try:
+                with logfire.span("Session {session_id} question", session_id=session.id):
+                    response = await session.runner.run(body.question)
+            except Exception as e:
+                return JSONResponse({"error": f"{type(e).__name__}: {e}"}, status_code=500)
+            queries = executed_queries(session.runner.last_turn, session.runner.deps.database)
+        return JSONResponse({"answer": response.data, "queries": queries})
+
+    async def health(request: "Request") -> "Response":
+        return JSONResponse({"sessions": len(sessions.sessions)})
+
+    return Starlette(
+        routes=[
+            Route("/sessions", create_session, methods=["POST"]),
+            Route("/sessions/{session_id}", delete_session, methods=["DELETE"]),
+            Route("/sessions/{session_id}/questions", ask_question, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+        ]
+    )
+
+
+async def _stream_answer(sessions: SessionManager, session: Session, question: str) -> AsyncIterator[str]:
+    """Stream the answer to a question as JSON lines of text chunks, followed by the queries executed."""
+    async with sessions.answering(session):
+        try:
+            sent = ""
+            with logfire.span("Session {session_id} question", session_id=session.id):
+                # run_stream yields the entire text so far, only the new text is sent
+                async for text in session.runner.run_stream(question):
+                    chunk = text[len(sent) :] if text.startswith(sent) else text
+                    sent = text
+                    if chunk:
+                        yield json.dumps({"text": chunk}) + "\n"
+            queries = executed_queries(session.runner.last_turn, session.runner.deps.database)
+            yield json.dumps({"queries": queries}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"{type(e).__name__}: {e}"}) + "\n"
+
+
+async def serve(
+    agent_runner: AgentRunner[CLIAgentDeps],
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    idle_timeout: float = DEFAULT_SESSION_IDLE_TIMEOUT,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+) -> None:
+    """Serve the HTTP/JSON API (see `create_app`) until interrupted.
+
+    Raises:
+        ServerError: If the server dependencies are not installed
+    """
+    try:
+        import uvicorn
+    except ImportError as e:
+        raise ServerError("Server mode requires the starlette and uvicorn packages: pip install dbdex[server]") from e
+
+    sessions = SessionManager(agent_runner, idle_timeout=idle_timeout, max_sessions=max_sessions)
+    eviction = asyncio.create_task(sessions.evict_idle_periodically())
+    server = uvicorn.Server(uvicorn.Config(create_app(sessions), host=host, port=port, log_level="warning"))
+    try:
+        await server.serve()
+    finally:
+        eviction.cancel()
@@ -0,0 +1,83 @@
+import re
+from dataclasses import dataclass
+
+# Comments, string literals and quoted identifiers are matched first, so keywords and parentheses inside them
+# are not mistaken for SQL syntax
+TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<identifier>"(?:[^"]|"")*"|`(?:[^`]|``)*`)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    | (?P<number>\d+(?:\.\d*)?)
+    | (?P<punctuation>\S)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Dialects which support a trailing `LIMIT n` clause
+LIMIT_DIALECTS = {"sqlite", "postgresql", "mysql", "mariadb", "duckdb"}
+# Top-level keywords after which a LIMIT clause can't simply be appended
+NO_LIMIT_KEYWORDS = {"LIMIT", "OFFSET", "FETCH", "FOR", "INTO"}
+
+
+@dataclass
+class SQLToken:
+    # Token type: "string", "identifier", "word", "number" or "punctuation"
+    kind: str
+    text: str
+    # Parenthesis nesting depth of the token (0 for the top-level statement)
+    depth: int
+
+    @property
+    def keyword(self) -> str | None:
+        """Upper-cased text of word tokens (which may be keywords or unquoted identifiers)."""
+        return self.text.upper() if self.kind == "word" else None
+
+
+def tokenize_sql(sql: str) -> list[SQLToken]:
+    """Split a SQL query into tokens, skipping whitespace and comments."""
+    tokens = []
+    depth = 0
+    for match in TOKEN_PATTERN.finditer(sql):
+        kind = match.lastgroup
+        assert kind is not None
+        if kind == "comment":
+            continue
+        text = match.group()
+        if text == ")":
+            depth = max(0, depth - 1)
+        tokens.append(SQLToken(kind, text, depth))
+        if text == "(":
+            depth += 1
+    return tokens
+
+
+def strip_sql(sql: str) -> str:
+    """Remove surrounding whitespace and trailing semicolons from a query."""
+    return sql.strip().rstrip(";").rstrip()
+
+
+def add_limit(sql: str, limit: int, dialect: str) -> str | None:
+    """Rewrite a SELECT query to return at most `limit` rows by appending a LIMIT clause.
+
+    Returns None if the query can't be safely rewritten, e.g. it already has a top-level LIMIT,
+    contains multiple statements or the dialect does not support LIMIT.
+    """
+    if dialect not in LIMIT_DIALECTS:
+        return None
+    sql = strip_sql(sql)
+    tokens = tokenize_sql(sql)
+    if not tokens or tokens[0].keyword not in ("SELECT", "WITH"):
+        return None
+    if any(token.text == ";" for token in tokens):
+        return None
+    if any(token.depth == 0 and token.keyword in NO_LIMIT_KEYWORDS for token in tokens):
+        return None
+    # On a new line in case the query ends with a comment
+    return f"{sql}\nLIMIT {int(limit)}"
+
+
+def count_query(sql: str) -> str:
+    """Rewrite a SELECT query to count the rows of its result."""
+    return f"SELECT COUNT(*) FROM (\n{strip_sql(sql)}\n) AS dbdex_count"
@@ -0,0 +1,411 @@
+import difflib
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from sqlalchemy import Table
+
+from dbdex.sql_rewrite import SQLToken, strip_sql, tokenize_sql
+
+if TYPE_CHECKING:
+    from dbdex.database import Database
+
+# Keywords a read-only query can start with
+READ_ONLY_START_KEYWORDS = {"SELECT", "WITH", "VALUES"}
+# Keywords which make a query starting with SELECT or WITH modify the database or take locks
+# (data-modifying CTEs, SELECT INTO, SELECT ... FOR UPDATE)
+WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "MERGE", "INTO"}
+# Words which are not column names (keywords, type names, date parts and pseudo-columns of common dialects).
+# Unqualified words in this set are never reported as unknown columns.
+SQL_KEYWORDS = {
+    "ALL", "AND", "ANY", "ARRAY", "AS", "ASC", "ASYMMETRIC", "AT", "BETWEEN", "BIGINT", "BINARY", "BOOLEAN", "BOTH",
+    "BY", "CASE", "CAST", "CHAR", "CHARACTER", "COLLATE", "CROSS", "CUBE", "CURRENT", "CURRENT_DATE",
+    "CURRENT_TIME", "CURRENT_TIMESTAMP", "CURRENT_USER", "DATE", "DATETIME", "DAY", "DAYS", "DECIMAL", "DESC",
+    "DISTINCT", "DIV", "DOUBLE", "DOW", "DOY", "ELSE", "END", "EPOCH", "ESCAPE", "EXCEPT", "EXCLUDE", "EXISTS",
+    "FALSE", "FETCH", "FILTER", "FIRST", "FLOAT", "FOLLOWING", "FOR", "FROM", "FULL", "GLOB", "GROUP", "GROUPING",
+    "GROUPS", "HAVING", "HOUR", "HOURS", "ILIKE", "IN", "INNER", "INT", "INTEGER", "INTERSECT", "INTERVAL", "IS",
+    "ISNULL", "JOIN", "LAST", "LATERAL", "LEADING", "LEFT", "LIKE", "LIMIT", "LOCALTIME", "LOCALTIMESTAMP",
+    "MATERIALIZED", "MICROSECOND", "MICROSECONDS", "MILLISECOND", "MILLISECONDS", "MINUTE", "MINUTES", "MOD",
+    "MONTH", "MONTHS", "NATURAL", "NEXT", "NO", "NOCASE", "NOT", "NOTNULL", "NULL", "NULLS", "NUMERIC", "OFFSET",
+    "OID", "ON", "ONLY", "OR", "ORDER", "OTHERS", "OUTER", "OVER", "PARTITION", "PERCENT", "PRECEDING",
+    "PRECISION", "QUARTER", "RANGE", "REAL", "RECURSIVE", "REGEXP", "RIGHT", "RLIKE", "ROLLUP", "ROW", "ROWID",
+    "ROWNUM", "ROWS", "SECOND", "SECONDS", "SELECT", "SEPARATOR", "SESSION_USER", "SETS", "SIGNED", "SIMILAR",
+    "SMALLINT", "SOME", "SYMMETRIC", "TABLESAMPLE", "TEXT", "THEN", "TIES", "TIME", "TIMESTAMP", "TO", "TOP",
+    "TRAILING", "TRUE", "UNBOUNDED", "UNION", "UNKNOWN", "UNSIGNED", "USER", "USING", "VALUES", "VARCHAR", "WEEK",
+    "WHEN", "WHERE", "WINDOW", "WITH", "WITHIN", "WITHOUT", "XOR", "YEAR", "YEARS", "ZONE", "_ROWID_", "CTID",
+    "QUALIFY", "USE", "FORCE", "IGNORE", "INDEX", "INDEXED", "KEY", "NOLOCK", "SYSDATE", "SYSTIMESTAMP",
+    "UTC_DATE", "UTC_TIME", "UTC_TIMESTAMP", "CURRENT_SCHEMA", "CURRENT_CATALOG", "CURRENT_ROLE",
+}  # fmt: skip
+# Keywords after which the next word is a name defined by the query (an alias, window name or collation)
+NAME_DEFINING_KEYWORDS = {"AS", "OVER", "WINDOW", "COLLATE"}
+# Functions whose arguments can contain FROM (e.g. EXTRACT(YEAR FROM created_at))
+FROM_ARGUMENT_FUNCTIONS = {"EXTRACT", "SUBSTRING", "SUBSTR", "TRIM", "POSITION", "OVERLAY"}
+# Functions whose first argument can be a date part (e.g. EXTRACT(isodow FROM created_at), DATEADD(dd, 1, created_at))
+DATE_PART_FUNCTIONS = {
+    "EXTRACT", "DATEADD", "DATEDIFF", "DATEDIFF_BIG", "DATEPART", "DATENAME", "DATETRUNC", "DATE_TRUNC",
+    "DATE_PART", "TIMESTAMPADD", "TIMESTAMPDIFF",
+}  # fmt: skip
+# Tables which are not included in the reflected metadata
+SYSTEM_TABLE_PREFIXES = ("sqlite_", "pg_", "information_schema")
+SYSTEM_TABLES = {"dual"}
+# Punctuation before a word which makes it a type (PostgreSQL `::type` casts) or a parameter/variable name
+NON_COLUMN_PREFIXES = {":", "@", "$"}
+# Dialects in which double quotes can also delimit string literals (SQLite for names which are not columns,
+# MySQL unless ANSI_QUOTES is set), so unknown double-quoted names are not reported as columns
+DOUBLE_QUOTED_STRING_DIALECTS = {"sqlite", "mysql"}
+MAX_SUGGESTIONS = 3
+
+NON_NAME_KEYWORDS = SQL_KEYWORDS | WRITE_KEYWORDS
+
+
+@dataclass
+class QuerySources:
+    """Tables, CTEs and subqueries referenced by a query."""
+
+    # Lower-cased name or alias -> table, or None for sources whose columns are not known (CTEs, subqueries,
+    # table functions, views and tables of other schemas)
+    sources: dict[str, Table | None] = field(default_factory=dict)
+    # Names defined by the query (CTEs, aliases and window names), lower-cased
+    defined_names: set[str] = field(default_factory=set)
+    # Indexes of tokens which were consumed as part of a FROM clause or CTE definition
+    consumed: set[int] = field(default_factory=set)
+    # Whether the query selects from subqueries or table functions
+    has_subqueries: bool = False
+    problems: list[str] = field(default_factory=list)
+
+    @property
+    def tables(self) -> list[Table]:
+        return list({table.name: table for table in self.sources.values() if table is not None}.values())
+
+    @property
+    def all_known(self) -> bool:
+        """Whether the columns of all sources are known."""
+        return not self.has_subqueries and all(table is not None for table in self.sources.values())
+
+
+def identifier_name(token: SQLToken) -> str:
+    """Name of an identifier token, without quotes."""
+    if token.kind == "identifier":
+        return token.text[1:-1].replace(token.text[0] * 2, token.text[0])
+    return token.text
+
+
+def is_name(token: SQLToken | None) -> bool:
+    """Whether a token can be a (table, column or alias) name."""
+    return token is not None and (
+        token.kind == "identifier" or (token.kind == "word" and token.keyword not in NON_NAME_KEYWORDS)
+    )
+
+
+def did_you_mean(name: str, candidates: list[str]) -> str:
+    by_lower = {candidate.lower(): candidate for candidate in candidates}
+    matches = difflib.get_close_matches(name.lower(), by_lower, n=MAX_SUGGESTIONS)
+    if not matches:
+        return ""
+    return " Did you mean " + " or ".join(f"'{by_lower[match]}'" for match in matches) + "?"
+
+
+def check_read_only(tokens: list[SQLToken]) -> str | None:
+    """Check that the tokens form a single read-only query, returning the problem if not."""
+    first = next((token for token in tokens if token.text != "("), None)
+    if first is None:
+        return "The query is empty"
+    if any(token.text == ";" for token in tokens):
+        return "Only a single statement can be executed at a time"
+    if first.keyword not in READ_ONLY_START_KEYWORDS:
+        return f"Only read-only SELECT queries are allowed, not {first.text}"
+    for i, token in enumerate(tokens):
+        if token.keyword in WRITE_KEYWORDS:
+            return f"Only read-only SELECT queries are allowed, the query contains {token.text}"
+        following = [next_token.keyword for next_token in tokens[i + 1 : i + 3]]
+        # Locking reads: FOR SHARE, FOR KEY SHARE (PostgreSQL) and LOCK IN SHARE MODE (MySQL)
+        if (token.keyword == "FOR" and following[:1] in (["SHARE"], ["KEY"])) or (
+            token.keyword == "LOCK" and following == ["IN", "SHARE"]
+        ):
+            return "Only read-only SELECT queries are allowed, the query locks rows"
+    return None
+
+
+def validate_sql(sql: str, database: "Database", check_names: bool = True) -> list[str]:
+    """Check that a query is a single read-only statement, and that the tables and columns it references exist
+    (unless `check_names` is False), so invalid queries are rejected without a round trip to the database.
+
+    Tables and qualified columns (`alias.column`) are always checked. Unqualified columns are only checked if
+    the columns of every table the query selects from are known (i.e. it has no CTEs or subqueries in FROM),
+    since they could refer to columns of those.
+
+    Returns:
+        Problems found in the query, with suggestions for misspelled names (empty if the query is valid)
+    """
+    tokens = tokenize_sql(strip_sql(sql))
+    if problem := check_read_only(tokens):
+        return [problem]
+    if not check_names:
+        return []
+
+    sources = find_sources(tokens, database)
+    problems = sources.problems
+    reserved_words = database.engine.dialect.identifier_preparer.reserved_words
+    for i, token in enumerate(tokens):
+        if i in sources.consumed or not is_name(token):
+            continue
+        previous = tokens[i - 1] if i > 0 else None
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if following is not None and following.text in ("(", "."):
+            # Function call, or the qualifier of a column (checked with the column)
+            continue
+        if previous is not None and previous.text == ".":
+            if problem := check_qualified_column(tokens, i, sources):
+                problems.append(problem)
+            continue
+        if previous is not None and previous.text in NON_COLUMN_PREFIXES:
+            continue
+        if token.kind == "word" and token.text.lower() in reserved_words:
+            # Keywords of the dialect (which are never unquoted column names)
+            continue
+        if previous is not None and previous.keyword == "USING" and token.depth > 0:
+            # Character set of a conversion, e.g. CONVERT(name USING utf8mb4)
+            continue
+        if is_date_part(tokens, i):
+            continue
+        if following is not None and following.kind == "string":
+            # Typed literal, e.g. DATE '2024-01-01'
+            continue
+        if token.text.startswith('"') and database.provider in DOUBLE_QUOTED_STRING_DIALECTS:
+            continue
+        if problem := check_column(identifier_name(token), sources, database):
+            problems.append(problem)
+    return list(dict.fromkeys(problems))
+
+
+def table_aliases(sql: str, database: "Database") -> dict[str, str]:
+    """Get the tables referenced by a query by their lower-cased names and aliases."""
+    sources = find_sources(tokenize_sql(strip_sql(sql)), database)
+    return {name: table.name for name, table in sources.sources.items() if table is not None}
+
+
+def find_sources(tokens: list[SQLToken], database: "Database") -> QuerySources:
+    """Find the tables, CTEs, subqueries and aliases of a query."""
+    sources = QuerySources()
+    table_names = {name.lower(): name for name in database.table_names}
+
+    # Names defined with AS, OVER, WINDOW or COLLATE, and implicit aliases (a name directly following an expression,
+    # including a CASE expression ending with END)
+    for i, token in enumerate(tokens[1:], start=1):
+        previous = tokens[i - 1]
+        follows_expression = (
+            previous.text == ")"
+            or previous.kind in ("number", "string")
+            or previous.keyword == "END"
+            or is_name(previous)
+        )
+        is_qualifier = i + 1 < len(tokens) and tokens[i + 1].text in ("(", ".")
+        if is_name(token) and not is_qualifier and (previous.keyword in NAME_DEFINING_KEYWORDS or follows_expression):
+            sources.defined_names.add(identifier_name(token).lower())
+
+    ctes = parse_ctes(tokens, sources)
+    for i, token in enumerate(tokens):
+        if token.keyword not in ("FROM", "JOIN") or i in sources.consumed or is_from_argument(tokens, i):
+            continue
+        start = i + 1
+        while start < len(tokens):
+            end = parse_source(tokens, start, sources, ctes, table_names, database)
+            if token.keyword != "FROM" or end >= len(tokens) or tokens[end].text != ",":
+                break
+            # Comma separated list of tables
+            sources.consumed.add(end)
+            start = end + 1
+    return sources
+
+
+def parse_ctes(tokens: list[SQLToken], sources: QuerySources) -> set[str]:
+    """Find the names of the CTEs of a query (at any nesting level)."""
+    ctes = set()
+    for i, token in enumerate(tokens):
+        if token.keyword != "WITH":
+            continue
+        j = i + 1
+        if j < len(tokens) and tokens[j].keyword == "RECURSIVE":
+            j += 1
+        # Each CTE is `name [(columns)] AS [[NOT] MATERIALIZED] (query)`, separated by commas
+        while j < len(tokens) and tokens[j].kind in ("word", "identifier"):
+            name_index = j
+            j += 1
+            if j < len(tokens) and tokens[j].text == "(":
+                # Column list of the CTE
+                j = matching_paren(tokens, j) + 1
+            if j >= len(tokens) or tokens[j].keyword != "AS":
+                break
+            ctes.add(identifier_name(tokens[name_index]).lower())
+            sources.consumed.update(range(name_index, j))
+            while j < len(tokens) and tokens[j].keyword in ("AS", "NOT", "MATERIALIZED"):
+                j += 1
+            if j >= len(tokens) or tokens[j].text != "(":
+                break
+            j = matching_paren(tokens, j) + 1
+            if j >= len(tokens) or tokens[j].text != ",":
+                break
+            j += 1
+    sources.defined_names.update(ctes)
+    return ctes
+
+
+def parse_source(
+    tokens: list[SQLToken],
+    start: int,
+    sources: QuerySources,
+    ctes: set[str],
+    table_names: dict[str, str],
+    database: "Database",
+) -> int:
+    """Parse a table reference in a FROM clause (a table, CTE, subquery or table function with an optional alias),
+    returning the index of the token after it."""
+    i = start
+    if i < len(tokens) and tokens[i].keyword in ("LATERAL", "ONLY"):
+        i += 1
+    if i >= len(tokens):
+        return i
+
+    table: Table | None = None
+    name: str | None = None
+    if tokens[i].text == "(":
+        # Subquery or parenthesized join (whose own FROM and JOIN clauses are parsed separately)
+        sources.has_subqueries = True
+        i = matching_paren(tokens, i) + 1
+    elif tokens[i].kind in ("word", "identifier"):
+        parts = [identifier_name(tokens[i])]
+        sources.consumed.add(i)
+        i += 1
+        while i + 1 < len(tokens) and tokens[i].text == "." and tokens[i + 1].kind in ("word", "identifier"):
+            parts.append(identifier_name(tokens[i + 1]))
+            sources.consumed.update((i, i + 1))
+            i += 2
+        if i < len(tokens) and tokens[i].text == "(":
+            # Table function, e.g. generate_series(1, 10)
+            sources.has_subqueries = True
+            i = matching_paren(tokens, i) + 1
+        else:
+            name = parts[-1]
+            table = resolve_table(parts, sources, ctes, table_names, database)
+    else:
+        return i
+
+    if i < len(tokens) and tokens[i].keyword == "AS":
+        i += 1
+    alias = None
+    if i < len(tokens) and is_name(tokens[i]):
+        alias = identifier_name(tokens[i])
+        sources.consumed.add(i)
+        i += 1
+        if i < len(tokens) and tokens[i].text == "(":
+            # Column aliases, e.g. AS t(a, b)
+            close = matching_paren(tokens, i)
+            sources.consumed.update(range(i, close + 1))
+            i = close + 1
+    if name is not None:
+        sources.sources[name.lower()] = table
+    if alias is not None:
+        sources.sources[alias.lower()] = table
+    return i
+
+
+def resolve_table(
+    parts: list[str], sources: QuerySources, ctes: set[str], table_names: dict[str, str], database: "Database"
+) -> Table | None:
+    """Get the table for a (possibly schema-qualified) name in a FROM clause, or None if its columns are unknown.
+    Names which don't exist are added to the problems."""
+    name = parts[-1]
+    if (
+        len(parts) > 1
+        or name.lower() in ctes
+        or name.lower() in SYSTEM_TABLES
+        or name.lower().startswith(SYSTEM_TABLE_PREFIXES)
+    ):
+        return None
+    if name.lower() in table_names:
+        return database.get_table(table_names[name.lower()])
+    if name.lower() in {view.lower() for view in database.view_names}:
+        return None
+    sources.problems.append(
+        f"Table '{name}' does not exist." + did_you_mean(name, [*database.table_names, *database.view_names])
+    )
+    return None
+
+
+def check_qualified_column(tokens: list[SQLToken], i: int, sources: QuerySources) -> str | None:
+    """Check a column qualified by a table name or alias (e.g. `u.name`)."""
+    column = identifier_name(tokens[i])
+    qualifier = identifier_name(tokens[i - 2]) if i >= 2 and tokens[i - 2].kind in ("word", "identifier") else None
+    if qualifier is None or qualifier.lower() not in sources.sources:
+        if qualifier is None or any(qualifier.lower() in column_names(table) for table in sources.tables):
+            # e.g. a field of a composite column
+            return None
+        if not sources.all_known or qualifier.lower() in sources.defined_names:
+            return None
+        return f"Unknown table or alias '{qualifier}' in '{qualifier}.{column}'." + did_you_mean(
+            qualifier, list(sources.sources)
+        )
+    table = sources.sources[qualifier.lower()]
+    if table is None or column.lower() in column_names(table):
+        return None
+    return f"Column '{column}' does not exist in table '{table.name}'." + did_you_mean(
+        column, [c.name for c in table.columns]
+    )
+
+
+def check_column(column: str, sources: QuerySources, database: "Database") -> str | None:
+    """Check an unqualified column against the columns of all tables the query selects from."""
+    if not sources.sources or not sources.all_known:
+        return None
+    if column.lower() in sources.defined_names or column.lower() in sources.sources:
+        return None
+    tables = sources.tables
+    if any(column.lower() in column_names(table) for table in tables):
+        return None
+    problem = f"Column '{column}' does not exist in table{'s' if len(tables) > 1 else ''} "
+    problem += ", ".join(f"'{table.name}'" for table in tables) + "."
+    # Other tables (only those already reflected) which have the column
+    other_tables = [table.name for table in database.metadata.tables.values() if column.lower() in column_names(table)]
+    if other_tables:
+        return (
+            problem
+            + f" It exists in table{'s' if len(other_tables) > 1 else ''} "
+            + ", ".join(f"'{name}'" for name in other_tables)
+        )
+    return problem + did_you_mean(column, [c.name for table in tables for c in table.columns])
+
+
+def column_names(table: Table) -> set[str]:
+    return {column.name.lower() for column in table.columns}
+
+
+def is_date_part(tokens: list[SQLToken], i: int) -> bool:
+    """Whether a word is the date part argument of a date function (e.g. EXTRACT(isodow FROM created_at))."""
+    return (
+        tokens[i].kind == "word"
+        and i >= 2
+        and tokens[i - 1].text == "("
+        and tokens[i - 2].keyword in DATE_PART_FUNCTIONS
+        and i + 1 < len(tokens)
+        and (tokens[i + 1].text == "," or tokens[i + 1].keyword == "FROM")
+    )
+
+
+def is_from_argument(tokens: list[SQLToken], i: int) -> bool:
+    """Whether a FROM keyword is part of a function's arguments (e.g. EXTRACT(YEAR FROM created_at))
+    or of IS [NOT] DISTINCT FROM, rather than a FROM clause."""
+    if i > 0 and tokens[i - 1].keyword == "DISTINCT" and i > 1 and tokens[i - 2].keyword in ("IS", "NOT"):
+        return True
+    depth = tokens[i].depth
+    for j in range(i - 1, 0, -1):
+        if tokens[j].text == "(" and tokens[j].depth == depth - 1:
+            return tokens[j - 1].keyword in FROM_ARGUMENT_FUNCTIONS
+    return False
+
+
+def matching_paren(tokens: list[SQLToken], i: int) -> int:
+    """Index of the parenthesis closing the one at index i (or the last token if it is not closed)."""
+    depth = tokens[i].depth
+    for j in range(i + 1, len(tokens)):
+        if tokens[j].text == ")" and tokens[j].depth == depth:
+            return j
+    return len(tokens) - 1
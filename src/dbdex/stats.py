@@ -0,0 +1,197 @@
+import json
+import math
+import os
+import sys
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, Sequence
+
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.settings import ModelSettings
+from pydantic_ai.usage import Usage
+
+from dbdex.columnar import ColumnarRows
+from dbdex.database import QueryResult
+from dbdex.history import TurnUsage
+from dbdex.storage import SpilledRows, estimate_batch_size
+
+# Percentiles of the stats of recent turns shown by /stats
+PERCENTILES = (50, 90, 99)
+# Number of most recent turns the percentiles are computed over
+STATS_WINDOW = 100
+
+
+@dataclass
+class TurnStats:
+    """Where the time (and memory) of a single turn (user query) of an agent session went."""
+
+    turn: int
+    # Requests, tokens and duration of the turn, set when it ends (also in `AgentRunner.turn_usage`)
+    usage: TurnUsage | None = None
+    # Time spent waiting for the model (for streamed responses, until the response has been streamed)
+    model_seconds: float = 0.0
+    tool_calls: int = 0
+    # Time spent executing queries and fetching the rows returned to the model
+    db_seconds: float = 0.0
+    rows_fetched: int = 0
+    # Estimated size of the fetched results, in memory or in spill files
+    result_bytes: int = 0
+    # Time spent turning results into tool responses (truncating, encoding and summarizing rows)
+    serialization_seconds: float = 0.0
+    # Time spent parsing and rendering the answer as Markdown (in the CLI, streamed answers are also rendered
+    # in the background)
+    render_seconds: float = 0.0
+    # Peak resident memory of the process so far (None if not supported on the platform)
+    peak_rss_mb: float | None = None
+
+    def metrics(self) -> dict[str, float | None]:
+        """Metric name -> value, including the metrics of the turn's usage."""
+        metrics: dict[str, float | None] = {}
+        if self.usage is not None:
+            metrics.update({name: value for name, value in asdict(self.usage).items() if name != "turn"})
+        for metric in fields(self):
+            if metric.name not in ("turn", "usage"):
+                metrics[metric.name] = getattr(self, metric.name)
+        return metrics
+
+
+_current_turn: ContextVar[TurnStats | None] = ContextVar("current_turn_stats", default=None)
+# Durations of the `timed` contexts nested in the innermost `timed` context
+_nested_durations: ContextVar[list[float] | None] = ContextVar("nested_durations", default=None)
+
+
+def current_turn_stats() -> TurnStats | None:
+    """Stats of the turn being run in the current context (including the tools it runs), or None outside a turn."""
+    return _current_turn.get()
+
+
+@contextmanager
+def collect_turn_stats(stats: TurnStats) -> Iterator[TurnStats]:
+    """Collect the stats of the model requests and tool calls made within the context into `stats`."""
+    token = _current_turn.set(stats)
+    try:
+        yield stats
+    finally:
+        try:
+            _current_turn.reset(token)
+        except ValueError:
+            # A streamed turn can be closed from a different context than it started in
+            _current_turn.set(None)
+
+
+@contextmanager
+def timed(metric: str) -> Iterator[None]:
+    """Add the time taken by the context to a `*_seconds` metric of the current turn (if any). The time of nested
+    `timed` contexts is only added to their own metric."""
+    start = time.perf_counter()
+    nested: list[float] = []
+    token = _nested_durations.set(nested)
+    try:
+        yield
+    finally:
+        _nested_durations.reset(token)
+        duration = time.perf_counter() - start
+        if (parent := _nested_durations.get()) is not None:
+            parent.append(duration)
+        if (stats := current_turn_stats()) is not None:
+            setattr(stats, metric, getattr(stats, metric) + duration - sum(nested))
+
+
+def record_query_result(result: QueryResult) -> None:
+    """Add the rows and size of a query result to the current turn (if any)."""
+    stats = current_turn_stats()
+    if stats is None:
+        return
+    stats.rows_fetched += result.row_count
+    rows = result.rows
+    if isinstance(rows, ColumnarRows):
+        stats.result_bytes += rows.nbytes
+    elif isinstance(rows, SpilledRows):
+        stats.result_bytes += os.path.getsize(rows.path)
+    else:
+        stats.result_bytes += estimate_batch_size(rows)
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident memory of the process (in MB), or None if not supported on the platform."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return max_rss / 1024 / 1024 if sys.platform == "darwin" else max_rss / 1024
+
+
+class TimedModel(Model):
+    """Wraps a model to add the time spent waiting for it to the stats of the current turn."""
+
+    def __init__(self, model: Model):
+        self.wrapped = model
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> tuple[ModelResponse, Usage]:
+        with timed("model_seconds"):
+            return await self.wrapped.request(messages, model_settings, model_request_parameters)
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        with timed("model_seconds"):
+            async with self.wrapped.request_stream(messages, model_settings, model_request_parameters) as response:
+                yield response
+
+    @property
+    def model_name(self) -> str:
+        return self.wrapped.model_name
+
+    @property
+    def system(self) -> str | None:
+        return self.wrapped.system
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """Percentile of values (with linear interpolation between the closest ranks)."""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize_stats(turns: Sequence[TurnStats], window: int = STATS_WINDOW) -> dict[str, dict[str, float]]:
+    """Percentiles (and the mean) of each metric over the most recent `window` turns.
+
+    Returns:
+        Metric name -> {"p50": ..., "p90": ..., "p99": ..., "mean": ...}, for metrics with values
+    """
+    recent = turns[-window:]
+    metrics = [turn.metrics() for turn in recent]
+    summary = {}
+    for name in dict.fromkeys(name for turn_metrics in metrics for name in turn_metrics):
+        values = [value for turn_metrics in metrics if (value := turn_metrics.get(name)) is not None]
+        if values:
+            summary[name] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+            summary[name]["mean"] = sum(values) / len(values)
+    return summary
+
+
+def export_stats(turns: Sequence[TurnStats], path: Path) -> None:
+    """Write the stats of each turn and their summary to a JSON file."""
+    data: dict[str, Any] = {
+        "turns": [{"turn": turn.turn, **turn.metrics()} for turn in turns],
+        "summary": summarize_stats(turns),
+        "window": STATS_WINDOW,
+    }
+    path.write_text(json.dumps(data, indent=2) + "\n")
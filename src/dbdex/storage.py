@@ -0,0 +1,182 @@
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import threading
+import weakref
+from itertools import islice
+from typing import Any, Iterable, Iterator, Sequence, cast, overload
+
+from sqlalchemy import Row
+
+from dbdex.columnar import ColumnarRows, make_row_type
+
+# Number of rows to read from or write to the spill file at a time
+SPILL_BATCH_SIZE = 1000
+# Number of rows sampled from each batch when estimating memory usage
+SIZE_SAMPLE_COUNT = 8
+
+SQLITE_INT_MIN = -(2**63)
+SQLITE_INT_MAX = 2**63 - 1
+
+
+def estimate_row_size(row: Sequence[Any]) -> int:
+    """Estimate the memory used by a row (in bytes)."""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+def estimate_batch_size(rows: Sequence[Sequence[Any]]) -> int:
+    """Estimate the memory used by a batch of rows (in bytes) from a sample of the rows."""
+    if not rows:
+        return 0
+    step = max(1, len(rows) // SIZE_SAMPLE_COUNT)
+    sample = rows[::step]
+    return sum(estimate_row_size(row) for row in sample) * len(rows) // len(sample)
+
+
+def _encode_value(value: Any) -> Any:
+    """Convert a value to a type which can be stored in SQLite, pickling any non-native values."""
+    value_type = type(value)
+    if value is None or value_type is str or value_type is float:
+        return value
+    if value_type is int and SQLITE_INT_MIN <= value <= SQLITE_INT_MAX:
+        return value
+    return pickle.dumps(value)
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return pickle.loads(value)
+    return value
+
+
+def _remove_spill_file(conn: sqlite3.Connection, path: str) -> None:
+    conn.close()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SpilledRows(Sequence[Row[Any]]):
+    """Rows of a query result which are stored in a temporary on-disk SQLite table.
+
+    The rows which were collected before the result was spilled are kept in memory, and the remaining
+    rows are appended to the spill file. Length, indexing, slicing and iteration read from the spill file
+    in batches without loading it back into memory.
+    """
+
+    def __init__(self, columns: Sequence[str], head: list[Row[Any]] | None = None):
+        self.columns = list(columns)
+        self._head = head or []
+        self._tail_count = 0
+        self._lock = threading.Lock()
+        self._row_type = make_row_type(self.columns, "SpilledRow")
+
+        fd, self.path = tempfile.mkstemp(prefix="dbdex-", suffix=".sqlite3")
+        os.close(fd)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = OFF")
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._column_list = ", ".join(f"c{i}" for i in range(len(self.columns)))
+        self._conn.execute(f"CREATE TABLE rows (id INTEGER PRIMARY KEY, {self._column_list})")
+        self._finalizer = weakref.finalize(self, _remove_spill_file, self._conn, self.path)
+
+    def extend(self, rows: Iterable[Sequence[Any]]) -> None:
+        """Append rows to the spill file."""
+        placeholders = ", ".join("?" * (len(self.columns) + 1))
+        insert_sql = f"INSERT INTO rows (id, {self._column_list}) VALUES ({placeholders})"
+        row_iter = iter(rows)
+        while batch := list(islice(row_iter, SPILL_BATCH_SIZE)):
+            with self._lock:
+                start_id = self._tail_count
+                self._conn.executemany(
+                    insert_sql,
+                    ([start_id + i, *map(_encode_value, row)] for i, row in enumerate(batch)),
+                )
+                self._conn.commit()
+                self._tail_count += len(batch)
+
+    def close(self) -> None:
+        """Delete the spill file."""
+        self._finalizer()
+
+    def _read_tail(self, start: int, stop: int) -> list[Row[Any]]:
+        """Read spilled rows with positions in range [start, stop) of the spill table."""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT {self._column_list} FROM rows WHERE id >= ? AND id < ? ORDER BY id", (start, stop)
+            )
+            return [cast(Row[Any], self._row_type(map(_decode_value, row))) for row in cursor]
+
+    def __len__(self) -> int:
+        return len(self._head) + self._tail_count
+
+    @overload
+    def __getitem__(self, index: int) -> Row[Any]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Row[Any]]: ...
+
+    def __getitem__(self, index: int | slice) -> Row[Any] | list[Row[Any]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if stop <= start:
+                return []
+            head_count = len(self._head)
+            rows = self._head[start:stop]
+            if stop > head_count:
+                rows += self._read_tail(max(start, head_count) - head_count, stop - head_count)
+            return rows
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Row index out of range")
+        if index < len(self._head):
+            return self._head[index]
+        return self._read_tail(index - len(self._head), index - len(self._head) + 1)[0]
+
+    def __iter__(self) -> Iterator[Row[Any]]:
+        yield from self._head
+        # Read the spill file in batches using the row ID as a key, so no cursor is held open between batches
+        position = 0
+        while position < self._tail_count:
+            batch = self._read_tail(position, position + SPILL_BATCH_SIZE)
+            yield from batch
+            position += SPILL_BATCH_SIZE
+
+
+def collect_rows(
+    rows: Iterable[Row[Any]], columns: Sequence[str], spill_threshold: int | None = None, columnar: bool = False
+) -> list[Row[Any]] | ColumnarRows | SpilledRows:
+    """Collect rows into memory, spilling them to disk once their estimated size exceeds `spill_threshold` bytes.
+
+    Args:
+        rows: Rows to collect
+        columns: Column names of the rows
+        spill_threshold: Estimated memory usage (in bytes) after which rows are spilled to disk.
+            If None, rows are always kept in memory.
+        columnar: Whether to store the rows in memory column by column (see `ColumnarRows`) instead of as a list
+    """
+    if spill_threshold is None:
+        return ColumnarRows(columns, rows) if columnar else list(rows)
+
+    collected: list[Row[Any]] | ColumnarRows = ColumnarRows(columns) if columnar else []
+    size = 0
+    row_iter = iter(rows)
+    while batch := list(islice(row_iter, SPILL_BATCH_SIZE)):
+        if isinstance(collected, ColumnarRows):
+            collected.extend(batch)
+            size = collected.nbytes
+        else:
+            collected.extend(batch)
+            size += estimate_batch_size(batch)
+        if size > spill_threshold:
+            spilled = SpilledRows(columns, head=list(collected))
+            spilled.extend(row_iter)
+            return spilled
+    return collected
@@ -0,0 +1,202 @@
+import heapq
+import math
+import random
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Iterable, Literal, Sequence
+
+# Whether query results are summarized for the LLM: not at all, alongside the sample rows, or instead of them
+SummaryMode = Literal["off", "with-rows", "instead-of-rows"]
+
+# Number of rows processed at a time, each column of a chunk is processed as a whole
+SUMMARY_CHUNK_SIZE = 10_000
+# Number of smallest hashes kept to estimate the number of distinct values (exact up to this many)
+DISTINCT_SKETCH_SIZE = 1024
+# Number of candidate values tracked to find the most frequent values
+TOP_VALUES_CAPACITY = 64
+# Number of most frequent values included in a summary
+TOP_VALUES = 5
+# Number of numeric values sampled to build the histogram
+HISTOGRAM_SAMPLE_SIZE = 2048
+HISTOGRAM_BINS = 10
+# String values in summaries are truncated to this length
+MAX_VALUE_LENGTH = 50
+
+NUMERIC_TYPES = (int, float, Decimal)
+HASH_RANGE = 2**64
+
+
+@dataclass
+class ColumnSummary:
+    """Statistics of a column of a query result. `distinct`, `top_values` and `histogram` are estimates
+    for columns with many distinct values."""
+
+    name: str
+    # Number of non-NULL values
+    count: int
+    nulls: int
+    min: Any = None
+    max: Any = None
+    # Mean of numeric values
+    mean: float | None = None
+    distinct: int | None = None
+    # Most frequent values with their (lower bound) counts
+    top_values: list[tuple[Any, int]] = field(default_factory=list)
+    # Counts of values in equal-width bins between min and max (numeric columns only)
+    histogram: list[int] | None = None
+
+
+class ColumnAccumulator:
+    """Accumulates the statistics of a column in a single pass, one chunk of values at a time, using constant memory.
+
+    - Distinct values are estimated with a K-minimum-values sketch
+    - Frequent values are found with the Misra-Gries algorithm
+    - The histogram is built from a reservoir sample of the numeric values
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.min: Any = None
+        self.max: Any = None
+        self.comparable = True
+        self.numeric_count = 0
+        self.numeric_sum = 0.0
+        self._min_hashes: list[int] = []
+        self._top_counts: Counter[Any] = Counter()
+        self._sample: list[float] = []
+        self._sample_weight = 1.0
+        # Index (among numeric values) of the next value to be added to the full sample
+        self._next_sample_index = sys.maxsize
+        # Seeded so summaries of the same result are reproducible
+        self._random = random.Random(0)
+
+    def update(self, values: Sequence[Any]) -> None:
+        non_null = [value for value in values if value is not None]
+        self.nulls += len(values) - len(non_null)
+        if not non_null:
+            return
+        self.count += len(non_null)
+        self._update_min_max(non_null)
+        numeric = [value for value in non_null if type(value) in NUMERIC_TYPES]
+        if numeric:
+            self.numeric_count += len(numeric)
+            self.numeric_sum += math.fsum(numeric)
+            self._update_sample(numeric)
+        try:
+            counts = Counter(non_null)
+        except TypeError:
+            # Unhashable values (e.g. JSON columns)
+            counts = Counter(repr(value) for value in non_null)
+        self._update_distinct(counts)
+        self._update_top_values(counts)
+
+    def _update_min_max(self, values: list[Any]) -> None:
+        if not self.comparable:
+            return
+        try:
+            chunk_min = min(values)
+            chunk_max = max(values)
+            self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+            self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+        except TypeError:
+            # Values of mixed types can't be ordered
+            self.comparable = False
+            self.min = self.max = None
+
+    def _update_distinct(self, counts: Counter[Any]) -> None:
+        # Hashing a tuple mixes the bits of the value's hash, which is the identity for small ints
+        hashes = {hash((value, 0)) % HASH_RANGE for value in counts}
+        if len(self._min_hashes) >= DISTINCT_SKETCH_SIZE:
+            threshold = self._min_hashes[-1]
+            hashes = {value_hash for value_hash in hashes if value_hash < threshold}
+        hashes.update(self._min_hashes)
+        self._min_hashes = heapq.nsmallest(DISTINCT_SKETCH_SIZE, hashes)
+
+    def _update_top_values(self, counts: Counter[Any]) -> None:
+        self._top_counts.update(counts)
+        if len(self._top_counts) > TOP_VALUES_CAPACITY:
+            # Decrement all counts by the count of the first value which doesn't fit, and drop values reaching zero
+            decrement = self._top_counts.most_common(TOP_VALUES_CAPACITY + 1)[-1][1]
+            self._top_counts = Counter(
+                {value: count - decrement for value, count in self._top_counts.items() if count > decrement}
+            )
+
+    def _update_sample(self, numeric: list[Any]) -> None:
+        # Reservoir sampling with Algorithm L, which skips over values instead of drawing a random number for each
+        chunk_start = self.numeric_count - len(numeric)
+        fill = min(HISTOGRAM_SAMPLE_SIZE - len(self._sample), len(numeric))
+        if fill > 0:
+            self._sample.extend(float(value) for value in numeric[:fill])
+            if len(self._sample) == HISTOGRAM_SAMPLE_SIZE:
+                self._sample_weight = math.exp(math.log(self._uniform()) / HISTOGRAM_SAMPLE_SIZE)
+                self._next_sample_index = chunk_start + fill + self._skip()
+        while self._next_sample_index < self.numeric_count:
+            self._sample[self._random.randrange(HISTOGRAM_SAMPLE_SIZE)] = float(
+                numeric[self._next_sample_index - chunk_start]
+            )
+            self._sample_weight *= math.exp(math.log(self._uniform()) / HISTOGRAM_SAMPLE_SIZE)
+            self._next_sample_index += 1 + self._skip()
+
+    def _uniform(self) -> float:
+        # Random number in (0, 1), so its logarithm is finite
+        return self._random.random() or sys.float_info.min
+
+    def _skip(self) -> int:
+        return math.floor(math.log(self._uniform()) / math.log(1 - self._sample_weight))
+
+    def distinct_estimate(self) -> int:
+        if len(self._min_hashes) < DISTINCT_SKETCH_SIZE:
+            return len(self._min_hashes)
+        return round((DISTINCT_SKETCH_SIZE - 1) / (self._min_hashes[-1] / HASH_RANGE))
+
+    def histogram(self) -> list[int] | None:
+        if not self._sample or self.numeric_count != self.count:
+            return None
+        low, high = min(self._sample), max(self._sample)
+        if low == high or math.isnan(low) or math.isnan(high):
+            return None
+        width = (high - low) / HISTOGRAM_BINS
+        bins = [0] * HISTOGRAM_BINS
+        for value in self._sample:
+            if not math.isnan(value):
+                bins[min(int((value - low) / width), HISTOGRAM_BINS - 1)] += 1
+        # Scale the sample counts to the number of values
+        scale = self.numeric_count / len(self._sample)
+        return [round(count * scale) for count in bins]
+
+    def summary(self) -> ColumnSummary:
+        return ColumnSummary(
+            name=self.name,
+            count=self.count,
+            nulls=self.nulls,
+            min=truncate_value(self.min),
+            max=truncate_value(self.max),
+            mean=self.numeric_sum / self.numeric_count if self.numeric_count else None,
+            distinct=self.distinct_estimate() if self.count else None,
+            top_values=[(truncate_value(value), count) for value, count in self._top_counts.most_common(TOP_VALUES)],
+            histogram=self.histogram(),
+        )
+
+
+def truncate_value(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + "..."
+    return value
+
+
+def summarize_rows(
+    columns: Sequence[str], rows: Iterable[Sequence[Any]], chunk_size: int = SUMMARY_CHUNK_SIZE
+) -> list[ColumnSummary]:
+    """Compute statistics of each column over all rows, processing the rows in column-wise chunks
+    so large (e.g. streamed or spilled) results never have to be held in memory."""
+    accumulators = [ColumnAccumulator(name) for name in columns]
+    row_iter = iter(rows)
+    while chunk := list(islice(row_iter, chunk_size)):
+        for accumulator, values in zip(accumulators, zip(*chunk, strict=True), strict=True):
+            accumulator.update(values)
+    return [accumulator.summary() for accumulator in accumulators]
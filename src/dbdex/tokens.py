@@ -0,0 +1,16 @@
+import math
+import re
+
+# Words and individual punctuation characters
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\w\s]|_")
+# Average number of characters per token for words in typical BPE tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in a piece of text.
+
+    Approximates BPE tokenizers (which split text into common sub-words) without depending on a specific
+    model's tokenizer: each punctuation character is one token and words take one token per 4 characters.
+    """
+    return sum(math.ceil(len(match) / CHARS_PER_TOKEN) for match in TOKEN_PATTERN.findall(text))
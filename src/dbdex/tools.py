@@ -1,56 +1,198 @@
 from typing import Any
 
+import logfire
 from pydantic import BaseModel
 from pydantic_ai import ModelRetry, RunContext
-from rich.markdown import Markdown
 
-from dbdex.database import InvalidQueryError
+from dbdex.cli.pager import ResultPager
+from dbdex.database import InvalidQueryError, QueryResult, QueryTimeoutError, TableNotFoundError
 from dbdex.deps import AgentDeps, CLIAgentDeps
+from dbdex.encoding import encode_rows
+from dbdex.stats import record_query_result, timed
+from dbdex.summary import ColumnSummary, summarize_rows
+
+# Maximum number of tables returned by the search_schema tool
+MAX_SEARCH_RESULTS = 10
+# Maximum number of columns listed for each table returned by the search_schema tool
+MAX_SEARCH_RESULT_COLUMNS = 20
 
 
 class DBQueryResponse(BaseModel):
     """Result of a database query"""
 
+    query_id: int | None = None
     columns: list[str] | None = None
     rows: list[list[Any]] | None = None
+    # Header and rows as tab-separated values, used instead of `columns` and `rows` when a token budget is set
+    data: str | None = None
+    # Statistics of each column over the entire result, for results with more rows than are returned
+    summary: list[ColumnSummary] | None = None
     note: str | None = None
 
 
-def execute_sql(ctx: RunContext[AgentDeps], sql: str) -> DBQueryResponse:
+async def execute_sql(ctx: RunContext[AgentDeps], sql: str) -> DBQueryResponse:
     """Execute the given SQL query and return the result in format:
     ```json
     {
+        "query_id": 1,
         "columns": ["column1", "column2", ...],
         "rows": [[row1_value1, row1_value2, ...], [row2_value1, row2_value2, ...], ...],
         "note": "Optional note about the query"
     }
     ```
-    The results may be truncated if they contain lots of data."""
+    If "data" is returned instead of "columns" and "rows", it contains the result as tab-separated values
+    with a header line (NULL for null values, long values truncated with a "…(+N chars)" marker).
+    The results may be truncated if they contain lots of data, in which case a "summary" with statistics of each
+    column over the entire result may be included (count, nulls, min, max, mean, approximate distinct count,
+    most frequent values and a histogram of numeric values).
+    Independent queries can be run in parallel by calling this tool multiple times at once."""
+    database = ctx.deps.database
+    # The number of rows returned depends on the number of columns, which is not known before the query is run,
+    # so the limit is the number of rows returned for a single column
+    # Summaries are computed over the entire result, so the limit is not pushed down when they are enabled
+    limit = 5 + ctx.deps.max_return_values if ctx.deps.pushdown_limit and ctx.deps.result_summary == "off" else None
     try:
-        result = ctx.deps.database.execute_sql(sql)
+        with timed("db_seconds"):
+            result = await database.execute_sql_async(sql, limit=limit)
     except InvalidQueryError as e:
         raise ModelRetry(str(e)) from e
+    except QueryTimeoutError as e:
+        raise ModelRetry(f"{e}. Write a more efficient query, e.g. with more selective filters.") from e
+
+    with timed("serialization_seconds"):
+        response = await _query_response(ctx.deps, sql, result, limit)
+    record_query_result(result)
+    return response
+
 
+async def _query_response(deps: AgentDeps, sql: str, result: QueryResult, limit: int | None) -> DBQueryResponse:
+    """Build the response of the execute_sql tool from a query result: the rows which fit within the limits,
+    with notes and summaries of anything omitted."""
+    database = deps.database
     if not result.rows:
-        return DBQueryResponse(note="No results")
+        return DBQueryResponse(query_id=result.query_id, note="No results")
     else:
         assert result.columns is not None
         # Calculate number of rows to return
-        max_return_rows = 5 + ctx.deps.max_return_values // len(result.columns)
-        rows = [list(row) for row in result.rows[:max_return_rows]]
+        max_return_rows = 5 + deps.max_return_values // len(result.columns)
+        # Fetch one extra row to determine whether the result is truncated (streamed results are fetched lazily)
+        with timed("db_seconds"):
+            head_rows = await database.run_in_executor(result.head, max_return_rows + 1)
+        rows = [list(row) for row in head_rows[:max_return_rows]]
         note = None
-        if len(result.rows) > max_return_rows:
-            note = f"Query returned {len(result.rows)} rows, showing first {max_return_rows} only"
-        return DBQueryResponse(columns=result.columns, rows=rows, note=note)
+        if limit is not None and result.truncated:
+            with timed("db_seconds"):
+                note = await _pushdown_row_count_note(deps, sql, max_return_rows)
+        elif len(head_rows) > max_return_rows:
+            if result.truncated:
+                note = (
+                    f"Query returned more than {result.row_count} rows (fetching stopped at the row limit), "
+                    f"showing first {max_return_rows} only"
+                )
+            elif result.complete:
+                note = f"Query returned {result.row_count} rows, showing first {max_return_rows} only"
+            else:
+                note = f"Query returned more than {max_return_rows} rows, showing first {max_return_rows} only"
+        elif result.truncated:
+            note = f"Query returned more than {result.row_count} rows, fetching stopped at the row limit"
+
+        summary = None
+        if deps.result_summary != "off" and note is not None:
+            # Computed over all rows, which may re-execute a streamed query or read a spill file
+            summary = await database.run_in_executor(summarize_rows, result.columns, result.iter_rows())
+            if deps.result_summary == "instead-of-rows":
+                rows = None
+                note = (
+                    note.replace(f", showing first {max_return_rows} only", "")
+                    + ", rows omitted in favor of the summary"
+                )
+
+        token_budget = deps.response_token_budget
+        if rows is not None and token_budget is not None:
+            encoded = encode_rows(result.columns, rows, token_budget)
+            omissions = encoded.describe_omissions(total_rows=len(rows))
+            if omissions:
+                note = f"{note}. {omissions}" if note else omissions
+            return DBQueryResponse(query_id=result.query_id, data=encoded.text, summary=summary, note=note)
+        return DBQueryResponse(query_id=result.query_id, columns=result.columns, rows=rows, summary=summary, note=note)
 
 
-def show_result_table(ctx: RunContext[CLIAgentDeps]) -> str:
-    """Display the entire result of the previous database query as a markdown table.
+async def _pushdown_row_count_note(deps: AgentDeps, sql: str, max_return_rows: int) -> str:
+    """Note for a result truncated by the pushed down LIMIT, with the row count if it can be determined."""
+    database = deps.database
+    try:
+        row_count = await database.run_in_executor(database.count_rows, sql, deps.row_count_mode)
+    except Exception as e:
+        # Counting is best effort, the query itself succeeded
+        logfire.warn("Failed to count query rows: {error}", error=str(e))
+        row_count = None
+    if row_count is None:
+        return f"Query returned more than {max_return_rows} rows, showing first {max_return_rows} only"
+    if deps.row_count_mode == "estimate":
+        return f"Query returned an estimated {row_count} rows, showing first {max_return_rows} only"
+    return f"Query returned {row_count} rows, showing first {max_return_rows} only"
+
+
+async def show_result_table(ctx: RunContext[CLIAgentDeps], query_id: int | None = None) -> str:
+    """Display the entire result of a database query as a table to the user.
     (Not just the first X rows that were returned by the *execute_sql* tool.)
-    Call this tool instead of formatting the data as a table in your response."""
-    result = ctx.deps.database.last_query
+    Call this tool instead of formatting the data as a table in your response.
+
+    Args:
+        query_id: The query_id returned by the *execute_sql* tool (defaults to the most recent query)
+    """
+    database = ctx.deps.database
+    result = database.last_query if query_id is None else database.get_result(query_id)
     if not result:
-        return "No previous query results."
-    ctx.deps.console.print("Result data: ", end="")
-    ctx.deps.console.print(Markdown(result.to_markdown(include_details=False)))
+        return "No previous query results." if query_id is None else f"No result found for query_id {query_id}."
+    # Results limited to the rows returned to the LLM are executed again to display the entire result
+    result = await database.run_in_executor(database.full_result, result)
+    console = ctx.deps.console
+    if not result.rows:
+        console.print("Result data: No results")
+        return "Result displayed, DO NOT also provide the result data in your response."
+
+    # Only the first page is rendered, fetching it may require reading from the database or spill file
+    pager = ResultPager(result, console, page_size=ctx.deps.page_size)
+    rendered_page = await database.run_in_executor(pager.render_page, 0)
+    console.print("Result data: ")
+    console.print(rendered_page)
+    if pager.page_count != 1:
+        return (
+            f"First page of the result displayed (the user can view more pages with the /result {result.query_id} "
+            "command), DO NOT also provide the result data in your response."
+        )
     return "Result displayed, DO NOT also provide the result data in your response."
+
+
+async def search_schema(ctx: RunContext[AgentDeps], keywords: str) -> str:
+    """Search the database schema for tables relevant to the given keywords (e.g. "customer order revenue").
+    Keywords are matched against table names, column names and foreign key references.
+    Returns the best matching tables with their columns, use the *describe_tables* tool to get their full schema."""
+    database = ctx.deps.database
+    # Building the index requires all tables to be reflected, so is done in the database thread pool
+    schema_index = await database.run_in_executor(lambda: database.schema_index)
+    results = schema_index.search(keywords, limit=MAX_SEARCH_RESULTS)
+    if not results:
+        return "No matching tables found, try different keywords."
+
+    lines = []
+    for result in results:
+        # List matching columns first
+        column_names = result.matched_columns + [
+            column.name for column in result.table.columns if column.name not in result.matched_columns
+        ]
+        columns_str = ", ".join(column_names[:MAX_SEARCH_RESULT_COLUMNS])
+        if len(column_names) > MAX_SEARCH_RESULT_COLUMNS:
+            columns_str += f", ... ({len(column_names) - MAX_SEARCH_RESULT_COLUMNS} more)"
+        lines.append(f"{result.table.name}: {columns_str}")
+    return "\n".join(lines)
+
+
+async def describe_tables(ctx: RunContext[AgentDeps], table_names: list[str]) -> str:
+    """Get the full schema (columns, indexes and constraints) of the given tables."""
+    database = ctx.deps.database
+    try:
+        return await database.run_in_executor(database.describe_schema, table_names, ctx.deps.schema_format)
+    except TableNotFoundError as e:
+        raise ModelRetry(str(e)) from e
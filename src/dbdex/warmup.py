@@ -0,0 +1,87 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+import httpx
+import logfire
+from pydantic_ai.models import Model
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.settings import ModelSettings
+from pydantic_ai.usage import UsageLimits
+
+from dbdex.agent import AgentRunner
+
+OLLAMA_PORT = 11434
+# Prompt of the warm-up request, which only generates a single token
+WARMUP_PROMPT = "Reply with OK."
+# Loading a large model from disk can take minutes
+MODEL_LOAD_TIMEOUT = 300.0
+
+
+@dataclass
+class StartupTimings:
+    """Durations (in seconds) of the phases of startup, some of which run concurrently."""
+
+    phases: dict[str, float] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+    # Time until the CLI was ready for the first question
+    total: float | None = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase of startup."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def finish(self) -> None:
+        self.total = time.perf_counter() - self.started_at
+        logfire.info("Startup finished in {total:.2f}s", total=self.total, phases=self.phases)
+
+    def format(self) -> str:
+        phases = ", ".join(f"{name} {duration:.2f}s" for name, duration in self.phases.items())
+        total = self.total if self.total is not None else time.perf_counter() - self.started_at
+        return f"Startup took {total:.2f}s ({phases})"
+
+
+async def load_model(model: Model) -> None:
+    """Load an Ollama model into memory, so the first question doesn't pay the cost of loading it. Does nothing for
+    other models.
+
+    How long the model stays loaded is left to the Ollama server's `OLLAMA_KEEP_ALIVE` (5 minutes by default):
+    requests to its OpenAI-compatible API can't set a keep-alive, and each of them resets the model's expiry to it.
+
+    Errors are logged rather than raised, like in `prime_prompt_cache`.
+    """
+    if not isinstance(model, OpenAIModel) or model.client.base_url.port != OLLAMA_PORT:
+        return
+    # A generate request without a prompt only loads the model (this is only supported by Ollama's native API)
+    base_url = str(model.client.base_url).rstrip("/").removesuffix("/v1")
+    try:
+        async with httpx.AsyncClient(timeout=MODEL_LOAD_TIMEOUT) as client:
+            response = await client.post(f"{base_url}/api/generate", json={"model": model.model_name})
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        logfire.warn("Loading the model failed: {error}", error=str(e))
+
+
+async def prime_prompt_cache(agent_runner: AgentRunner[Any]) -> None:
+    """Send the agent's system prompt and tools to the model in a request which generates a single token, so the
+    model's prompt cache holds them and the first question only needs to process the question itself.
+
+    The message history of the runner is not changed. Errors are logged rather than raised, since the warm-up
+    is only an optimization (any problem with the model will surface on the first question).
+    """
+    try:
+        await agent_runner.agent.run(
+            WARMUP_PROMPT,
+            deps=agent_runner.deps,
+            model_settings=ModelSettings(max_tokens=1),
+            # The single token can't be a complete tool call, but don't allow the model to continue if it were
+            usage_limits=UsageLimits(request_limit=1),
+        )
+    except Exception as e:
+        logfire.warn("Model warm-up request failed: {error}", error=str(e))
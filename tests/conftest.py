@@ -0,0 +1,16 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from dbdex.database import Database
+
+
+@pytest.fixture
+def database(tmp_path: Path) -> Database:
+    """Create a SQLite database with a `users` table containing 10 rows."""
+    db_path = tmp_path / "test.sqlite3"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        conn.executemany("INSERT INTO users (id, name) VALUES (?, ?)", [(i, f"user{i}") for i in range(1, 11)])
+    return Database(f"sqlite:///{db_path}", fetch_size=3)
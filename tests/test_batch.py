@@ -0,0 +1,90 @@
+import asyncio
+import io
+import json
+
+import pytest
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from rich.console import Console
+
+from dbdex.agent import get_agent_runner
+from dbdex.cli.batch import BatchQuestion, read_questions, run_batch
+from dbdex.database import Database
+from dbdex.deps import CLIAgentDeps
+from dbdex.stats import current_turn_stats
+
+
+def test_read_questions() -> None:
+    lines = ['{"id": "a", "question": "How many users?"}\n', "\n", '"Which user is first?"\n']
+    assert read_questions(lines) == [BatchQuestion("a", "How many users?"), BatchQuestion(3, "Which user is first?")]
+
+    with pytest.raises(ValueError, match="Line 2 is not valid JSON"):
+        read_questions(['"ok"', "not json"])
+    with pytest.raises(ValueError, match='Line 1 is not a question string or an object with a "question" string'):
+        read_questions(['{"id": 1}'])
+
+
+def test_run_batch(database: Database) -> None:
+    def query_then_answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        last_part = messages[-1].parts[-1]
+        if isinstance(last_part, UserPromptPart):
+            if last_part.content == "fail":
+                raise RuntimeError("model unavailable")
+            if last_part.content == "typo":
+                return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": "SELECT nme FROM users"})])
+            return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": "SELECT id, name FROM users"})])
+        if last_part.part_kind == "retry-prompt":
+            return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": "SELECT name FROM users WHERE id = 1"})])
+        return ModelResponse(parts=[TextPart("Done.")])
+
+    deps = CLIAgentDeps(database=database, console=Console(quiet=True), max_return_values=200)
+    runner = get_agent_runner(FunctionModel(query_then_answer), deps)
+    questions = [BatchQuestion(1, "list users"), BatchQuestion(2, "typo"), BatchQuestion(3, "fail")]
+    output = io.StringIO()
+
+    failed = asyncio.run(run_batch(runner, questions, output, concurrency=2))
+
+    records = {record["id"]: record for record in map(json.loads, output.getvalue().splitlines())}
+    assert failed == 1
+    assert records[1]["answer"] == "Done."
+    assert records[1]["queries"] == [
+        {
+            "sql": "SELECT id, name FROM users",
+            "row_count": 10,
+            "truncated": False,
+            "seconds": pytest.approx(0, abs=1),
+            "cached": False,
+        }
+    ]
+    assert [query["sql"] for query in records[2]["queries"]] == [
+        "SELECT nme FROM users",
+        "SELECT name FROM users WHERE id = 1",
+    ]
+    assert "Did you mean 'name'" in records[2]["queries"][0]["error"]
+    assert records[2]["queries"][1]["row_count"] == 1
+    assert records[3]["error"] == "RuntimeError: model unavailable"
+    assert records[3]["answer"] is None
+    # The runner passed in is not used itself, so its history is unchanged
+    assert runner.message_history is None
+
+
+def test_run_batch_turn_stats(database: Database) -> None:
+    turns = []
+
+    # Async so it runs in the context of the turn (sync functions run in a thread)
+    async def answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        stats = current_turn_stats()
+        assert stats is not None
+        turns.append(stats.turn)
+        await asyncio.sleep(0.01)
+        return ModelResponse(parts=[TextPart("Done.")])
+
+    deps = CLIAgentDeps(database=database, console=Console(quiet=True), max_return_values=200)
+    runner = get_agent_runner(FunctionModel(answer), deps)
+    questions = [BatchQuestion(i, f"question {i}") for i in range(4)]
+
+    assert asyncio.run(run_batch(runner, questions, io.StringIO(), concurrency=2)) == 0
+
+    # Each worker numbers its own turns
+    assert sorted(turns) in ([1, 1, 2, 2], [1, 1, 2, 3])
+    assert runner.turn_stats == []
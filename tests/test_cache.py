@@ -0,0 +1,90 @@
+import sqlite3
+from pathlib import Path
+from unittest.mock import patch
+
+from dbdex.cache import LRUCache, normalize_sql
+from dbdex.database import Database
+
+
+def test_normalize_sql() -> None:
+    assert normalize_sql("SELECT  *\n  FROM users ;") == "SELECT * FROM users"
+    # Whitespace inside quoted strings is preserved
+    assert normalize_sql("SELECT 'a  b' FROM  \"my  table\"") == "SELECT 'a  b' FROM \"my  table\""
+
+
+class TestLRUCache:
+    def test_get_put(self) -> None:
+        cache: LRUCache[str] = LRUCache(max_size=100)
+        assert cache.get("a") is None
+        cache.put("a", "value", size=10)
+        assert cache.get("a") == "value"
+
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.entries, stats.size) == (1, 1, 1, 10)
+        assert stats.hit_rate == 0.5
+
+    def test_lru_eviction(self) -> None:
+        cache: LRUCache[str] = LRUCache(max_size=100)
+        cache.put("a", "a", size=40)
+        cache.put("b", "b", size=40)
+        cache.get("a")  # "b" is now least recently used
+        cache.put("c", "c", size=40)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "a"
+        assert cache.get("c") == "c"
+        assert cache.stats().evictions == 1
+
+        # Entries larger than the budget are not cached
+        cache.put("d", "d", size=101)
+        assert cache.get("d") is None
+
+    def test_ttl(self) -> None:
+        cache: LRUCache[str] = LRUCache(max_size=100, ttl=10)
+        with patch("dbdex.cache.time.monotonic", return_value=0):
+            cache.put("a", "a", size=1)
+        with patch("dbdex.cache.time.monotonic", return_value=5):
+            assert cache.get("a") == "a"
+        with patch("dbdex.cache.time.monotonic", return_value=11):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+def test_database_result_cache(database: Database) -> None:
+    database.result_cache = LRUCache(max_size=1024 * 1024)
+
+    result = database.execute_sql("SELECT id, name FROM users")
+    assert result.cached is False
+
+    cached_result = database.execute_sql("SELECT id,  name\nFROM users;")
+    assert cached_result.cached is True
+    assert cached_result.rows == result.rows
+    assert database.last_query is cached_result
+    assert "(cached)" in cached_result.to_markdown()
+
+    # Streamed results are incomplete so are not cached
+    database.execute_sql("SELECT id FROM users", stream=True)
+    assert database.execute_sql("SELECT id FROM users").cached is False
+
+    stats = database.cache_stats
+    assert stats is not None
+    assert (stats.hits, stats.misses) == (1, 3)
+
+
+def test_result_cache_reflects_only_queried_tables(tmp_path: Path) -> None:
+    """Without a catalog fingerprint, only the tables a query references are reflected (and none if the result
+    cache is disabled)."""
+    db_path = tmp_path / "tables.sqlite3"
+    with sqlite3.connect(db_path) as conn:
+        for i in range(5):
+            conn.execute(f"CREATE TABLE t{i} (id INTEGER PRIMARY KEY)")
+    with patch("dbdex.database.get_catalog_fingerprint", return_value=None):
+        database = Database(f"sqlite:///{db_path}", validate_queries=False)
+
+    database.execute_sql("SELECT id FROM t0")
+    assert list(database.metadata.tables) == []
+
+    database.result_cache = LRUCache(max_size=1024 * 1024)
+    database.execute_sql("SELECT id FROM t1")
+    assert database.execute_sql("SELECT id FROM t1").cached is True
+    assert list(database.metadata.tables) == ["t1"]
@@ -0,0 +1,48 @@
+from datetime import date, datetime
+
+from dbdex.columnar import ArrayColumn, ColumnarRows, DictionaryColumn, ObjectColumn
+from dbdex.database import Database
+
+
+def test_columnar_rows() -> None:
+    rows = [
+        (i, i / 2, f"type{i % 3}", date(2024, 1, 1 + i % 28) if i % 4 else None, datetime(2024, 1, 1, i % 24))
+        for i in range(100)
+    ]
+    columnar = ColumnarRows(["id", "value", "type", "day", "created_at"], rows)
+
+    assert len(columnar) == 100
+    assert [type(column) for column in columnar._data] == [
+        ArrayColumn,
+        ArrayColumn,
+        DictionaryColumn,
+        ArrayColumn,
+        ObjectColumn,
+    ]
+    assert list(columnar) == rows
+    assert columnar[-1] == rows[-1]
+    assert columnar[10:13] == rows[10:13]
+    assert columnar[5].type == "type2"
+    assert columnar[5]._fields == ("id", "value", "type", "day", "created_at")
+
+
+def test_columnar_rows_type_changes() -> None:
+    """Columns are converted to a less compact representation when values don't fit."""
+    columnar = ColumnarRows(["a", "b", "c"])
+    columnar.extend([(None, 1, "x"), (None, 2, "x")])
+    columnar.extend([(1.5, 2**70, 3), (None, 3, "y")])
+
+    assert [type(column) for column in columnar._data] == [ArrayColumn, ObjectColumn, ObjectColumn]
+    assert list(columnar) == [(None, 1, "x"), (None, 2, "x"), (1.5, 2**70, 3), (None, 3, "y")]
+
+
+def test_execute_sql_columnar(database: Database) -> None:
+    database.columnar_results = True
+    result = database.execute_sql("SELECT id, name FROM users ORDER BY id")
+
+    assert isinstance(result.rows, ColumnarRows)
+    assert result.row_count == 10
+    assert result.columns == ["id", "name"]
+    assert [row.id for row in result.head(3)] == [1, 2, 3]
+    assert result.to_csv().splitlines()[-1] == "10,user10"
+    assert "| 10 | user10 |" in result.to_markdown()
@@ -1,10 +1,27 @@
+import sqlite3
+import time
 from collections import namedtuple
 from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from threading import Thread
 from typing import Any, cast
 
+import pytest
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, text
 from sqlalchemy.engine import Row
 
-from dbdex.database import QueryResult
+from dbdex.database import (
+    Database,
+    QueryCancelledError,
+    QueryResult,
+    QueryTimeoutError,
+    TableNotFoundError,
+    format_table_schema,
+    format_table_schema_compact,
+)
+from dbdex.storage import SpilledRows
+from dbdex.tokens import estimate_tokens
 
 
 def make_rows(data: list[dict[str, Any]]) -> list[Row[Any]]:
@@ -124,3 +141,233 @@ class TestQueryResult:
         assert error_result.success is False
         assert error_result.row_count == 0
         assert error_result.columns is None
+
+
+# Counts to 10^9, which takes far longer than any of the timeouts used in tests
+SLOW_QUERY = (
+    "SELECT (WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+    "SELECT count(*) FROM c) AS n"
+)
+
+
+class TestDatabase:
+    def test_execute_sql(self, database: Database) -> None:
+        result = database.execute_sql("SELECT id, name FROM users")
+
+        assert result.complete is True
+        assert result.row_count == 10
+        assert result.columns == ["id", "name"]
+        assert database.last_query is result
+
+    def test_execute_sql_streamed(self, database: Database) -> None:
+        """Streamed results only fetch rows as they are needed."""
+        result = database.execute_sql("SELECT id, name FROM users ORDER BY id", stream=True)
+
+        assert result.complete is False
+        assert result.row_count == 1
+        assert result.columns == ["id", "name"]
+
+        assert [row.id for row in result.head(4)] == [1, 2, 3, 4]
+        assert result.row_count == 4
+        assert result.complete is False
+
+        # Entire result is available without being kept in memory
+        assert [row.id for row in result.iter_rows()] == list(range(1, 11))
+        assert result.row_count == 4
+        # Query is re-executed once the cursor has been consumed
+        assert [row.id for row in result.iter_rows()] == list(range(1, 11))
+        assert result.to_csv().count("\n") == 11
+
+    def test_execute_sql_streamed_fully_fetched(self, database: Database) -> None:
+        result = database.execute_sql("SELECT id FROM users WHERE id <= 2", stream=True)
+
+        assert len(result.head(5)) == 2
+        assert result.complete is True
+        assert result.row_count == 2
+
+    def test_execute_sql_streamed_no_results(self, database: Database) -> None:
+        result = database.execute_sql("SELECT id FROM users WHERE id > 100", stream=True)
+
+        assert result.complete is True
+        assert result.rows == []
+        assert result.columns is None
+
+    def test_execute_sql_max_rows(self, database: Database) -> None:
+        database.max_rows = 4
+        result = database.execute_sql("SELECT id FROM users ORDER BY id")
+
+        assert [row.id for row in result.rows] == [1, 2, 3, 4]
+        assert result.truncated is True
+        assert "truncated to the first 4 rows" in result.details_markdown()
+
+        assert database.execute_sql("SELECT id FROM users WHERE id <= 4").truncated is False
+        # Streamed results stop at the row limit too
+        assert len(list(database.execute_sql("SELECT id FROM users", stream=True).iter_rows())) == 4
+
+    def test_execute_sql_limit(self, database: Database) -> None:
+        result = database.execute_sql("SELECT id FROM users ORDER BY id", stream=True, limit=3)
+
+        assert result.complete is True
+        assert [row.id for row in result.rows] == [1, 2, 3]
+        assert result.truncated is True
+        # The original query is kept, so it can be re-executed to get the entire result
+        assert result.sql == "SELECT id FROM users ORDER BY id"
+        assert database.execute_sql("SELECT id FROM users WHERE id <= 3", limit=3).truncated is False
+
+    def test_result_history(self, database: Database) -> None:
+        database.max_stored_results = 2
+        first = database.execute_sql("SELECT id FROM users WHERE id = 1", stream=True)
+        second = database.execute_sql("SELECT id FROM users WHERE id = 2")
+
+        assert database.get_result(first.query_id or 0) is first
+        assert database.last_query is second
+        assert "Query #2" in second.details_markdown()
+
+        # The oldest result is closed once the history is full
+        third = database.execute_sql("SELECT id FROM users WHERE id = 3")
+        assert database.get_result(first.query_id or 0) is None
+        assert database.get_result(third.query_id or 0) is third
+        assert first.row_stream is None
+
+    def test_streamed_results_release_connections(self, tmp_path: Path) -> None:
+        """More streamed results than the connection pool can hold are kept without consuming them."""
+        database_path = tmp_path / "streams.sqlite3"
+        with sqlite3.connect(database_path) as conn:
+            conn.execute("CREATE TABLE numbers (n INTEGER)")
+            conn.executemany("INSERT INTO numbers VALUES (?)", [(i,) for i in range(10)])
+        database = Database(f"sqlite:///{database_path}", stream_results=True, max_workers=2, fetch_size=3)
+        database.engine.pool._timeout = 1  # type: ignore[attr-defined]
+
+        # The pool holds 2 connections plus 2 overflow
+        results = [database.execute_sql(f"SELECT n FROM numbers WHERE n >= {i}") for i in range(6)]
+        assert sum(result.row_stream is not None for result in results) == database.max_open_streams
+        # Results whose cursor was closed are fetched by executing the query again
+        assert [len(list(result.iter_rows())) for result in results] == [10, 9, 8, 7, 6, 5]
+        assert results[0].get_rows(5, 7)[0].n == 5
+        database.engine.dispose()
+
+    def test_count_rows(self, database: Database) -> None:
+        assert database.count_rows("SELECT id FROM users WHERE id > 4;") == 6
+        assert database.count_rows("SELECT id FROM users", mode="none") is None
+        # Estimates are not supported for SQLite
+        assert database.count_rows("SELECT id FROM users", mode="estimate") is None
+
+    @pytest.mark.parametrize("stream", [False, True])
+    def test_execute_sql_timeout(self, database: Database, stream: bool) -> None:
+        database.query_timeout = 0.2
+        with pytest.raises(QueryTimeoutError):
+            database.execute_sql(SLOW_QUERY, stream=stream)
+
+        assert database.last_query is not None
+        assert database.last_query.timed_out is True
+        assert database.last_query.cancelled is False
+        # The connection can still be used after the query was cancelled
+        assert database.execute_sql("SELECT count(*) AS n FROM users").rows[0].n == 10
+
+    def test_cancel_queries(self, database: Database) -> None:
+        errors: list[Exception] = []
+
+        def run_query() -> None:
+            try:
+                database.execute_sql(SLOW_QUERY)
+            except Exception as e:
+                errors.append(e)
+
+        thread = Thread(target=run_query)
+        thread.start()
+        # Keep cancelling until the query has started running and is cancelled
+        deadline = time.monotonic() + 5
+        while thread.is_alive() and time.monotonic() < deadline:
+            database.cancel_queries()
+            thread.join(timeout=0.05)
+
+        assert not thread.is_alive()
+        assert len(errors) == 1 and isinstance(errors[0], QueryCancelledError)
+        assert database.last_query is not None
+        assert database.last_query.cancelled is True
+
+
+class TestSpilledRows:
+    def test_spilled_rows(self) -> None:
+        """Rows spilled to disk behave like an in-memory list of rows."""
+        head = make_rows([{"id": 1, "value": "a"}])
+        spilled = SpilledRows(["id", "value"], head=head)
+        spilled.extend([(2, Decimal("1.5")), (3, None), (4, datetime(2024, 1, 1))])
+
+        assert len(spilled) == 4
+        assert spilled[0] == (1, "a")
+        assert spilled[1] == (2, Decimal("1.5"))
+        assert spilled[-1] == (4, datetime(2024, 1, 1))
+        assert spilled[1:3] == [(2, Decimal("1.5")), (3, None)]
+        assert spilled[0:2] == [(1, "a"), (2, Decimal("1.5"))]
+        assert [row[0] for row in spilled] == [1, 2, 3, 4]
+        assert spilled[2]._fields == ("id", "value")
+
+        spilled.close()
+        assert not Path(spilled.path).exists()
+
+    def test_execute_sql_spills_large_results(self, database: Database) -> None:
+        database.spill_threshold = 1
+        result = database.execute_sql("SELECT id, name FROM users ORDER BY id")
+
+        assert isinstance(result.rows, SpilledRows)
+        assert result.row_count == 10
+        assert result.columns == ["id", "name"]
+        assert result.to_csv().splitlines()[-1] == "10,user10"
+        assert "| 10 | user10 |" in result.to_markdown()
+
+        # Spill file is removed once the result is evicted from the result history
+        database.max_stored_results = 1
+        spill_path = Path(result.rows.path)
+        database.execute_sql("SELECT 1")
+        assert not spill_path.exists()
+
+
+class TestSchemaCache:
+    def test_lazy_reflection(self, database: Database) -> None:
+        assert database.table_names == ["users"]
+        assert not database.metadata.tables
+
+        assert [column.name for column in database.get_table("users").columns] == ["id", "name"]
+        assert list(database.metadata.tables) == ["users"]
+
+        with pytest.raises(TableNotFoundError):
+            database.get_table("missing")
+
+    def test_schema_cache(self, database: Database, tmp_path: Path) -> None:
+        db_uri = str(database.engine.url)
+        cache_dir = tmp_path / "cache"
+        Database(db_uri, schema_cache_dir=cache_dir).describe_schema()
+
+        cached_database = Database(db_uri, schema_cache_dir=cache_dir)
+        # Tables are loaded from the cache without being reflected
+        assert list(cached_database.metadata.tables) == ["users"]
+        assert "name TEXT NOT NULL" in cached_database.describe_schema()
+
+        # Cache is invalidated when the schema changes
+        with database.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY)"))
+        updated_database = Database(db_uri, schema_cache_dir=cache_dir)
+        assert not updated_database.metadata.tables
+        assert updated_database.table_names == ["orders", "users"]
+
+
+def test_format_table_schema_compact() -> None:
+    metadata = MetaData()
+    Table("customers", metadata, Column("id", Integer, primary_key=True))
+    orders = Table(
+        "orders",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("customer_id", Integer, ForeignKey("customers.id"), nullable=False),
+        Column("status", String(20)),
+        Column("created_at", DateTime(timezone=True)),
+        Index("ix_orders_customer_status", "customer_id", "status"),
+    )
+
+    assert format_table_schema_compact(orders) == (
+        "orders(id int PK, customer_id int NN ->customers.id, status varchar(20), created_at datetime) "
+        "IDX(customer_id,status)"
+    )
+    # Compact format is much smaller than the full format
+    assert estimate_tokens(format_table_schema_compact(orders)) < estimate_tokens(format_table_schema(orders)) / 2
@@ -0,0 +1,32 @@
+from dbdex.encoding import encode_rows, format_value
+
+
+def test_format_value() -> None:
+    assert format_value(None) == ("NULL", False)
+    assert format_value("a\tb\nc") == ("a\\tb\\nc", False)
+    assert format_value("x" * 30, max_value_length=10) == ("xxxxxxxxxx…(+20 chars)", True)
+
+
+def test_encode_rows() -> None:
+    rows = [(i, f"name{i}") for i in range(3)]
+    encoded = encode_rows(["id", "name"], rows, token_budget=1000)
+
+    assert encoded.text == "id\tname\n0\tname0\n1\tname1\n2\tname2"
+    assert encoded.row_count == 3
+    assert encoded.describe_omissions(total_rows=3) is None
+
+
+def test_encode_rows_over_budget() -> None:
+    rows = [(i, "lorem ipsum " * 100, "x" * 300) for i in range(20)]
+    encoded = encode_rows(["id", "body", "code"], rows, token_budget=400)
+
+    # The column which uses the most tokens is dropped, long values are truncated and rows are dropped
+    assert encoded.omitted_columns == ["body"]
+    assert encoded.truncated_columns == ["code"]
+    assert 3 <= encoded.row_count < 20
+    assert encoded.tokens <= 400
+    assert encoded.text.splitlines()[0] == "id\tcode"
+    assert encoded.describe_omissions(total_rows=20) == (
+        f"To fit the token budget, only the first {encoded.row_count} of 20 rows are included; "
+        "columns omitted: body; values longer than 200 characters truncated in columns: code"
+    )
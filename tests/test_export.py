@@ -0,0 +1,93 @@
+import gzip
+import json
+from datetime import date
+from pathlib import Path
+from typing import Any, Iterator
+
+import pytest
+from pydantic_ai.models.test import TestModel
+from rich.console import Console
+
+from dbdex.agent import get_agent_runner
+from dbdex.cli.special_commands import handle_export
+from dbdex.database import Database
+from dbdex.deps import CLIAgentDeps
+from dbdex.export import detect_format, export_rows
+
+COLUMNS = ["id", "name", "joined"]
+ROWS = [(1, "Alice", date(2024, 1, 1)), (2, "Bob", None)]
+
+
+def test_detect_format() -> None:
+    assert detect_format(Path("results.csv")) == ("csv", None)
+    assert detect_format(Path("results.JSONL.gz")) == ("jsonl", "gzip")
+    assert detect_format(Path("out.v2.parquet")) == ("parquet", None)
+    assert detect_format(Path("results.csv.zst")) == ("csv", "zstd")
+    assert detect_format(Path("results")) is None
+    assert detect_format(Path("results.txt.gz")) is None
+
+
+def test_export_csv(tmp_path: Path) -> None:
+    path = tmp_path / "results.csv"
+    assert export_rows(COLUMNS, iter(ROWS), path, "csv") == 2
+    assert path.read_text() == "id,name,joined\n1,Alice,2024-01-01\n2,Bob,\n"
+
+
+def test_export_jsonl_gzip(tmp_path: Path) -> None:
+    path = tmp_path / "results.jsonl.gz"
+    assert export_rows(COLUMNS, iter(ROWS), path, "jsonl", "gzip") == 2
+    with gzip.open(path, "rt") as f:
+        assert [json.loads(line) for line in f] == [
+            {"id": 1, "name": "Alice", "joined": "2024-01-01"},
+            {"id": 2, "name": "Bob", "joined": None},
+        ]
+
+
+def test_export_parquet(tmp_path: Path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "results.parquet"
+    assert export_rows(COLUMNS, iter(ROWS), path, "parquet", "zstd") == 2
+    assert pq.read_table(path).to_pylist() == [
+        {"id": 1, "name": "Alice", "joined": date(2024, 1, 1)},
+        {"id": 2, "name": "Bob", "joined": None},
+    ]
+
+
+def test_failed_export_keeps_existing_file(tmp_path: Path) -> None:
+    path = tmp_path / "results.jsonl"
+    path.write_text("previous export\n")
+
+    def failing_rows() -> Iterator[tuple[Any, ...]]:
+        yield from ROWS
+        raise RuntimeError("Connection lost")
+
+    with pytest.raises(RuntimeError):
+        export_rows(COLUMNS, failing_rows(), path, "jsonl")
+    assert path.read_text() == "previous export\n"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_export_reports_truncation(database: Database, tmp_path: Path) -> None:
+    console = Console(record=True, width=200)
+    deps = CLIAgentDeps(database=database, console=console, max_return_values=200)
+    runner = get_agent_runner(TestModel(), deps)
+    database.max_rows = 4
+    database.execute_sql("SELECT * FROM users")
+
+    path = tmp_path / "results.csv"
+    handle_export(f"{path}", runner)
+    assert "only its fetched rows were exported" in console.export_text()
+    handle_export(f"{path} --full", runner)
+    assert "stopped at the maximum of 4 rows" in console.export_text()
+    assert len(path.read_text().splitlines()) == 5
+
+
+def test_export_limited_result(database: Database, tmp_path: Path) -> None:
+    deps = CLIAgentDeps(database=database, console=Console(quiet=True), max_return_values=200)
+    runner = get_agent_runner(TestModel(), deps)
+    assert database.execute_sql("SELECT * FROM users", limit=3).limited
+
+    # The query is executed again without the limit pushed down for the LLM
+    path = tmp_path / "results.csv"
+    handle_export(f"{path}", runner)
+    assert len(path.read_text().splitlines()) == 11
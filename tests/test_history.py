@@ -0,0 +1,104 @@
+import asyncio
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from dbdex.agent import get_agent_runner
+from dbdex.database import Database
+from dbdex.deps import AgentDeps
+from dbdex.history import CompactionPolicy, compact_history, estimate_message_tokens, split_turns
+from dbdex.tools import DBQueryResponse
+
+
+def make_turn(turn: int, answer: str = "answer", system_prompt: bool = False) -> list[ModelMessage]:
+    prompt_parts = [SystemPromptPart("system prompt")] if system_prompt else []
+    return [
+        ModelRequest(parts=[*prompt_parts, UserPromptPart(f"question {turn}")]),
+        ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": "SELECT 1"}, tool_call_id=f"call{turn}")]),
+        ModelRequest(
+            parts=[
+                ToolReturnPart(
+                    "execute_sql",
+                    DBQueryResponse(query_id=turn, columns=["x"], rows=[[i] for i in range(200)]),
+                    tool_call_id=f"call{turn}",
+                )
+            ]
+        ),
+        ModelResponse(parts=[TextPart(answer)]),
+    ]
+
+
+def make_history(turns: int, answer: str = "answer") -> list[ModelMessage]:
+    return [message for turn in range(1, turns + 1) for message in make_turn(turn, answer, system_prompt=turn == 1)]
+
+
+def tool_return_contents(messages: list[ModelMessage]) -> list[object]:
+    return [part.content for message in messages for part in message.parts if isinstance(part, ToolReturnPart)]
+
+
+def test_split_turns() -> None:
+    turns = split_turns(make_history(3))
+    assert [len(turn) for turn in turns] == [4, 4, 4]
+
+
+def test_stub_old_tool_returns() -> None:
+    messages = make_history(3)
+    compacted = compact_history(messages, CompactionPolicy(keep_recent_turns=1))
+
+    contents = tool_return_contents(compacted)
+    assert contents[:2] == [
+        "[Output of execute_sql omitted from the history to save space, query_id 1]",
+        "[Output of execute_sql omitted from the history to save space, query_id 2]",
+    ]
+    assert isinstance(contents[2], DBQueryResponse)
+    assert len(compacted) == len(messages)
+    assert estimate_message_tokens(compacted) < estimate_message_tokens(messages)
+    # The original messages are not modified
+    assert all(isinstance(content, DBQueryResponse) for content in tool_return_contents(messages))
+
+
+def test_compact_to_token_ceiling() -> None:
+    messages = make_history(6, answer="long answer " * 100)
+    recent_tokens = estimate_message_tokens([message for turn in split_turns(messages)[-2:] for message in turn])
+    max_tokens = recent_tokens + 200
+    compacted = compact_history(messages, CompactionPolicy(keep_recent_turns=2, max_history_tokens=max_tokens))
+
+    assert estimate_message_tokens(compacted) <= max_tokens
+    # The system prompt and the most recent turns are kept, and requests and responses alternate
+    assert isinstance(compacted[0].parts[0], SystemPromptPart)
+    assert compacted[-8:] == messages[-8:]
+    assert all(type(a) is not type(b) for a, b in zip(compacted, compacted[1:], strict=False))
+    # Older turns are summarized before being dropped
+    user_prompts = [part.content for message in compacted for part in message.parts if isinstance(part, UserPromptPart)]
+    assert user_prompts[-2:] == ["question 5", "question 6"]
+    assert "question 1" not in user_prompts
+    assert "[answer truncated in the history]" in str(compacted[-9].parts[0])
+
+
+def test_agent_runner_compaction_and_usage(database: Database) -> None:
+    def query_then_answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if isinstance(messages[-1].parts[-1], UserPromptPart):
+            return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": "SELECT id, name FROM users"})])
+        return ModelResponse(parts=[TextPart("There are 10 users.")])
+
+    deps = AgentDeps(database=database, max_return_values=200)
+    model = FunctionModel(query_then_answer)
+    runner = get_agent_runner(model, deps, compaction=CompactionPolicy(keep_recent_turns=1))
+
+    asyncio.run(runner.run("first question"))
+    asyncio.run(runner.run("second question"))
+
+    assert [usage.turn for usage in runner.turn_usage] == [1, 2]
+    assert runner.turn_usage[1].compacted_history_tokens < runner.turn_usage[1].history_tokens
+    assert runner.turn_usage[1].request_tokens
+    assert runner.message_history is not None
+    assert "omitted from the history" in str(tool_return_contents(runner.message_history)[0])
@@ -0,0 +1,53 @@
+from rich.console import Console
+
+from dbdex.cli.pager import ResultPager
+from dbdex.database import Database
+
+
+def test_result_pager(database: Database) -> None:
+    result = database.execute_sql("SELECT id, name FROM users ORDER BY id")
+    console = Console(record=True, width=80)
+    pager = ResultPager(result, console, page_size=4)
+
+    assert pager.page_count == 3
+    assert pager.show(2)
+    output = console.export_text()
+    assert "user9" in output and "user10" in output and "user8" not in output
+    assert "Rows 9-10 of 10 (page 3 of 3)" in output
+    assert not pager.show(3)
+
+
+def test_result_pager_streamed(database: Database) -> None:
+    """Pages of streamed results are fetched from the cursor when they are viewed."""
+    result = database.execute_sql("SELECT id, name FROM users ORDER BY id", stream=True)
+    console = Console(record=True, width=80)
+    pager = ResultPager(result, console, page_size=4)
+
+    assert pager.page_count is None
+    assert pager.show(1)
+    assert result.row_count == 8
+    assert "Rows 5-8 of more (page 2 of ?)" in console.export_text()
+
+    assert pager.show(2)
+    assert pager.page_count == 3
+
+
+def test_result_pager_streamed_bounded_memory(database: Database) -> None:
+    """Only the rows of the visible page of a streamed result are kept in memory."""
+    result = database.execute_sql("SELECT id, name FROM users ORDER BY id", stream=True)
+    console = Console(record=True, width=80)
+    pager = ResultPager(result, console, page_size=3)
+
+    assert pager.show(2)
+    assert [row.id for row in result.rows] == [7, 8, 9]
+    assert result.row_count == 9
+    assert pager.show(3)
+    assert [row.id for row in result.rows] == [10]
+    assert pager.page_count == 4
+    assert "Rows 10-10 of 10 (page 4 of 4)" in console.export_text()
+
+    # Going back to an earlier page executes the query again
+    assert pager.show(0)
+    assert [row.id for row in result.rows] == [1, 2, 3]
+    assert not result.complete
+    assert [row.id for row in result.iter_rows()] == list(range(1, 11))
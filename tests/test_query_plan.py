@@ -0,0 +1,51 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from dbdex.database import Database, QueryTooExpensiveError
+
+
+@pytest.fixture
+def orders_database(tmp_path: Path) -> Database:
+    """Create a SQLite database with 10 `users` and 100 `orders`, with an index on `orders.user_id`."""
+    db_path = tmp_path / "orders.sqlite3"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER, total REAL)")
+        conn.execute("CREATE INDEX ix_orders_user_id ON orders (user_id)")
+        conn.executemany("INSERT INTO users (id, name) VALUES (?, ?)", [(i, f"user{i}") for i in range(1, 11)])
+        conn.executemany("INSERT INTO orders (user_id, total) VALUES (?, ?)", [(i % 10 + 1, i) for i in range(100)])
+    return Database(f"sqlite:///{db_path}")
+
+
+@pytest.mark.parametrize(
+    "sql, cost",
+    [
+        ("SELECT * FROM orders", 100),
+        ("SELECT * FROM orders WHERE id = 1", 0),
+        # The orders of each user are found with the index
+        ("SELECT * FROM users u JOIN orders o ON o.user_id = u.id WHERE u.name = 'user1'", 10),
+        # Without an index, the orders are scanned for each user
+        ("SELECT * FROM users u, orders o WHERE o.total + u.id > 5", 1000),
+        ("SELECT (SELECT COUNT(*) FROM orders o WHERE o.total + u.id > 5) FROM users u", 1010),
+    ],
+)
+def test_sqlite_plan_cost(orders_database: Database, sql: str, cost: float) -> None:
+    plan = orders_database.explain(sql)
+    assert plan is not None
+    assert plan.cost == cost
+    assert plan.unit == "rows scanned"
+
+
+def test_refuse_expensive_query(orders_database: Database) -> None:
+    orders_database.max_query_cost = 500
+    orders_database.execute_sql("SELECT * FROM users u JOIN orders o ON o.user_id = u.id WHERE u.name = 'user1'")
+
+    with pytest.raises(QueryTooExpensiveError) as exc_info:
+        orders_database.execute_sql("SELECT * FROM users u, orders o WHERE o.total + u.id > 5")
+    message = str(exc_info.value)
+    assert "estimated cost of 1,000 rows scanned exceeds the maximum of 500" in message
+    assert "- SCAN o (~100 rows)" in message
+    assert "- orders: PRIMARY KEY (id), INDEX ix_orders_user_id (user_id ASC)" in message
+    assert "- users: PRIMARY KEY (id)" in message
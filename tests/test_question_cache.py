@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, ToolCallPart, ToolReturnPart
+
+from dbdex.database import Database
+from dbdex.question_cache import QuestionCache, answering_query, question_key
+from dbdex.tools import DBQueryResponse
+
+
+def test_question_key() -> None:
+    assert question_key("How many users were there?") == "how many users"
+    assert question_key("how   many USERS") == "how many users"
+    assert question_key("users with most orders") != question_key("orders with most users")
+
+
+def test_lookup_and_store(database: Database, tmp_path: Path) -> None:
+    cache = QuestionCache(tmp_path, database)
+    assert cache.lookup("How many users are there?") is None
+
+    cache.store("How many users are there?", "SELECT COUNT(*) FROM users")
+    cached = cache.lookup("how many users?")
+    assert cached is not None
+    assert (cached.sql, cached.hits) == ("SELECT COUNT(*) FROM users", 1)
+    assert cache.lookup("How many active users are there?") is None
+
+    # The cache is persisted
+    reloaded = QuestionCache(tmp_path, database)
+    cached = reloaded.lookup("How many users are there")
+    assert cached is not None and cached.hits == 2
+
+    reloaded.remove("how many users")
+    assert reloaded.lookup("How many users are there?") is None
+
+
+def test_schema_change_and_eviction(database: Database, tmp_path: Path) -> None:
+    cache = QuestionCache(tmp_path, database, max_entries=2)
+    for i in range(3):
+        cache.store(f"question {i}", f"SELECT {i}")
+    assert cache.lookup("question 0") is None
+    assert cache.lookup("question 2") is not None
+
+    # Entries cached for a different schema are not used
+    database.__dict__["schema_fingerprint"] = "changed"
+    assert cache.lookup("question 2") is None
+
+
+def test_answering_query(database: Database) -> None:
+    def tool_messages(*sqls: str) -> list[ModelMessage]:
+        messages: list[ModelMessage] = []
+        for sql in sqls:
+            result = database.execute_sql(sql)
+            messages.append(ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": sql})]))
+            response = DBQueryResponse(query_id=result.query_id, columns=result.columns, rows=[])
+            messages.append(ModelRequest(parts=[ToolReturnPart("execute_sql", response)]))
+        return messages
+
+    assert answering_query(tool_messages("SELECT COUNT(*) FROM users"), database) == "SELECT COUNT(*) FROM users"
+    assert answering_query(tool_messages("SELECT 1", "SELECT 1"), database) == "SELECT 1"
+    # Answers based on several queries, or none, can't be cached
+    assert answering_query(tool_messages("SELECT 1", "SELECT 2"), database) is None
+    assert answering_query([], database) is None
@@ -0,0 +1,61 @@
+import asyncio
+from pathlib import Path
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from dbdex.agent import get_agent_runner
+from dbdex.database import Database
+from dbdex.deps import AgentDeps
+from dbdex.recording import CassetteRecorder, load_cassette, replay_cassette, replay_model
+
+
+def record_sessions(database: Database, cassette: Path) -> None:
+    def query_then_answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        last_part = messages[-1].parts[-1]
+        if isinstance(last_part, UserPromptPart):
+            sql = f"SELECT name FROM users WHERE id <= {len(last_part.content)}"
+            return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": sql})])
+        return ModelResponse(parts=[TextPart("Done.")])
+
+    deps = AgentDeps(database=database, max_return_values=200)
+    runner = get_agent_runner(FunctionModel(query_then_answer), deps)
+    runner.recorder = CassetteRecorder(cassette, database, "function:query_then_answer")
+
+    async def run_sessions() -> None:
+        await runner.run("abc")
+        await runner.run("abcde")
+        runner.clear_message_history()
+        await runner.run("ab")
+
+    asyncio.run(run_sessions())
+
+
+def test_record_and_replay(database: Database, tmp_path: Path) -> None:
+    cassette = tmp_path / "session.jsonl"
+    record_sessions(database, cassette)
+
+    header, turns = load_cassette(cassette)
+    assert header["model"] == "function:query_then_answer"
+    assert [turn.question for turn in turns] == ["abc", "abcde", "ab"]
+    assert turns[0].session == turns[1].session != turns[2].session
+    assert turns[1].queries[0]["sql"] == "SELECT name FROM users WHERE id <= 5"
+    assert turns[1].queries[0]["row_count"] == 5
+    assert turns[1].usage["seconds"] > 0
+
+    runner = get_agent_runner(replay_model(), AgentDeps(database=database, max_return_values=200))
+    replayed = asyncio.run(replay_cassette(runner, turns, concurrency=2))
+    assert sorted(turn.question for turn in replayed) == ["ab", "abc", "abcde"]
+    assert all(turn.error is None and turn.differences == [] for turn in replayed)
+
+    # Replaying against a changed database reports the queries whose results changed
+    database.engine.dispose()
+    with database.engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM users WHERE id > 3")
+    replayed = asyncio.run(replay_cassette(runner, turns))
+    differences = {turn.question: turn.differences for turn in replayed}
+    assert differences == {
+        "abc": [],
+        "abcde": ["Query returned 3 rows instead of 5: SELECT name FROM users WHERE id <= 5"],
+        "ab": [],
+    }
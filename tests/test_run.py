@@ -0,0 +1,63 @@
+import asyncio
+import os
+import signal
+from pathlib import Path
+
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from rich.console import Console
+
+from dbdex.agent import get_agent_runner
+from dbdex.cli.run import answer, answer_from_question_cache, run_interruptible
+from dbdex.database import Database
+from dbdex.deps import CLIAgentDeps
+from dbdex.question_cache import QuestionCache
+
+# Query which runs until it is cancelled
+SLOW_QUERY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+
+
+def test_interrupt_turns(database: Database) -> None:
+    async def slow_turn() -> None:
+        await database.execute_sql_async(SLOW_QUERY)
+
+    async def quick_turn() -> None:
+        await asyncio.sleep(0)
+
+    async def interrupt_turns() -> list[int | None]:
+        loop = asyncio.get_running_loop()
+        cancelled_counts = []
+        # Each Ctrl-C only cancels the turn it interrupts, the next turns still run
+        for _ in range(2):
+            loop.call_later(0.2, os.kill, os.getpid(), signal.SIGINT)
+            cancelled_counts.append(await run_interruptible(slow_turn(), database))
+        cancelled_counts.append(await run_interruptible(quick_turn(), database))
+        return cancelled_counts
+
+    assert asyncio.run(interrupt_turns()) == [1, 1, None]
+    assert signal.getsignal(signal.SIGINT) is signal.default_int_handler
+
+
+def test_question_cache_stores_standalone_questions(database: Database, tmp_path: Path) -> None:
+    def query_users(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        last_request = messages[-1]
+        assert isinstance(last_request, ModelRequest)
+        if isinstance(last_request.parts[-1], UserPromptPart):
+            sql = "SELECT COUNT(*) FROM users" if len(messages) == 1 else "SELECT COUNT(*) FROM users WHERE id > 5"
+            return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": sql})])
+        return ModelResponse(parts=[TextPart("Done")])
+
+    deps = CLIAgentDeps(database=database, console=Console(quiet=True), max_return_values=200)
+    runner = get_agent_runner(FunctionModel(query_users), deps)
+    question_cache = QuestionCache(tmp_path, database)
+
+    async def ask() -> bool:
+        await answer("How many users are there?", runner, False, question_cache, None)
+        # A follow-up's query depends on the earlier turns, so it isn't cached
+        await answer("And with an id above 5?", runner, False, question_cache, None)
+        return await answer_from_question_cache("how many users are there", question_cache, runner)
+
+    assert asyncio.run(ask())
+    cached = question_cache.lookup("How many users are there?")
+    assert cached is not None and cached.sql == "SELECT COUNT(*) FROM users"
+    assert question_cache.lookup("And with an id above 5?") is None
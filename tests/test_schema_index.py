@@ -0,0 +1,30 @@
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table
+
+from dbdex.schema_index import SchemaIndex, tokenize
+
+
+def test_tokenize() -> None:
+    assert tokenize("OrderDetails") == ["order", "detail"]
+    assert tokenize("customer_id") == ["customer", "id"]
+    assert tokenize("total revenue by Address") == ["total", "revenue", "by", "address"]
+
+
+def test_schema_index_search() -> None:
+    metadata = MetaData()
+    Table("customers", metadata, Column("id", Integer, primary_key=True), Column("company_name", String))
+    Table(
+        "orders",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("customer_id", ForeignKey("customers.id")),
+        Column("shipped_date", String),
+    )
+    Table("products", metadata, Column("id", Integer, primary_key=True), Column("unit_price", Integer))
+    index = SchemaIndex(metadata.tables.values())
+
+    results = index.search("customer orders")
+    assert [result.table.name for result in results] == ["orders", "customers"]
+    assert results[0].matched_columns == ["customer_id"]
+
+    assert [result.table.name for result in index.search("price")] == ["products"]
+    assert index.search("employees") == []
@@ -0,0 +1,114 @@
+import asyncio
+import json
+from typing import AsyncIterator
+
+import httpx
+import pytest
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from rich.console import Console
+
+from dbdex.agent import get_agent_runner
+from dbdex.database import Database
+from dbdex.deps import CLIAgentDeps
+from dbdex.server import SessionManager, create_app
+
+TestClient = pytest.importorskip("starlette.testclient").TestClient
+
+
+def count_questions(messages: list[ModelMessage]) -> int:
+    return sum(isinstance(part, UserPromptPart) for message in messages for part in message.parts)
+
+
+def make_sessions(database: Database, max_sessions: int = 10) -> SessionManager:
+    def query_then_answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if isinstance(messages[-1].parts[-1], UserPromptPart):
+            return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": "SELECT id, name FROM users"})])
+        return ModelResponse(parts=[TextPart(f"Question {count_questions(messages)} of this session.")])
+
+    async def stream_answer(messages: list[ModelMessage], info: AgentInfo) -> AsyncIterator[str]:
+        for word in ["Streamed ", "answer ", str(count_questions(messages))]:
+            yield word
+
+    deps = CLIAgentDeps(database=database, console=Console(quiet=True), max_return_values=200)
+    runner = get_agent_runner(FunctionModel(query_then_answer, stream_function=stream_answer), deps)
+    return SessionManager(runner, max_sessions=max_sessions)
+
+
+def test_sessions_have_separate_histories(database: Database) -> None:
+    sessions = make_sessions(database)
+    with TestClient(create_app(sessions)) as client:
+        first = client.post("/sessions").json()["session_id"]
+        second = client.post("/sessions").json()["session_id"]
+
+        response = client.post(f"/sessions/{first}/questions", json={"question": "How many users?"})
+        assert response.status_code == 200
+        assert response.json()["answer"] == "Question 1 of this session."
+        assert response.json()["queries"][0]["sql"] == "SELECT id, name FROM users"
+        assert response.json()["queries"][0]["row_count"] == 10
+
+        answer = client.post(f"/sessions/{first}/questions", json={"question": "And now?"}).json()["answer"]
+        assert answer == "Question 2 of this session."
+        answer = client.post(f"/sessions/{second}/questions", json={"question": "How many?"}).json()["answer"]
+        assert answer == "Question 1 of this session."
+
+        assert client.delete(f"/sessions/{first}").status_code == 200
+        assert client.post(f"/sessions/{first}/questions", json={"question": "?"}).status_code == 404
+        assert client.post(f"/sessions/{second}/questions", json={}).status_code == 400
+        assert client.get("/health").json() == {"sessions": 1}
+
+
+def test_concurrent_questions_keep_their_results(database: Database) -> None:
+    # Each question runs more queries than the result history holds for two concurrent questions
+    queries_per_question = 15
+
+    async def many_queries(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if isinstance(messages[-1].parts[-1], UserPromptPart):
+            sql = "SELECT id FROM users"
+            return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": sql}) for _ in range(queries_per_question)])
+        # Wait for the other session's queries to be stored before the response is built
+        await asyncio.sleep(0.2)
+        return ModelResponse(parts=[TextPart("Done.")])
+
+    deps = CLIAgentDeps(database=database, console=Console(quiet=True), max_return_values=200)
+    sessions = SessionManager(get_agent_runner(FunctionModel(many_queries), deps))
+    assert database.max_stored_results < 2 * queries_per_question
+
+    async def ask_concurrently() -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=create_app(sessions))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session_ids = [(await client.post("/sessions")).json()["session_id"] for _ in range(2)]
+            return await asyncio.gather(
+                *(client.post(f"/sessions/{id}/questions", json={"question": "?"}) for id in session_ids)
+            )
+
+    for response in asyncio.run(ask_concurrently()):
+        queries = response.json()["queries"]
+        assert len(queries) == queries_per_question
+        assert all(query["row_count"] == 10 for query in queries)
+    assert database.max_stored_results == 20
+
+
+def test_stream_answer(database: Database) -> None:
+    sessions = make_sessions(database)
+    with TestClient(create_app(sessions)) as client:
+        session_id = client.post("/sessions").json()["session_id"]
+        response = client.post(f"/sessions/{session_id}/questions", json={"question": "Hi", "stream": True})
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert "".join(line.get("text", "") for line in lines) == "Streamed answer 1"
+        assert lines[-1] == {"queries": []}
+
+
+def test_evict_sessions(database: Database) -> None:
+    sessions = make_sessions(database, max_sessions=2)
+    first = sessions.create()
+    second = sessions.create()
+    sessions.get(first.id)
+    # The least recently used session is evicted to make room
+    third = sessions.create()
+    assert set(sessions.sessions) == {first.id, third.id}
+    assert sessions.get(second.id) is None
+
+    sessions.idle_timeout = 0
+    assert sessions.evict_idle() == 2
+    assert sessions.sessions == {}
@@ -0,0 +1,52 @@
+import pytest
+
+from dbdex.sql_rewrite import add_limit, count_query, tokenize_sql
+
+
+def test_tokenize_sql() -> None:
+    tokens = tokenize_sql("SELECT 'a (b' AS \"x)\", count(*) -- comment )\nFROM t")
+
+    assert [token.text for token in tokens] == [
+        "SELECT",
+        "'a (b'",
+        "AS",
+        '"x)"',
+        ",",
+        "count",
+        "(",
+        "*",
+        ")",
+        "FROM",
+        "t",
+    ]
+    assert [token.depth for token in tokens] == [0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0]
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT * FROM users;", "SELECT * FROM users\nLIMIT 10"),
+        (
+            "WITH u AS (SELECT * FROM users LIMIT 5) SELECT * FROM u",
+            "WITH u AS (SELECT * FROM users LIMIT 5) SELECT * FROM u\nLIMIT 10",
+        ),
+        ("SELECT * FROM users -- all users", "SELECT * FROM users -- all users\nLIMIT 10"),
+        ("SELECT * FROM users WHERE name = 'limit'", "SELECT * FROM users WHERE name = 'limit'\nLIMIT 10"),
+        # Queries which already limit their result are not rewritten
+        ("SELECT * FROM users LIMIT 5", None),
+        ("SELECT * FROM users OFFSET 5 ROWS FETCH NEXT 5 ROWS ONLY", None),
+        ("SELECT * FROM users FOR UPDATE", None),
+        ("SELECT 1; SELECT 2", None),
+        ("PRAGMA table_info(users)", None),
+    ],
+)
+def test_add_limit(sql: str, expected: str | None) -> None:
+    assert add_limit(sql, 10, "sqlite") == expected
+
+
+def test_add_limit_unsupported_dialect() -> None:
+    assert add_limit("SELECT * FROM users", 10, "mssql") is None
+
+
+def test_count_query() -> None:
+    assert count_query("SELECT * FROM users;") == "SELECT COUNT(*) FROM (\nSELECT * FROM users\n) AS dbdex_count"
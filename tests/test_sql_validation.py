@@ -0,0 +1,69 @@
+import pytest
+
+from dbdex.database import Database, InvalidQueryError
+from dbdex.sql_validation import validate_sql
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "select id, name from users",
+        "WITH u AS (SELECT id FROM users) SELECT * FROM u",
+        "SELECT u.name AS n, COUNT(*) total FROM users u GROUP BY u.name ORDER BY total DESC, n",
+        "SELECT * FROM (SELECT id AS k FROM users) s WHERE k > 1",
+        "SELECT EXTRACT(YEAR FROM created) FROM (SELECT '2024-01-01' AS created) t",
+        "SELECT id, ROW_NUMBER() OVER w FROM users WINDOW w AS (ORDER BY id)",
+        "SELECT CAST(id AS TEXT), DATE '2024-01-01' FROM users WHERE name LIKE 'a%' AND \"Name\" IS NOT NULL",
+        "SELECT value FROM generate_series(1, 3)",
+        "SELECT count(*) FROM sqlite_master",
+        "(SELECT id FROM users) UNION (SELECT id FROM users);",
+        "SELECT CASE WHEN id > 5 THEN 'big' ELSE 'small' END size FROM users ORDER BY size",
+        # Double-quoted string literal (valid in SQLite and MySQL)
+        'SELECT id FROM users WHERE name = "Alice"',
+        # Date parts, pseudo-columns and character sets
+        "SELECT EXTRACT(isodow FROM name) FROM users",
+        "SELECT DATEADD(dd, 1, name), DATEDIFF(day, name, SYSDATE) FROM users",
+        "SELECT CONVERT(name USING utf8mb4) FROM users",
+        "SELECT u.id FROM users u JOIN users v USING (id)",
+    ],
+)
+def test_valid_queries(database: Database, sql: str) -> None:
+    assert validate_sql(sql, database) == []
+
+
+@pytest.mark.parametrize(
+    "sql, problem",
+    [
+        ("DELETE FROM users", "Only read-only SELECT queries are allowed, not DELETE"),
+        ("SELECT 1; DROP TABLE users", "Only a single statement can be executed at a time"),
+        (
+            "WITH d AS (DELETE FROM users RETURNING *) SELECT * FROM d",
+            "Only read-only SELECT queries are allowed, the query contains DELETE",
+        ),
+        ("SELECT * FROM user", "Table 'user' does not exist. Did you mean 'users'?"),
+        ("SELECT nme FROM users", "Column 'nme' does not exist in table 'users'. Did you mean 'name'?"),
+        ("SELECT u.nme FROM users u", "Column 'nme' does not exist in table 'users'. Did you mean 'name'?"),
+        ("SELECT x.id FROM users u", "Unknown table or alias 'x' in 'x.id'."),
+        ("SELECT id FROM users FOR SHARE", "Only read-only SELECT queries are allowed, the query locks rows"),
+        ("SELECT id FROM users FOR KEY SHARE", "Only read-only SELECT queries are allowed, the query locks rows"),
+        (
+            "SELECT id FROM users LOCK IN SHARE MODE",
+            "Only read-only SELECT queries are allowed, the query locks rows",
+        ),
+    ],
+)
+def test_invalid_queries(database: Database, sql: str, problem: str) -> None:
+    assert validate_sql(sql, database) == [problem]
+
+
+def test_execute_sql_validates(database: Database) -> None:
+    with pytest.raises(InvalidQueryError, match="Did you mean 'name'"):
+        database.execute_sql("SELECT nme FROM users")
+    # Nothing is executed, so no result is stored
+    assert database.last_query is None
+
+    database.validate_queries = False
+    with pytest.raises(InvalidQueryError, match="read-only"):
+        database.execute_sql("DELETE FROM users")
+    with pytest.raises(Exception, match="no such column"):
+        database.execute_sql("SELECT nme FROM users")
@@ -0,0 +1,79 @@
+import asyncio
+import json
+from pathlib import Path
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from rich.console import Console
+
+from dbdex.agent import get_agent_runner
+from dbdex.cli.special_commands import handle_stats
+from dbdex.database import Database
+from dbdex.deps import CLIAgentDeps
+from dbdex.history import TurnUsage
+from dbdex.stats import TurnStats, percentile, summarize_stats
+
+
+def test_percentile() -> None:
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+    assert percentile([5.0], 99) == 5.0
+
+
+def test_summarize_stats() -> None:
+    turns = [
+        TurnStats(
+            turn=i,
+            usage=TurnUsage(
+                turn=i,
+                requests=1,
+                request_tokens=None,
+                response_tokens=None,
+                history_tokens=100,
+                compacted_history_tokens=100,
+                seconds=float(i),
+            ),
+            model_seconds=float(i) / 2,
+        )
+        for i in range(1, 11)
+    ]
+    summary = summarize_stats(turns, window=5)
+    assert summary["seconds"]["p50"] == 8.0
+    assert summary["seconds"]["mean"] == 8.0
+    assert summary["model_seconds"]["p50"] == 4.0
+    # Metrics without values are left out
+    assert "request_tokens" not in summary
+    assert "turn" not in summary and "usage" not in summary
+
+
+def test_turn_stats(database: Database, tmp_path: Path) -> None:
+    def query_then_answer(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if isinstance(messages[-1].parts[-1], UserPromptPart):
+            return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": "SELECT * FROM users WHERE id <= 10"})])
+        return ModelResponse(parts=[TextPart("Done.")])
+
+    deps = CLIAgentDeps(database=database, console=Console(quiet=True), max_return_values=200)
+    runner = get_agent_runner(FunctionModel(query_then_answer), deps)
+    asyncio.run(runner.run("Who are the first users?"))
+
+    stats = runner.turn_stats[-1]
+    assert stats.turn == 1
+    # The turn's usage is shared with the token accounting of the runner
+    usage = stats.usage
+    assert usage is not None and usage is runner.turn_usage[-1]
+    assert usage.requests == 2
+    assert stats.tool_calls == 1
+    assert stats.rows_fetched == 10
+    assert stats.result_bytes > 0
+    assert stats.db_seconds > 0
+    assert stats.model_seconds > 0
+    assert usage.seconds is not None
+    assert usage.seconds >= stats.model_seconds + stats.db_seconds
+
+    output = tmp_path / "stats.json"
+    handle_stats(f"export {output}", runner)
+    exported = json.loads(output.read_text())
+    assert exported["turns"][0]["rows_fetched"] == 10
+    assert exported["turns"][0]["requests"] == 2
+    assert exported["summary"]["tool_calls"]["p50"] == 1
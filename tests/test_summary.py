@@ -0,0 +1,45 @@
+from datetime import date
+
+from dbdex.summary import DISTINCT_SKETCH_SIZE, summarize_rows
+
+
+def test_summarize_rows() -> None:
+    rows = [(i, f"name{i % 3}" if i % 5 else None, date(2024, 1, 1 + i % 28)) for i in range(100)]
+    id_summary, name_summary, date_summary = summarize_rows(["id", "name", "created"], rows, chunk_size=7)
+
+    assert id_summary.count == 100
+    assert id_summary.nulls == 0
+    assert (id_summary.min, id_summary.max, id_summary.mean) == (0, 99, 49.5)
+    assert id_summary.distinct == 100
+    assert id_summary.histogram == [10] * 10
+
+    assert name_summary.count == 80
+    assert name_summary.nulls == 20
+    assert name_summary.distinct == 3
+    assert name_summary.mean is None
+    assert name_summary.histogram is None
+    assert {value for value, _ in name_summary.top_values} == {"name0", "name1", "name2"}
+
+    assert (date_summary.min, date_summary.max) == (date(2024, 1, 1), date(2024, 1, 28))
+    assert date_summary.distinct == 28
+
+
+def test_summarize_rows_estimates() -> None:
+    """Distinct counts and frequent values are estimated for columns with many distinct values."""
+    rows = [(i if i % 2 else 0,) for i in range(100_000)]
+    (summary,) = summarize_rows(["value"], rows)
+
+    assert summary.distinct is not None
+    assert DISTINCT_SKETCH_SIZE < summary.distinct
+    assert abs(summary.distinct - 50_001) / 50_001 < 0.1
+    assert summary.top_values[0][0] == 0
+    assert summary.top_values[0][1] >= 49_000
+
+
+def test_summarize_rows_mixed_types() -> None:
+    (summary,) = summarize_rows(["value"], [(1,), ("a",), ([1, 2],), (None,)])
+
+    assert summary.count == 3
+    assert summary.min is None and summary.max is None
+    assert summary.mean == 1
+    assert summary.distinct == 3
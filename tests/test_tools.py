@@ -0,0 +1,167 @@
+import asyncio
+import time
+from typing import Any
+
+import pytest
+from pydantic_ai import ModelRetry, RunContext
+from pydantic_ai.models.test import TestModel
+from pydantic_ai.usage import Usage
+from rich.console import Console
+from sqlalchemy import event
+
+from dbdex.database import Database
+from dbdex.deps import AgentDeps, CLIAgentDeps
+from dbdex.summary import SummaryMode
+from dbdex.tools import DBQueryResponse, describe_tables, execute_sql, search_schema, show_result_table
+
+
+def make_context(
+    database: Database, max_return_values: int = 200, pushdown_limit: bool = False, result_summary: SummaryMode = "off"
+) -> RunContext[AgentDeps]:
+    deps = AgentDeps(
+        database=database,
+        max_return_values=max_return_values,
+        pushdown_limit=pushdown_limit,
+        result_summary=result_summary,
+    )
+    return RunContext(deps=deps, model=TestModel(), usage=Usage(), prompt="")
+
+
+class TestExecuteSQL:
+    def test_execute_sql(self, database: Database) -> None:
+        response = asyncio.run(execute_sql(make_context(database), "SELECT id, name FROM users WHERE id <= 2"))
+
+        assert response.columns == ["id", "name"]
+        assert response.rows == [[1, "user1"], [2, "user2"]]
+        assert response.note is None
+
+    def test_execute_sql_truncated(self, database: Database) -> None:
+        # 5 + 4 // 2 = 7 rows returned
+        response = asyncio.run(execute_sql(make_context(database, max_return_values=4), "SELECT id, name FROM users"))
+
+        assert response.rows is not None
+        assert len(response.rows) == 7
+        assert response.note == "Query returned 10 rows, showing first 7 only"
+
+    def test_execute_sql_streamed(self, database: Database) -> None:
+        database.stream_results = True
+        response = asyncio.run(execute_sql(make_context(database, max_return_values=4), "SELECT id, name FROM users"))
+
+        assert response.rows is not None
+        assert len(response.rows) == 7
+        assert response.note == "Query returned more than 7 rows, showing first 7 only"
+        # Only the rows required by the tool are fetched
+        assert database.last_query is not None
+        assert database.last_query.row_count == 8
+
+    def test_execute_sql_pushdown_limit(self, database: Database) -> None:
+        context = make_context(database, max_return_values=4, pushdown_limit=True)
+        response = asyncio.run(execute_sql(context, "SELECT id, name FROM users"))
+
+        assert response.rows is not None
+        assert len(response.rows) == 7
+        assert response.note == "Query returned 10 rows, showing first 7 only"
+        # Only the rows which can be returned for a single column are fetched
+        assert database.last_query is not None
+        assert database.last_query.row_count == 9
+
+    def test_show_result_table_pushdown_limit(self, database: Database) -> None:
+        console = Console(record=True, width=200)
+        deps = CLIAgentDeps(database=database, console=console, max_return_values=4, pushdown_limit=True)
+        context = RunContext(deps=deps, model=TestModel(), usage=Usage(), prompt="")
+        query_context = RunContext[AgentDeps](deps=deps, model=TestModel(), usage=Usage(), prompt="")
+        response = asyncio.run(execute_sql(query_context, "SELECT id, name FROM users ORDER BY id"))
+        assert response.query_id is not None
+        limited_result = database.get_result(response.query_id)
+        assert limited_result is not None and limited_result.limited
+
+        # The entire result is displayed, not just the rows fetched for the LLM
+        message = asyncio.run(show_result_table(context, response.query_id))
+        assert message == "Result displayed, DO NOT also provide the result data in your response."
+        assert "user10" in console.export_text()
+
+    def test_execute_sql_summary(self, database: Database) -> None:
+        context = make_context(database, max_return_values=4, result_summary="with-rows")
+        response = asyncio.run(execute_sql(context, "SELECT id, name FROM users"))
+
+        assert response.rows is not None
+        assert len(response.rows) == 7
+        assert response.summary is not None
+        assert [(column.name, column.count, column.distinct) for column in response.summary] == [
+            ("id", 10, 10),
+            ("name", 10, 10),
+        ]
+        assert response.summary[0].max == 10
+
+        context = make_context(database, max_return_values=4, result_summary="instead-of-rows")
+        response = asyncio.run(execute_sql(context, "SELECT id, name FROM users"))
+        assert response.rows is None
+        assert response.summary is not None
+        assert response.note == "Query returned 10 rows, rows omitted in favor of the summary"
+
+        # Results which are returned entirely are not summarized
+        response = asyncio.run(execute_sql(context, "SELECT id FROM users WHERE id = 1"))
+        assert response.summary is None
+
+    def test_execute_sql_token_budget(self, database: Database) -> None:
+        context = make_context(database, max_return_values=4)
+        context.deps.response_token_budget = 20
+        response = asyncio.run(execute_sql(context, "SELECT id, name FROM users ORDER BY id"))
+
+        assert response.rows is None
+        assert response.data is not None
+        assert response.data.splitlines()[:2] == ["id\tname", "1\tuser1"]
+        assert response.note == (
+            "Query returned 10 rows, showing first 7 only. "
+            f"To fit the token budget, only the first {len(response.data.splitlines()) - 1} of 7 rows are included"
+        )
+
+    def test_execute_sql_timeout(self, database: Database) -> None:
+        database.query_timeout = 0.1
+        slow_query = "SELECT (WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT max(x) FROM c)"
+        with pytest.raises(ModelRetry, match="timeout"):
+            asyncio.run(execute_sql(make_context(database), slow_query))
+
+    def test_execute_sql_no_results(self, database: Database) -> None:
+        response = asyncio.run(execute_sql(make_context(database), "SELECT id FROM users WHERE id > 100"))
+
+        assert response.note == "No results"
+
+
+def test_execute_sql_concurrently(database: Database) -> None:
+    """Parallel tool calls run concurrently, and each keeps its own result."""
+
+    @event.listens_for(database.engine, "connect")
+    def add_sleep_function(dbapi_connection: Any, connection_record: Any) -> None:
+        dbapi_connection.create_function("sleep", 1, lambda seconds: time.sleep(seconds) or seconds)
+
+    # Discard pooled connections which were opened before the function was added
+    database.engine.dispose()
+
+    async def run_queries() -> list[DBQueryResponse]:
+        context = make_context(database)
+        return await asyncio.gather(*(execute_sql(context, f"SELECT sleep(0.3), {i} AS i") for i in range(4)))
+
+    start_time = time.monotonic()
+    responses = asyncio.run(run_queries())
+    assert time.monotonic() - start_time < 1.0
+
+    assert len({response.query_id for response in responses}) == 4
+    for i, response in enumerate(responses):
+        assert response.query_id is not None
+        result = database.get_result(response.query_id)
+        assert result is not None
+        assert result.rows[0].i == i
+
+
+class TestSchemaTools:
+    def test_search_schema(self, database: Database) -> None:
+        assert asyncio.run(search_schema(make_context(database), "user names")) == "users: name, id"
+        assert asyncio.run(search_schema(make_context(database), "orders")).startswith("No matching tables")
+
+    def test_describe_tables(self, database: Database) -> None:
+        schema = asyncio.run(describe_tables(make_context(database), ["users"]))
+        assert schema.startswith("TABLE users (")
+
+        with pytest.raises(ModelRetry):
+            asyncio.run(describe_tables(make_context(database), ["missing"]))
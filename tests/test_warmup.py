@@ -0,0 +1,72 @@
+import asyncio
+import json
+from typing import Any
+
+import httpx
+import pytest
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, SystemPromptPart, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.openai import OpenAIModel
+
+from dbdex import warmup
+from dbdex.agent import get_agent_runner
+from dbdex.database import Database
+from dbdex.deps import AgentDeps
+from dbdex.warmup import StartupTimings, load_model, prime_prompt_cache
+
+
+def test_startup_timings() -> None:
+    timings = StartupTimings()
+    with timings.phase("database"):
+        pass
+    timings.finish()
+
+    assert list(timings.phases) == ["database"]
+    assert timings.total is not None and timings.total >= timings.phases["database"]
+    assert timings.format().startswith("Startup took ")
+
+
+def test_prime_prompt_cache(database: Database) -> None:
+    requests: list[list[ModelMessage]] = []
+
+    def call_tool(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        requests.append(messages)
+        assert info.function_tools
+        return ModelResponse(parts=[ToolCallPart("execute_sql", {"sql": "SELECT COUNT(*) FROM users"})])
+
+    runner = get_agent_runner(FunctionModel(call_tool), AgentDeps(database=database, max_return_values=200))
+    asyncio.run(prime_prompt_cache(runner))
+
+    # A single request with the system prompt and tools is made, without changing the runner's history
+    assert len(requests) == 1
+    first_request = requests[0][0]
+    assert isinstance(first_request, ModelRequest)
+    assert isinstance(first_request.parts[0], SystemPromptPart)
+    assert runner.message_history is None
+    assert runner.turn_usage == []
+
+
+def test_load_model_ignores_other_models() -> None:
+    asyncio.run(load_model(FunctionModel(lambda messages, info: ModelResponse(parts=[TextPart("")]))))
+
+
+def test_load_model(monkeypatch: pytest.MonkeyPatch) -> None:
+    model = OpenAIModel("llama3.2", base_url="http://localhost:11434/v1", api_key="ollama")
+    requests: list[httpx.Request] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"done": True})
+
+    async_client = httpx.AsyncClient
+
+    def client(**kwargs: Any) -> httpx.AsyncClient:
+        return async_client(transport=httpx.MockTransport(handle), **kwargs)
+
+    monkeypatch.setattr(warmup.httpx, "AsyncClient", client)
+    asyncio.run(load_model(model))
+
+    # The model is loaded through Ollama's native API, leaving its keep-alive to the server's OLLAMA_KEEP_ALIVE
+    assert len(requests) == 1
+    assert str(requests[0].url) == "http://localhost:11434/api/generate"
+    assert json.loads(requests[0].content) == {"model": "llama3.2"}